@@ -0,0 +1 @@
+# 与界面无关的核心处理模块，可在没有Tk/显示器的环境中使用
@@ -0,0 +1,172 @@
+"""按内容哈希缓存处理结果
+
+缓存键由输入文件内容的SHA-256、操作名称和规范化后的处理参数组成，
+同一个文件用同样的参数再次处理时直接复制上次的结果。
+恢复时总是复制而不用硬链接：输出文件之后可能被原地覆盖写入（PIL保存、外部编辑器、
+压缩后替换原文件），硬链接会让这些写入同时改掉缓存条目。
+每个缓存条目是一个目录，按最近使用时间淘汰，使缓存总大小不超过上限。
+
+缓存对象只保存目录和大小上限，可以传给进程池中的子进程使用。
+"""
+import os
+import json
+import shutil
+import hashlib
+import dataclasses
+
+# 缓存格式或处理逻辑变化导致旧结果不再适用时增加该版本号
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".pdf_tools_cache")
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024  # 1GB
+
+# 计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_params(params):
+    """把参数对象或字典转换为稳定的JSON文本"""
+    if dataclasses.is_dataclass(params):
+        params = dataclasses.asdict(params)
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ResultCache:
+    """磁盘上的处理结果缓存，按总大小做LRU淘汰"""
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, input_digest, operation, params):
+        """由输入文件哈希、操作名称和处理参数生成缓存键"""
+        text = f"{CACHE_VERSION}\n{operation}\n{input_digest}\n{normalize_params(params)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, destinations):
+        """把缓存的结果恢复到目标路径
+
+        Args:
+            key: 缓存键
+            destinations: {条目中的文件名: 目标路径}
+
+        Returns:
+            bool: 是否命中；未命中时不会创建任何目标文件
+        """
+        entry = self.entry_dir(key)
+        sources = {name: os.path.join(entry, name) for name in destinations}
+        if not all(os.path.isfile(path) for path in sources.values()):
+            self.misses += 1
+            return False
+
+        restored = []
+        try:
+            for name, dest_path in destinations.items():
+                self._restore_file(sources[name], dest_path)
+                restored.append(dest_path)
+            # 更新条目的修改时间作为最近使用时间
+            os.utime(entry)
+        except OSError:
+            # 条目在恢复过程中被其他进程淘汰，按未命中处理
+            for dest_path in restored:
+                try:
+                    os.remove(dest_path)
+                except OSError:
+                    pass
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        return True
+
+    @staticmethod
+    def _restore_file(source, dest_path):
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        shutil.copyfile(source, dest_path)
+
+    def store(self, key, sources, evict=True):
+        """把处理结果复制到缓存中
+
+        Args:
+            key: 缓存键
+            sources: {条目中的文件名: 结果文件路径}
+            evict: 是否在存入后立即淘汰旧条目，批量存入时可以最后统一调用 evict()
+        """
+        entry = self.entry_dir(key)
+        # 先写入临时目录再整体改名，其他进程不会看到不完整的条目
+        temp_entry = f"{entry}.tmp-{os.getpid()}"
+        try:
+            total_size = sum(os.path.getsize(path) for path in sources.values())
+            if total_size > self.max_size:
+                return
+            if os.path.isdir(entry):
+                os.utime(entry)
+                return
+
+            os.makedirs(temp_entry, exist_ok=True)
+            for name, source in sources.items():
+                shutil.copyfile(source, os.path.join(temp_entry, name))
+            os.rename(temp_entry, entry)
+        except OSError:
+            # 缓存写入失败不影响处理结果
+            shutil.rmtree(temp_entry, ignore_errors=True)
+            return
+
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """按最近使用时间从旧到新删除条目，直到总大小不超过上限"""
+        entries = []
+        total_size = 0
+        for prefix in self._list_dir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            for name in self._list_dir(prefix_dir):
+                entry = os.path.join(prefix_dir, name)
+                if ".tmp-" in name:
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry, file_name))
+                               for file_name in os.listdir(entry))
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except OSError:
+                    continue
+                total_size += size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    @staticmethod
+    def _list_dir(path):
+        try:
+            return os.listdir(path)
+        except OSError:
+            return []
+
+    def report(self, hits=None, misses=None):
+        """生成命中统计信息，跨进程统计时可以传入汇总的次数"""
+        hits = self.hits if hits is None else hits
+        misses = self.misses if misses is None else misses
+        total = hits + misses
+        if total == 0:
+            return "结果缓存: 未使用"
+        return f"结果缓存: 命中 {hits} 次，未命中 {misses} 次 (命中率 {hits / total * 100:.0f}%)"
@@ -0,0 +1,761 @@
+"""PDF压缩的核心实现"""
+import os
+import io
+import re
+import math
+import hashlib
+import time
+import shutil
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+import fitz  # PyMuPDF
+
+from core.options import CompressOptions
+from core.cache import file_digest
+from core.filelist import file_size_hint
+from core.pixmap import render_pixmap, pixmap_to_image, pixmap_to_jpeg
+from core.progress import report_progress
+
+COMPRESSION_LEVELS = ["低", "标准", "高", "最高"]
+
+# 压缩方式：整页栅格化会把含图像的页面整体渲染为JPEG；
+# 图像重压缩只处理分辨率超过目标DPI的图像，文字和矢量内容保持不变
+MODE_RASTERIZE = "整页栅格化"
+MODE_RECOMPRESS_IMAGES = "图像重压缩"
+COMPRESSION_MODES = [MODE_RASTERIZE, MODE_RECOMPRESS_IMAGES]
+
+# 图像有效DPI超过目标DPI的比例小于该值时不做处理，避免为极小的收益重新编码
+DOWNSAMPLE_THRESHOLD = 1.1
+
+# 目标大小模式的搜索参数：先在不低于 TARGET_QUALITY_FLOOR 的范围内降低图像质量，
+# 仍然超出时再降低DPI，最后才把质量降到 MIN_TARGET_QUALITY
+TARGET_SAMPLE_PAGES = 5
+TARGET_QUALITY_FLOOR = 40
+MIN_TARGET_QUALITY = 20
+MIN_TARGET_DPI = 50
+# 用采样页面实际生成的PDF校正估算后重新搜索的最多次数（不渲染整个文档）
+MAX_TARGET_ATTEMPTS = 3
+# 校正系数变化小于该比例时认为估算已经收敛
+TARGET_CORRECTION_TOLERANCE = 0.01
+# 校正后重新搜索时保留渲染结果的DPI个数（离选中DPI最近的几个）
+SAMPLER_KEEP_DPIS = 3
+# 每个栅格化页面除JPEG数据外的对象开销（页面字典、内容流等），单位字节
+RASTER_PAGE_OVERHEAD = 400
+# 影响图像解码结果的字典项，原始数据相同但这些项不同的图像不能共用编码结果
+IMAGE_DECODE_KEYS = ("Filter", "DecodeParms", "Width", "Height", "BitsPerComponent",
+                     "ColorSpace", "Decode", "SMask", "Mask")
+# 比较上述字典项时展开间接引用的层数（如 /ColorSpace -> [/ICCBased 引用] -> ICC数据流）
+REFERENCE_DEPTH = 3
+
+
+@dataclass
+class CompressResult:
+    """单个文件的压缩结果"""
+    pdf_path: str
+    output_path: str
+    size_before: int = 0
+    size_after: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None  # 压缩或替换失败时的错误信息
+    note: Optional[str] = None  # 目标大小模式下实际使用的参数等补充信息
+    cache_hit: Optional[bool] = None  # 未使用结果缓存时为None
+
+
+@dataclass
+class BatchSummary:
+    """批量压缩的汇总结果"""
+    total_files: int = 0
+    success_count: int = 0
+    total_size_before: int = 0
+    total_size_after: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def apply_compression_level(options):
+    """根据压缩级别调整DPI和图像质量，返回新的参数对象"""
+    image_dpi = options.image_dpi
+    image_quality = options.image_quality
+
+    if options.level == "低":
+        image_dpi = max(image_dpi, 200)
+        image_quality = max(image_quality, 85)
+    elif options.level == "标准":
+        # 使用界面设置的默认值
+        pass
+    elif options.level == "高":
+        image_dpi = min(image_dpi, 120)
+        image_quality = min(image_quality, 65)
+    elif options.level == "最高":
+        image_dpi = min(image_dpi, 96)
+        image_quality = min(image_quality, 45)
+
+    return dataclasses.replace(options, image_dpi=image_dpi, image_quality=image_quality)
+
+
+def format_size(size_in_bytes):
+    """格式化文件大小为易读的形式"""
+    # 转换为KB
+    size_in_kb = size_in_bytes / 1024.0
+    if size_in_kb < 1024:
+        return f"{size_in_kb:.2f} KB"
+
+    # 转换为MB
+    size_in_mb = size_in_kb / 1024.0
+    if size_in_mb < 1024:
+        return f"{size_in_mb:.2f} MB"
+
+    # 转换为GB
+    size_in_gb = size_in_mb / 1024.0
+    return f"{size_in_gb:.2f} GB"
+
+
+def compressed_output_path(pdf_path, output_dir=None):
+    """确定压缩结果的保存路径
+
+    指定输出目录时生成"原文件名_compressed.pdf"，否则生成原文件旁的临时文件，
+    由 replace_original 在压缩完成后替换原文件。
+    """
+    if output_dir:
+        output_filename = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_compressed.pdf"
+        return os.path.join(output_dir, output_filename)
+    return f"{pdf_path}.temp.pdf"
+
+
+def assign_output_paths(pdf_paths, output_dir=None):
+    """为每个输入文件分配输出路径
+
+    不同目录下的同名文件会得到带序号的输出文件名，避免并行压缩时互相覆盖。
+
+    Returns:
+        dict: {输入路径: 输出路径}
+    """
+    output_paths = {}
+    used_paths = set()
+    for pdf_path in pdf_paths:
+        output_path = compressed_output_path(pdf_path, output_dir)
+        if output_dir:
+            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+            counter = 1
+            while os.path.normcase(output_path) in used_paths:
+                output_path = os.path.join(output_dir, f"{base_name}_{counter}_compressed.pdf")
+                counter += 1
+        used_paths.add(os.path.normcase(output_path))
+        output_paths[pdf_path] = output_path
+    return output_paths
+
+
+def replace_original(pdf_path, compressed_path):
+    """用压缩后的文件替换原文件，失败时尽量恢复原文件并抛出异常"""
+    # 创建原文件的备份
+    backup_path = f"{pdf_path}.bak"
+    try:
+        shutil.copy2(pdf_path, backup_path)
+        # 替换原文件
+        os.remove(pdf_path)
+        os.rename(compressed_path, pdf_path)
+        # 删除备份
+        os.remove(backup_path)
+    except Exception:
+        # 尝试恢复原文件
+        if os.path.exists(backup_path):
+            try:
+                if not os.path.exists(pdf_path):
+                    os.rename(backup_path, pdf_path)
+                else:
+                    os.remove(backup_path)
+            except:
+                pass
+        raise
+
+
+def compress_pdf_file(input_path, output_path, options=None, progress_callback=None):
+    """压缩单个PDF文件
+
+    Args:
+        input_path: 输入PDF路径
+        output_path: 输出PDF路径
+        options: 已应用压缩级别的 CompressOptions
+        progress_callback: 每处理一页调用一次 (当前页, 总页数, 状态信息)
+
+    Returns:
+        CompressOptions: 实际使用的参数，目标大小模式下为搜索得到的DPI和图像质量
+    """
+    if options is None:
+        options = apply_compression_level(CompressOptions())
+
+    if options.mode == MODE_RECOMPRESS_IMAGES and not options.target_size:
+        recompress_pdf_images(input_path, output_path, options, progress_callback)
+        return options
+
+    # 原文件只解析一次；输出文档直接在内存中构建，不写任何临时文件
+    pdf_doc = fitz.open(input_path)
+    try:
+        if options.target_size:
+            return compress_to_target_size(pdf_doc, output_path, options, progress_callback)
+        rasterize_document(pdf_doc, output_path, options, progress_callback)
+        return options
+    finally:
+        pdf_doc.close()
+
+
+def rasterize_document(pdf_doc, output_path, options, progress_callback=None, sampler=None):
+    """把含图像的页面渲染为JPEG，其余页面原样复制，保存到 output_path
+
+    Args:
+        pdf_doc: 已打开的 fitz 文档
+        sampler: 目标大小模式的 PageSampler，已渲染过的页面直接复用
+
+    Returns:
+        int: 写入的JPEG数据总字节数
+    """
+    output_doc = fitz.open()
+
+    # 连续的直通页面攒成一段后一次性复制，共享的资源只复制一份
+    passthrough_start = None
+
+    def flush_passthrough(end_page):
+        if passthrough_start is not None:
+            output_doc.insert_pdf(pdf_doc, from_page=passthrough_start, to_page=end_page)
+
+    image_bytes = 0
+    try:
+        total_pages = len(pdf_doc)
+
+        # 处理每一页
+        for page_num in range(total_pages):
+            report_progress(progress_callback, page_num + 1, total_pages,
+                            f"处理第 {page_num + 1}/{total_pages} 页...")
+
+            # 获取页面
+            page = pdf_doc.load_page(page_num)
+
+            # 判断该页是否包含图像
+            image_list = page.get_images()
+
+            if not (image_list and options.optimize_images):
+                # 如果页面没有图像或不优化图像，则保持原样
+                if passthrough_start is None:
+                    passthrough_start = page_num
+                continue
+
+            flush_passthrough(page_num - 1)
+            passthrough_start = None
+
+            # 像素图直接编码为JPEG，不经过PIL
+            pix = sampler.cached_pixmap(page_num, options.image_dpi) if sampler else None
+            if pix is None:
+                pix = render_pixmap(page, options.image_dpi)
+            jpeg_data = pixmap_to_jpeg(pix, options.image_quality)
+            image_bytes += len(jpeg_data)
+
+            add_raster_page(output_doc, page, pix, jpeg_data, options.keep_page_size)
+
+        flush_passthrough(total_pages - 1)
+
+        # 处理元数据
+        if not options.remove_metadata:
+            # 复制原PDF的元数据
+            output_doc.set_metadata(pdf_doc.metadata)
+
+        # 保存压缩后的PDF
+        output_doc.save(output_path, garbage=3, deflate=True)
+    finally:
+        output_doc.close()
+
+    return image_bytes
+
+
+def add_raster_page(output_doc, page, pix, jpeg_data, keep_page_size):
+    """在输出文档中新建一页，用渲染得到的JPEG铺满整页"""
+    if keep_page_size:
+        # 保持原始页面尺寸，图像铺满整页
+        page_width, page_height = page.rect.width, page.rect.height
+    else:
+        # 页面尺寸由图像像素尺寸决定（按72DPI）
+        page_width, page_height = pix.width, pix.height
+
+    new_page = output_doc.new_page(width=page_width, height=page_height)
+    new_page.insert_image(fitz.Rect(0, 0, page_width, page_height), stream=jpeg_data)
+
+
+class PageSampler:
+    """目标大小模式的采样页面缓存
+
+    搜索过程中每个 (页面, DPI) 只渲染一次，每个 (页面, DPI, 质量) 只编码一次，
+    最终输出时采样页面直接复用已渲染的像素图。
+    """
+
+    def __init__(self, pdf_doc, page_nums):
+        self.pdf_doc = pdf_doc
+        self.page_nums = page_nums
+        self._pixmaps = {}
+        self._encoded_sizes = {}
+
+    def render(self, page_num, dpi):
+        key = (page_num, dpi)
+        if key not in self._pixmaps:
+            self._pixmaps[key] = render_pixmap(self.pdf_doc.load_page(page_num), dpi)
+        return self._pixmaps[key]
+
+    def cached_pixmap(self, page_num, dpi):
+        return self._pixmaps.get((page_num, dpi))
+
+    def average_page_bytes(self, dpi, quality):
+        """采样页面在给定参数下的平均JPEG字节数"""
+        total = 0
+        for page_num in self.page_nums:
+            key = (page_num, dpi, quality)
+            if key not in self._encoded_sizes:
+                self._encoded_sizes[key] = len(pixmap_to_jpeg(self.render(page_num, dpi), quality))
+            total += self._encoded_sizes[key]
+        return total / len(self.page_nums)
+
+    def measured_page_bytes(self, dpi, quality, keep_page_size):
+        """用采样页面实际生成一个栅格化PDF，返回平均每页占用的字节数（含页面对象开销）"""
+        sample_doc = fitz.open()
+        try:
+            for page_num in self.page_nums:
+                pix = self.render(page_num, dpi)
+                add_raster_page(sample_doc, self.pdf_doc.load_page(page_num), pix,
+                                pixmap_to_jpeg(pix, quality), keep_page_size)
+            return len(sample_doc.tobytes(garbage=3, deflate=True)) / len(self.page_nums)
+        finally:
+            sample_doc.close()
+
+    def keep_only(self, dpi):
+        """只保留指定DPI的渲染结果，释放其余像素图占用的内存"""
+        self._pixmaps = {key: pix for key, pix in self._pixmaps.items() if key[1] == dpi}
+
+    def keep_nearest(self, dpi, count=SAMPLER_KEEP_DPIS):
+        """只保留离 dpi 最近的 count 个DPI的渲染结果，校正后重新搜索时多半还会用到"""
+        rendered = sorted({key[1] for key in self._pixmaps}, key=lambda d: abs(d - dpi))
+        kept = set(rendered[:count])
+        self._pixmaps = {key: pix for key, pix in self._pixmaps.items() if key[1] in kept}
+
+
+def sample_page_numbers(page_nums, count=TARGET_SAMPLE_PAGES):
+    """从页面列表中均匀地选取最多 count 个采样页面"""
+    if len(page_nums) <= count:
+        return list(page_nums)
+    step = len(page_nums) / count
+    return [page_nums[int(i * step + step / 2)] for i in range(count)]
+
+
+def passthrough_size(pdf_doc, image_pages):
+    """估算原样复制的页面在输出文件中占用的字节数"""
+    image_pages = set(image_pages)
+    passthrough_doc = fitz.open()
+    try:
+        for page_num in range(len(pdf_doc)):
+            if page_num not in image_pages:
+                passthrough_doc.insert_pdf(pdf_doc, from_page=page_num, to_page=page_num)
+        if passthrough_doc.page_count == 0:
+            return 0
+        return len(passthrough_doc.tobytes(garbage=3, deflate=True))
+    finally:
+        passthrough_doc.close()
+
+
+def largest_fitting(low, high, fits):
+    """二分查找 [low, high] 中使 fits 成立的最大整数，fits 需随参数单调，找不到时返回None"""
+    best = None
+    while low <= high:
+        middle = (low + high) // 2
+        if fits(middle):
+            best = middle
+            low = middle + 1
+        else:
+            high = middle - 1
+    return best
+
+
+def search_target_params(estimate, target_size, max_dpi, max_quality):
+    """在不超过 max_dpi/max_quality 的范围内寻找预计大小不超过目标的参数
+
+    Args:
+        estimate: estimate(dpi, quality) 返回预计的输出文件大小
+
+    Returns:
+        tuple: (dpi, quality)，即使最低设置也超出目标时返回最低设置
+    """
+    quality_floor = min(TARGET_QUALITY_FLOOR, max_quality)
+    min_quality = min(MIN_TARGET_QUALITY, quality_floor)
+    min_dpi = min(MIN_TARGET_DPI, max_dpi)
+
+    # 先只降低图像质量
+    quality = largest_fitting(quality_floor, max_quality,
+                              lambda q: estimate(max_dpi, q) <= target_size)
+    if quality is not None:
+        return max_dpi, quality
+
+    # 再在质量下限上降低DPI
+    dpi = largest_fitting(min_dpi, max_dpi, lambda d: estimate(d, quality_floor) <= target_size)
+    if dpi is not None:
+        return dpi, quality_floor
+
+    # 最后在最低DPI上继续降低质量
+    quality = largest_fitting(min_quality, quality_floor,
+                              lambda q: estimate(min_dpi, q) <= target_size)
+    return min_dpi, quality if quality is not None else min_quality
+
+
+def compress_to_target_size(pdf_doc, output_path, options, progress_callback=None):
+    """搜索能使输出不超过 options.target_size 的DPI和图像质量，并按该参数压缩
+
+    每次试探只用少量采样页面估算整个文件的大小，渲染结果在试探之间缓存；
+    选出参数后先用采样页面实际生成PDF校正估算，必要时重新搜索，确定参数后只渲染整个文档一次。
+    只有最终文件仍超出目标时，才按实际大小校正并再压缩一次。
+
+    Returns:
+        CompressOptions: 实际使用的参数
+    """
+    image_pages = [page_num for page_num in range(len(pdf_doc))
+                   if options.optimize_images and pdf_doc.get_page_images(page_num)]
+    if not image_pages:
+        # 没有可以调整的页面
+        rasterize_document(pdf_doc, output_path, options, progress_callback)
+        return options
+
+    sampler = PageSampler(pdf_doc, sample_page_numbers(image_pages))
+    fixed_size = passthrough_size(pdf_doc, image_pages)
+    correction = 1.0
+
+    def estimate(dpi, quality):
+        page_bytes = (sampler.average_page_bytes(dpi, quality) + RASTER_PAGE_OVERHEAD) * correction
+        size = fixed_size + len(image_pages) * page_bytes
+        report_progress(progress_callback, 0, 0,
+                        f"试探 DPI {dpi}、图像质量 {quality}: 预计 {format_size(size)}")
+        return size
+
+    def at_minimum(dpi, quality):
+        return dpi <= MIN_TARGET_DPI and quality <= MIN_TARGET_QUALITY
+
+    def search():
+        return search_target_params(estimate, options.target_size, options.image_dpi, options.image_quality)
+
+    # 在采样页面上校正估算，不渲染整个文档
+    dpi, quality = search()
+    for _ in range(MAX_TARGET_ATTEMPTS):
+        sampler.keep_nearest(dpi)
+        measured = sampler.measured_page_bytes(dpi, quality, options.keep_page_size)
+        new_correction = measured / (sampler.average_page_bytes(dpi, quality) + RASTER_PAGE_OVERHEAD)
+        converged = abs(new_correction - correction) <= correction * TARGET_CORRECTION_TOLERANCE
+        correction = new_correction
+        if converged or at_minimum(dpi, quality) or estimate(dpi, quality) <= options.target_size:
+            break
+        dpi, quality = search()
+
+    sampler.keep_only(dpi)
+    effective = dataclasses.replace(options, image_dpi=dpi, image_quality=quality)
+    rasterize_document(pdf_doc, output_path, effective, progress_callback, sampler)
+
+    # 最后的保险：采样不能代表整个文档时，按实际大小校正后再压缩一次
+    actual_size = os.path.getsize(output_path)
+    if actual_size > options.target_size and not at_minimum(dpi, quality):
+        correction *= actual_size / estimate(dpi, quality) * 1.02
+        dpi, quality = search()
+        sampler.keep_only(dpi)
+        effective = dataclasses.replace(options, image_dpi=dpi, image_quality=quality)
+        rasterize_document(pdf_doc, output_path, effective, progress_callback, sampler)
+
+    return effective
+
+
+def collect_image_dpi(pdf_doc, progress_callback=None):
+    """统计文档中每个图像在所有页面上的最小有效DPI
+
+    同一图像可能在多个位置以不同大小显示，显示得最大的位置决定了需要保留的分辨率。
+
+    Returns:
+        dict: {图像xref: 最小有效DPI}
+    """
+    image_dpi = {}
+    total_pages = len(pdf_doc)
+    for page_num in range(total_pages):
+        report_progress(progress_callback, page_num + 1, total_pages,
+                        f"分析第 {page_num + 1}/{total_pages} 页的图像...")
+
+        page = pdf_doc.load_page(page_num)
+        for info in page.get_image_info(xrefs=True):
+            xref = info.get("xref", 0)
+            if xref <= 0:
+                # 内联图像没有xref，无法原地替换
+                continue
+
+            # 图像变换矩阵的两个基向量长度即为显示宽高（点）
+            a, b, c, d = info["transform"][:4]
+            display_width = math.hypot(a, b)
+            display_height = math.hypot(c, d)
+            if display_width <= 0 or display_height <= 0:
+                continue
+
+            dpi = min(info["width"] / display_width, info["height"] / display_height) * 72
+            image_dpi[xref] = min(dpi, image_dpi.get(xref, dpi))
+    return image_dpi
+
+
+def is_recompressible(pdf_doc, xref, bpc, smask):
+    """判断图像能否安全地重新编码为JPEG
+
+    带透明蒙版、色键蒙版或者位深小于8（如黑白扫描的CCITT/JBIG2图像）的图像保持原样。
+    """
+    if smask or bpc < 8:
+        return False
+    mask_type, _ = pdf_doc.xref_get_key(xref, "Mask")
+    _, image_mask = pdf_doc.xref_get_key(xref, "ImageMask")
+    return mask_type == "null" and image_mask != "true"
+
+
+def encode_downsampled_image(pdf_doc, xref, scale, quality):
+    """把图像按比例缩小并编码为JPEG
+
+    Returns:
+        tuple: (JPEG字节, 宽度, 高度, PDF颜色空间)，无法处理时返回None
+    """
+    pix = fitz.Pixmap(pdf_doc, xref)
+    if pix.alpha:
+        return None
+    # CMYK、Lab等颜色空间统一转换为RGB
+    if pix.colorspace is None or pix.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+
+    mode = "L" if pix.n == 1 else "RGB"
+    img = pixmap_to_image(pix)
+    new_size = (max(1, round(pix.width * scale)), max(1, round(pix.height * scale)))
+    if new_size != img.size:
+        img = img.resize(new_size, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    colorspace = "/DeviceGray" if mode == "L" else "/DeviceRGB"
+    return buffer.getvalue(), img.width, img.height, colorspace
+
+
+def image_cache_key(pdf_doc, xref, raw_stream, scale):
+    """图像编码结果的缓存键：原始数据流、影响解码的字典项和缩放比例
+
+    字典项中的间接引用（如各自嵌入的同一个ICC颜色配置）按被引用对象的内容比较。
+    """
+    entries = tuple(resolve_references(pdf_doc, pdf_doc.xref_get_key(xref, key)[1])
+                    for key in IMAGE_DECODE_KEYS)
+    return hashlib.sha1(raw_stream).hexdigest(), entries, round(scale, 4)
+
+
+def resolve_references(pdf_doc, text, depth=REFERENCE_DEPTH):
+    """把PDF对象文本中的间接引用替换为被引用对象内容的哈希，超过 depth 层的引用保持原样"""
+    if depth <= 0:
+        return text
+
+    def resolve(match):
+        ref = int(match.group(1))
+        digest = hashlib.sha1(resolve_references(pdf_doc, pdf_doc.xref_object(ref, compressed=True),
+                                                 depth - 1).encode("utf-8"))
+        if pdf_doc.xref_is_stream(ref):
+            digest.update(pdf_doc.xref_stream_raw(ref))
+        return digest.hexdigest()
+
+    return re.sub(r"(\d+) 0 R", resolve, text)
+
+
+def replace_image_stream(pdf_doc, xref, jpeg_bytes, width, height, colorspace):
+    """用JPEG数据原地替换图像对象，所有引用该图像的页面同时生效"""
+    pdf_doc.update_stream(xref, jpeg_bytes, compress=False)
+    pdf_doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    pdf_doc.xref_set_key(xref, "DecodeParms", "null")
+    pdf_doc.xref_set_key(xref, "Decode", "null")
+    pdf_doc.xref_set_key(xref, "Width", str(width))
+    pdf_doc.xref_set_key(xref, "Height", str(height))
+    pdf_doc.xref_set_key(xref, "BitsPerComponent", "8")
+    pdf_doc.xref_set_key(xref, "ColorSpace", colorspace)
+
+
+def recompress_pdf_images(input_path, output_path, options, progress_callback=None):
+    """只重新压缩分辨率超过目标DPI的图像，保留文字和矢量内容
+
+    内容相同的图像只编码一次，保存时用 garbage=4 合并重复的对象和数据流。
+
+    Returns:
+        int: 被替换的图像数量
+    """
+    pdf_doc = fitz.open(input_path)
+    try:
+        image_dpi = collect_image_dpi(pdf_doc, progress_callback)
+
+        # 收集图像的位深和蒙版信息
+        image_details = {}
+        for page_num in range(len(pdf_doc)):
+            for item in pdf_doc.get_page_images(page_num, full=True):
+                xref, smask, width, height, bpc = item[:5]
+                image_details[xref] = (bpc, smask)
+
+        # 按原始数据流内容和解码参数缓存编码结果，重复的图像只编码一次
+        encoded_cache = {}
+        replaced_count = 0
+        total_images = len(image_dpi)
+        for index, (xref, dpi) in enumerate(sorted(image_dpi.items())):
+            report_progress(progress_callback, index + 1, total_images,
+                            f"处理图像 {index + 1}/{total_images}...")
+
+            if not options.optimize_images or dpi <= options.image_dpi * DOWNSAMPLE_THRESHOLD:
+                continue
+            bpc, smask = image_details.get(xref, (0, 0))
+            if not is_recompressible(pdf_doc, xref, bpc, smask):
+                continue
+
+            raw_stream = pdf_doc.xref_stream_raw(xref)
+            cache_key = image_cache_key(pdf_doc, xref, raw_stream, options.image_dpi / dpi)
+            if cache_key not in encoded_cache:
+                encoded_cache[cache_key] = encode_downsampled_image(
+                    pdf_doc, xref, options.image_dpi / dpi, options.image_quality)
+            encoded = encoded_cache[cache_key]
+
+            # 重新编码后反而变大时保留原图
+            if encoded is None or len(encoded[0]) >= len(raw_stream):
+                continue
+
+            replace_image_stream(pdf_doc, xref, *encoded)
+            replaced_count += 1
+
+        # 处理元数据
+        if options.remove_metadata:
+            pdf_doc.set_metadata({})
+            pdf_doc.del_xml_metadata()
+
+        pdf_doc.save(output_path, garbage=4, deflate=True)
+    finally:
+        pdf_doc.close()
+
+    return replaced_count
+
+
+def compress_job(pdf_path, output_path, options, replace=False, progress_callback=None, cache=None):
+    """压缩一个文件并在需要时替换原文件，所有错误都记录在返回结果中
+
+    该函数既在当前进程中调用，也作为进程池的任务在子进程中执行。
+
+    Args:
+        cache: ResultCache，为空时不使用结果缓存
+
+    Returns:
+        CompressResult: 压缩结果
+    """
+    result = CompressResult(pdf_path=pdf_path, output_path=pdf_path if replace else output_path)
+    try:
+        # 记录原始文件大小
+        result.size_before = os.path.getsize(pdf_path)
+
+        start_time = time.time()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(file_digest(pdf_path), "compress", options)
+            result.cache_hit = cache.fetch(cache_key, {"output.pdf": output_path})
+
+        if result.cache_hit:
+            result.note = "命中结果缓存"
+        else:
+            effective = compress_pdf_file(pdf_path, output_path, options, progress_callback)
+            if options.target_size:
+                result.note = f"目标大小模式: DPI {effective.image_dpi}，图像质量 {effective.image_quality}"
+            if cache_key:
+                cache.store(cache_key, {"output.pdf": output_path})
+        result.elapsed = time.time() - start_time
+
+        result.size_after = os.path.getsize(output_path)
+        if options.target_size and result.size_after > options.target_size:
+            result.note += f"，最低设置下仍超出目标大小 {format_size(options.target_size)}"
+    except Exception as e:
+        result.error = f"处理文件时出错: {str(e)}"
+        if replace:
+            _remove_quietly(output_path)
+        return result
+
+    # 如果是替换原文件模式，进行替换（每个文件使用各自的临时文件和备份文件）
+    if replace:
+        try:
+            replace_original(pdf_path, output_path)
+        except Exception as e:
+            result.error = f"替换文件时出错: {str(e)}"
+            # 原文件保持不变，不留下临时文件
+            _remove_quietly(output_path)
+    return result
+
+
+def _remove_quietly(file_path):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def compress_batch(pdf_paths, options, output_dir=None, workers=None,
+                   result_callback=None, progress_callback=None, cache=None, size_hints=None):
+    """批量压缩PDF文件
+
+    多个文件时使用进程池并行压缩，按文件大小从大到小提交任务，
+    让最耗时的文件尽早开始，减少最后只剩一个大文件在运行的情况。
+
+    Args:
+        pdf_paths: 输入PDF路径列表
+        options: 已应用压缩级别的 CompressOptions
+        output_dir: 输出目录，为空表示替换原文件
+        workers: 最大并行进程数，None 表示使用CPU核心数
+        result_callback: 每完成一个文件调用一次 (CompressResult, 已完成数, 总数)
+        progress_callback: 只用一个进程时的逐页进度回调
+        cache: ResultCache，为空时不使用结果缓存
+        size_hints: {文件路径: 大小}，如扫描文件夹时已得到的大小，缺少的文件再读取
+
+    Returns:
+        BatchSummary: 汇总结果
+    """
+    pdf_paths = list(pdf_paths)
+    replace = not output_dir
+    output_paths = assign_output_paths(pdf_paths, output_dir)
+    summary = BatchSummary(total_files=len(pdf_paths))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(pdf_paths)))
+
+    def collect(result, processed):
+        if result.cache_hit is not None:
+            if result.cache_hit:
+                summary.cache_hits += 1
+            else:
+                summary.cache_misses += 1
+        if result.error is None:
+            summary.success_count += 1
+            summary.total_size_before += result.size_before
+            summary.total_size_after += result.size_after
+        if result_callback:
+            result_callback(result, processed, summary.total_files)
+
+    if workers <= 1:
+        for processed, pdf_path in enumerate(pdf_paths, 1):
+            collect(compress_job(pdf_path, output_paths[pdf_path], options, replace, progress_callback, cache),
+                    processed)
+        return summary
+
+    # 大文件优先
+    ordered_paths = sorted(pdf_paths, key=lambda path: file_size_hint(path, size_hints), reverse=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(compress_job, pdf_path, output_paths[pdf_path], options, replace, None, cache): pdf_path
+            for pdf_path in ordered_paths
+        }
+        for processed, future in enumerate(as_completed(futures), 1):
+            pdf_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 子进程异常退出等无法在任务内部捕获的错误
+                result = CompressResult(pdf_path=pdf_path, output_path=output_paths[pdf_path],
+                                        error=f"处理文件时出错: {str(e)}")
+            collect(result, processed)
+
+    return summary
@@ -0,0 +1,158 @@
+"""把渲染好的页面逐页追加到一个输出文件中
+
+支持多页TIFF和不压缩的ZIP/TAR包。页面先由渲染进程写到本地临时目录，
+再由本模块从磁盘流式追加到容器文件，内存中始终只有一页（TIFF）或一个读写缓冲区（ZIP/TAR）。
+输出目录在网络共享上时，只需要创建一个文件。
+"""
+import os
+import tarfile
+import zipfile
+from abc import ABC, abstractmethod
+
+from PIL import Image, TiffImagePlugin
+
+from core.tiling import MAX_UNTILED_PIXELS
+
+# 输出方式: 扩展名
+CONTAINER_EXTENSIONS = {
+    "tiff": "tiff",
+    "zip": "zip",
+    "tar": "tar",
+}
+
+
+def container_output_path(output_dir, base_filename, container):
+    """按"原文件名.容器扩展名"生成输出路径"""
+    return os.path.join(output_dir, f"{base_filename}.{CONTAINER_EXTENSIONS[container]}")
+
+
+class PageContainer(ABC):
+    """页面容器的公共部分：记录成功写入的页数和失败的页面"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.written = 0
+        self.failures = []  # [(页码, 错误信息)]
+
+    def add(self, page_num, file_path, arcname):
+        """追加一页，file_path 为临时文件，写入后删除"""
+        try:
+            self._write(page_num, file_path, arcname)
+            self.written += 1
+        except Exception as e:
+            self.failures.append((page_num, str(e)))
+        finally:
+            _remove_quietly(file_path)
+
+    def skip(self, page_num):
+        """该页渲染失败，不会再追加"""
+
+    @abstractmethod
+    def close(self):
+        """写完所有页面后关闭输出文件"""
+
+    @abstractmethod
+    def _write(self, page_num, file_path, arcname):
+        """把一页的临时文件写入容器，失败时抛出异常"""
+
+
+class ZipPageContainer(PageContainer):
+    """不压缩的ZIP包，页面按完成顺序追加"""
+
+    def __init__(self, output_path):
+        super().__init__(output_path)
+        self.archive = zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def _write(self, page_num, file_path, arcname):
+        self.archive.write(file_path, arcname)
+
+    def close(self):
+        self.archive.close()
+
+
+class TarPageContainer(PageContainer):
+    """TAR包，页面按完成顺序追加"""
+
+    def __init__(self, output_path):
+        super().__init__(output_path)
+        self.archive = tarfile.open(output_path, "w")
+
+    def _write(self, page_num, file_path, arcname):
+        self.archive.add(file_path, arcname=arcname)
+
+    def close(self):
+        self.archive.close()
+
+
+class TiffPageContainer(PageContainer):
+    """多页TIFF，按页码顺序追加，每页使用Deflate压缩（1位黑白页面使用CCITT G4）
+
+    渲染进程的完成顺序不固定，提前完成的页面留在临时目录中，轮到它时再写入。
+    """
+
+    def __init__(self, output_path, pages, dpi=None):
+        super().__init__(output_path)
+        self.order = list(pages)
+        self.next_index = 0
+        self.pending = {}  # {页码: 临时文件路径}，None 表示该页已跳过
+        self.dpi = dpi
+        self.tiff = TiffImagePlugin.AppendingTiffWriter(output_path, True)
+
+    def add(self, page_num, file_path, arcname):
+        self.pending[page_num] = file_path
+        self._flush()
+
+    def skip(self, page_num):
+        self.pending[page_num] = None
+        self._flush()
+
+    def _flush(self):
+        while self.next_index < len(self.order) and self.order[self.next_index] in self.pending:
+            page_num = self.order[self.next_index]
+            file_path = self.pending.pop(page_num)
+            self.next_index += 1
+            if file_path is not None:
+                super().add(page_num, file_path, None)
+
+    def _write(self, page_num, file_path, arcname):
+        with Image.open(file_path) as img:
+            if img.width * img.height > MAX_UNTILED_PIXELS:
+                raise ValueError(f"页面为 {img.width}×{img.height} 像素，过大无法写入多页TIFF，请改为每页一个文件")
+            # 黑白页面使用CCITT G4压缩，其余页面使用Deflate
+            save_options = {"compression": "group4" if img.mode == "1" else "tiff_deflate"}
+            if self.dpi:
+                save_options["dpi"] = (self.dpi, self.dpi)
+            img.save(self.tiff, format="TIFF", **save_options)
+        self.tiff.newFrame()
+
+    def close(self):
+        # 正常情况下所有页面都已写入，这里处理渲染中途出错后剩下的页面
+        for page_num in list(self.pending):
+            file_path = self.pending.pop(page_num)
+            if file_path is not None:
+                _remove_quietly(file_path)
+                self.failures.append((page_num, "之前的页面未完成，无法按顺序写入"))
+        self.tiff.close()
+
+
+def open_page_container(container, output_path, pages, dpi=None):
+    """创建指定类型的页面容器
+
+    Args:
+        container: "tiff"、"zip" 或 "tar"
+        pages: 将要写入的页码（多页TIFF按该顺序排列页面）
+    """
+    if container == "tiff":
+        return TiffPageContainer(output_path, pages, dpi)
+    if container == "zip":
+        return ZipPageContainer(output_path)
+    if container == "tar":
+        return TarPageContainer(output_path)
+    raise ValueError(f"不支持的输出方式: {container}")
+
+
+def _remove_quietly(file_path):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
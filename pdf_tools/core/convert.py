@@ -0,0 +1,311 @@
+"""图片格式转换的核心实现"""
+import os
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from core.options import ConvertOptions
+from core.cache import file_digest
+from core.filelist import file_size_hint
+
+# 支持的图片扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp')
+
+# 快速缩放时整数倍缩小后保留的最小倍数（相对目标尺寸）
+REDUCE_GAP = 2
+
+
+@dataclass
+class ConvertResult:
+    """单个图片的转换结果"""
+    file_path: str
+    output_path: Optional[str] = None
+    error: Optional[str] = None
+    skipped: bool = False  # 不符合源格式筛选条件
+    cache_hit: Optional[bool] = None  # 未使用缓存时为None
+
+
+@dataclass
+class ConvertSummary:
+    """批量转换的汇总结果"""
+    total_files: int = 0
+    success_count: int = 0
+    skipped_count: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def matches_input_format(file_path, input_format):
+    """检查文件是否符合源格式筛选条件（"全部" 表示不筛选）"""
+    input_format = input_format.lower()
+    if input_format == "全部":
+        return True
+
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if input_format == "jpg":
+        return file_ext in ['.jpg', '.jpeg']
+    return file_ext == f".{input_format}"
+
+
+def calculate_resize(size, width=None, height=None, keep_ratio=True):
+    """计算调整后的图像尺寸
+
+    Args:
+        size: 原始尺寸 (宽, 高)
+        width: 目标宽度，可以为空
+        height: 目标高度，可以为空
+        keep_ratio: 是否保持比例
+
+    Returns:
+        tuple: 新尺寸 (宽, 高)
+    """
+    current_width, current_height = size
+    new_width, new_height = width, height
+
+    # 如果保持比例且只指定了宽度或高度
+    if keep_ratio:
+        if width and not height:
+            ratio = width / current_width
+            new_height = int(current_height * ratio)
+        elif height and not width:
+            ratio = height / current_height
+            new_width = int(current_width * ratio)
+        elif width and height:
+            # 使用较小的缩放比例以确保图像完全适合指定的尺寸
+            ratio_width = width / current_width
+            ratio_height = height / current_height
+            ratio = min(ratio_width, ratio_height)
+            new_width = int(current_width * ratio)
+            new_height = int(current_height * ratio)
+
+    return new_width or current_width, new_height or current_height
+
+
+def fast_downscale(img, new_size):
+    """先用整数倍缩小再精细缩放，比直接对原图做LANCZOS快得多
+
+    JPEG需要在加载前调用 img.draft，解码时就按1/2、1/4或1/8缩小。
+    整数倍缩小后至少保留目标尺寸的2倍，再用LANCZOS缩放到目标尺寸，画质与直接缩放接近。
+    """
+    target_width, target_height = max(1, new_size[0]), max(1, new_size[1])
+    factor = min(img.width // (target_width * REDUCE_GAP), img.height // (target_height * REDUCE_GAP))
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img.resize(new_size, Image.LANCZOS)
+
+
+def unique_output_path(output_dir, base_filename, output_format, used_paths=None):
+    """生成不与已有文件重名的输出路径，重名时添加序号
+
+    Args:
+        used_paths: 已分配但还没写出的路径（normcase后），批量转换时避免并行任务互相覆盖
+    """
+    def taken(path):
+        return os.path.exists(path) or (used_paths is not None and os.path.normcase(path) in used_paths)
+
+    output_path = os.path.join(output_dir, f"{base_filename}.{output_format}")
+
+    counter = 1
+    while taken(output_path):
+        output_path = os.path.join(output_dir, f"{base_filename}_{counter}.{output_format}")
+        counter += 1
+    return output_path
+
+
+def assign_output_paths(file_paths, output_dir, output_format):
+    """按列表顺序为每个输入文件分配输出路径
+
+    Returns:
+        dict: {输入路径: 输出路径}
+    """
+    output_format = output_format.lower()
+    output_paths = {}
+    used_paths = set()
+    for file_path in file_paths:
+        base_filename = os.path.splitext(os.path.basename(file_path))[0]
+        output_path = unique_output_path(output_dir, base_filename, output_format, used_paths)
+        used_paths.add(os.path.normcase(output_path))
+        output_paths[file_path] = output_path
+    return output_paths
+
+
+def save_image(img, output_path, output_format, quality):
+    """根据输出格式保存图像"""
+    if output_format in ['jpg', 'jpeg']:
+        img.save(output_path, format='JPEG', quality=quality, optimize=True)
+    elif output_format == 'png':
+        img.save(output_path, format='PNG', optimize=True)
+    elif output_format == 'gif':
+        img.save(output_path, format='GIF')
+    elif output_format == 'bmp':
+        img.save(output_path, format='BMP')
+    elif output_format in ['tiff', 'tif']:
+        img.save(output_path, format='TIFF')
+    elif output_format == 'webp':
+        img.save(output_path, format='WEBP', quality=quality)
+    else:
+        img.save(output_path)
+
+
+def convert_image(file_path, output_dir, options=None, cache=None, output_path=None):
+    """转换单个图片文件
+
+    Args:
+        file_path: 源图片路径
+        output_dir: 输出目录
+        options: ConvertOptions，为空时使用默认参数
+        cache: ResultCache，为空时不使用结果缓存
+        output_path: 预先分配的输出路径，为空时在输出目录中生成不重名的路径
+
+    Returns:
+        str: 输出文件路径
+    """
+    if options is None:
+        options = ConvertOptions()
+
+    output_format = options.output_format.lower()
+    if output_path is None:
+        base_filename = os.path.splitext(os.path.basename(file_path))[0]
+        output_path = unique_output_path(output_dir, base_filename, output_format)
+
+    cache_key = None
+    cache_entry_name = f"image.{output_format}"
+    if cache is not None:
+        # 源格式筛选不影响转换结果
+        params = dataclasses.replace(options, input_format="全部", output_format=output_format)
+        cache_key = cache.make_key(file_digest(file_path), "convert", params)
+        if cache.fetch(cache_key, {cache_entry_name: output_path}):
+            return output_path
+
+    # 打开图片
+    img = Image.open(file_path)
+
+    new_size = None
+    if options.width or options.height:
+        new_size = calculate_resize(img.size, options.width, options.height, options.keep_ratio)
+        if options.fast_resize and img.format == 'JPEG':
+            # 按比例降采样解码，解码后的尺寸不小于 REDUCE_GAP 倍的目标尺寸
+            img.draft(img.mode, (new_size[0] * REDUCE_GAP, new_size[1] * REDUCE_GAP))
+
+    # 如果是PNG带透明通道，并且转为JPG，需要处理背景
+    if img.mode == 'RGBA' and output_format in ['jpg', 'jpeg']:
+        # 创建白色背景
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        # 合并图层
+        background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
+        img = background
+
+    # 调整图像大小
+    if new_size:
+        if options.fast_resize:
+            img = fast_downscale(img, new_size)
+        else:
+            img = img.resize(new_size, Image.LANCZOS)
+
+    save_image(img, output_path, output_format, options.quality)
+    if cache_key:
+        cache.store(cache_key, {cache_entry_name: output_path})
+    return output_path
+
+
+def convert_job(file_path, output_path, options, cache=None):
+    """转换一个文件，所有错误都记录在返回结果中
+
+    该函数既在当前进程中调用，也作为进程池的任务在子进程中执行。
+
+    Returns:
+        ConvertResult: 转换结果
+    """
+    result = ConvertResult(file_path=file_path, output_path=output_path)
+    hits_before = cache.hits if cache is not None else 0
+    try:
+        convert_image(file_path, os.path.dirname(output_path), options, cache, output_path)
+    except Exception as e:
+        result.error = f"转换失败 {os.path.basename(file_path)}: {str(e)}"
+    if cache is not None:
+        result.cache_hit = cache.hits > hits_before
+    return result
+
+
+def convert_batch(file_paths, output_dir, options=None, workers=None, result_callback=None, cache=None,
+                  size_hints=None):
+    """批量转换图片
+
+    多个文件时使用进程池，解码、缩放和编码都在子进程中进行，
+    按文件大小从大到小提交任务，结果按完成顺序通过 result_callback 返回（在调用线程中执行）。
+
+    Args:
+        file_paths: 输入图片路径列表
+        output_dir: 输出目录
+        options: ConvertOptions，为空时使用默认参数
+        workers: 最大并行进程数，None 表示使用CPU核心数
+        result_callback: 每处理完一个文件调用一次 (ConvertResult, 已完成数, 总数)
+        cache: ResultCache，为空时不使用结果缓存
+        size_hints: {文件路径: 大小}，如扫描文件夹时已得到的大小，缺少的文件再读取
+
+    Returns:
+        ConvertSummary: 汇总结果
+    """
+    if options is None:
+        options = ConvertOptions()
+
+    file_paths = list(file_paths)
+    summary = ConvertSummary(total_files=len(file_paths))
+    processed = 0
+
+    def collect(result):
+        nonlocal processed
+        processed += 1
+        if result.skipped:
+            summary.skipped_count += 1
+        elif result.error is None:
+            summary.success_count += 1
+        if result.cache_hit is not None:
+            if result.cache_hit:
+                summary.cache_hits += 1
+            else:
+                summary.cache_misses += 1
+        if result_callback:
+            result_callback(result, processed, summary.total_files)
+
+    selected = []
+    for file_path in file_paths:
+        if matches_input_format(file_path, options.input_format):
+            selected.append(file_path)
+        else:
+            collect(ConvertResult(file_path=file_path, skipped=True))
+
+    # 输出路径在提交任务前统一分配，避免同名文件在并行写出时互相覆盖
+    output_paths = assign_output_paths(selected, output_dir, options.output_format)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(selected)))
+
+    if workers <= 1:
+        for file_path in selected:
+            collect(convert_job(file_path, output_paths[file_path], options, cache))
+        return summary
+
+    # 大文件优先
+    ordered_paths = sorted(selected, key=lambda path: file_size_hint(path, size_hints), reverse=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_job, file_path, output_paths[file_path], options, cache): file_path
+            for file_path in ordered_paths
+        }
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 子进程异常退出等无法在任务内部捕获的错误
+                result = ConvertResult(file_path=file_path, output_path=output_paths[file_path],
+                                       error=f"转换失败 {os.path.basename(file_path)}: {str(e)}")
+            collect(result)
+
+    return summary
@@ -0,0 +1,163 @@
+"""各标签页共用的有序文件列表
+
+列表保持添加顺序，同时用 {规范化路径: 位置} 的索引表判断重复、查找位置，
+大量添加文件时不再逐个在列表中线性查找。
+扫描文件夹得到的大小和页数提示也保存在这里，批量处理时用来安排顺序。
+"""
+import os
+
+
+def path_key(path):
+    """用于判断重复的规范化路径（统一分隔符，Windows上不区分大小写）"""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def file_size_hint(path, size_hints=None):
+    """文件大小，优先使用已知的大小提示，无法读取时返回0"""
+    if size_hints and path in size_hints:
+        return size_hints[path]
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class FileSet:
+    """不含重复项的有序文件列表，支持按位置访问、交换和批量删除
+
+    删除时只把位置标记为空（墓碑），判断重复和删除都是O(1)；
+    空位在下一次按位置访问时一次性压缩，或在空位超过一半时压缩，
+    因此连续删除再刷新列表时，整个列表只重排一次。
+    """
+
+    def __init__(self, paths=()):
+        self._paths = []  # 已删除的位置为None
+        self._keys = []  # 与 _paths 对应的规范化路径，压缩时不必重新计算
+        self._index = {}  # {规范化路径: 在 _paths 中的位置}
+        self._removed = 0
+        self._hints = {}
+        self.extend(paths)
+
+    def __len__(self):
+        return len(self._paths) - self._removed
+
+    def __iter__(self):
+        return (path for path in self._paths if path is not None)
+
+    def __getitem__(self, index):
+        self._compact()
+        return self._paths[index]
+
+    def __contains__(self, path):
+        return path_key(path) in self._index
+
+    def _compact(self):
+        """去掉已删除的空位并重建索引"""
+        if not self._removed:
+            return
+        self._paths = [path for path in self._paths if path is not None]
+        self._keys = [key for key in self._keys if key is not None]
+        self._index = {key: position for position, key in enumerate(self._keys)}
+        self._removed = 0
+
+    def index(self, path):
+        """文件在列表中的位置，不存在时抛出 ValueError"""
+        key = path_key(path)
+        if key not in self._index:
+            raise ValueError(f"{path} 不在文件列表中")
+        self._compact()
+        return self._index[key]
+
+    def add(self, path):
+        """添加文件，已存在时忽略
+
+        Returns:
+            bool: 是否新添加
+        """
+        key = path_key(path)
+        if key in self._index:
+            return False
+        self._index[key] = len(self._paths)
+        self._paths.append(path)
+        self._keys.append(key)
+        return True
+
+    def extend(self, paths):
+        """按顺序添加多个文件
+
+        Returns:
+            list: 新添加的文件（已存在的被跳过）
+        """
+        return [path for path in paths if self.add(path)]
+
+    def _remove_slot(self, slot):
+        key = self._keys[slot]
+        path = self._paths[slot]
+        del self._index[key]
+        self._hints.pop(key, None)
+        self._paths[slot] = None
+        self._keys[slot] = None
+        self._removed += 1
+        return path
+
+    def _compact_if_sparse(self):
+        # 空位过多时提前压缩，避免列表长期占用删除前的空间
+        if self._removed > len(self._paths) // 2:
+            self._compact()
+
+    def remove_indices(self, indices):
+        """删除指定位置的文件，每个位置O(1)，空位留到下次按位置访问时压缩
+
+        Returns:
+            list: 被删除的文件，按位置顺序排列
+        """
+        positions = sorted(set(indices))
+        if not positions:
+            return []
+        # 位置是压缩后的位置
+        self._compact()
+        removed = [self._remove_slot(position) for position in positions]
+        self._compact_if_sparse()
+        return removed
+
+    def remove(self, path):
+        """删除一个文件，不存在时抛出 ValueError"""
+        key = path_key(path)
+        if key not in self._index:
+            raise ValueError(f"{path} 不在文件列表中")
+        self._remove_slot(self._index[key])
+        self._compact_if_sparse()
+
+    def swap(self, pos1, pos2):
+        """交换两个位置的文件"""
+        self._compact()
+        paths, keys = self._paths, self._keys
+        paths[pos1], paths[pos2] = paths[pos2], paths[pos1]
+        keys[pos1], keys[pos2] = keys[pos2], keys[pos1]
+        self._index[keys[pos1]] = pos1
+        self._index[keys[pos2]] = pos2
+
+    def clear(self):
+        self._paths = []
+        self._keys = []
+        self._index = {}
+        self._removed = 0
+        self._hints = {}
+
+    def set_hints(self, entries):
+        """保存扫描得到的文件信息（core.scanner.ScanEntry）"""
+        for entry in entries:
+            self._hints[path_key(entry.path)] = entry
+
+    def hint(self, path):
+        """文件的扫描信息，没有扫描过时返回None"""
+        return self._hints.get(path_key(path))
+
+    def size_hints(self):
+        """{文件路径: 扫描时得到的文件大小}，供批量处理按大小安排顺序"""
+        hints = {}
+        for path, key in zip(self._paths, self._keys):
+            entry = self._hints.get(key) if key is not None else None
+            if entry is not None:
+                hints[path] = entry.size
+        return hints
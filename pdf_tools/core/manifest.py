@@ -0,0 +1,88 @@
+"""增量导出清单
+
+每个输出目录保存一个清单文件，记录每个输出文件来自哪个源文件内容（SHA-256）、
+哪一页和什么参数。再次导出时，清单中记录一致且输出文件仍然存在的页面直接跳过。
+
+源文件的哈希按路径、大小和修改时间缓存在清单中，文件没有变化时不重新计算。
+"""
+import os
+import json
+
+from core.cache import file_digest, normalize_params
+
+MANIFEST_NAME = ".pdf_tools_manifest.json"
+# 清单格式或渲染结果变化导致旧记录不再适用时增加该版本号
+MANIFEST_VERSION = 1
+
+
+class ExportManifest:
+    """输出目录的增量导出清单，批量导出时加载一次，结束时调用 save()"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.sources = {}
+        self.outputs = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # 没有清单或清单损坏时从头开始
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.sources = data.get("sources", {})
+        self.outputs = data.get("outputs", {})
+
+    def source_digest(self, source_path):
+        """源文件内容的SHA-256，大小和修改时间没变时使用清单中的记录"""
+        stat = os.stat(source_path)
+        key = os.path.normcase(os.path.abspath(source_path))
+        record = self.sources.get(key)
+        if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+            return record["digest"]
+
+        digest = file_digest(source_path)
+        self.sources[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+        self.dirty = True
+        return digest
+
+    def is_current(self, filename, digest, page_num, params):
+        """输出文件是否由同一源文件内容、同一页、同样参数生成且未被改动"""
+        record = self.outputs.get(filename)
+        if (not record or record["digest"] != digest or record["page"] != page_num
+                or record["params"] != normalize_params(params)):
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.output_dir, filename)) == record["size"]
+        except OSError:
+            return False
+
+    def record(self, filename, digest, page_num, params):
+        """记录新生成的输出文件"""
+        try:
+            size = os.path.getsize(os.path.join(self.output_dir, filename))
+        except OSError:
+            return
+        self.outputs[filename] = {
+            "digest": digest,
+            "page": page_num,
+            "params": normalize_params(params),
+            "size": size
+        }
+        self.dirty = True
+
+    def save(self):
+        """有变化时写回清单，先写临时文件再替换，中途出错不会留下损坏的清单"""
+        if not self.dirty:
+            return
+        temp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "sources": self.sources, "outputs": self.outputs},
+                      f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self.dirty = False
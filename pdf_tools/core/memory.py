@@ -0,0 +1,65 @@
+"""进程峰值内存（峰值常驻内存）统计"""
+import sys
+
+
+def _windows_peak_rss():
+    """通过 GetProcessMemoryInfo 获取当前进程的峰值工作集"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except Exception:
+        return None
+
+
+def peak_rss(children=False):
+    """获取峰值常驻内存（字节）
+
+    Args:
+        children: 为True时返回已结束的子进程中最大的峰值（Windows上无法获取）
+
+    Returns:
+        int: 峰值内存字节数，无法获取时返回None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None if children else _windows_peak_rss()
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux上单位为KB，macOS上为字节
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def memory_report():
+    """生成峰值内存的日志信息"""
+    parts = []
+    self_peak = peak_rss()
+    if self_peak:
+        parts.append(f"主进程 {self_peak / (1024 * 1024):.1f} MB")
+    children_peak = peak_rss(children=True)
+    if children_peak:
+        parts.append(f"子进程 {children_peak / (1024 * 1024):.1f} MB")
+    if not parts:
+        return "峰值内存: 无法获取"
+    return "峰值内存: " + "，".join(parts)
@@ -0,0 +1,866 @@
+"""PDF和图片合并的核心实现"""
+import os
+import io
+from collections import OrderedDict
+
+from PyPDF2 import PdfMerger, PdfReader, PdfWriter
+from PIL import Image
+import fitz  # PyMuPDF
+
+from core.options import MergeOptions
+from core.progress import report_progress, report_warning
+from core.pixmap import render_pixmap, pixmap_to_image
+from core.pipeline import ordered_map
+
+# A4尺寸（点）精确值
+A4_PORTRAIT = (595.28, 841.89)
+A4_LANDSCAPE = (841.89, 595.28)
+
+# 手动调整模式下的预定义页面尺寸（纵向，单位：点）
+MANUAL_PAGE_SIZES = {
+    "A4": (595.28, 841.89),
+    "A5": (419.53, 595.28),
+    "Letter": (612.0, 792.0),
+    "Legal": (612.0, 1008.0),
+}
+
+# 栅格化合并的渲染分辨率，也用于由图片像素尺寸换算页面尺寸
+RASTER_DPI = 300
+
+# 合并时嵌入图片的最高分辨率，超出时才缩小图片
+MAX_IMAGE_DPI = 300
+
+# 流式合并时每攒够这么多页就写出一次
+STREAM_FLUSH_PAGES = 50
+
+# 合并过程中同时打开的源PDF句柄数上限
+MAX_OPEN_DOCUMENTS = 16
+
+
+def is_pdf_file(file_path):
+    """根据扩展名判断是否为PDF文件"""
+    return file_path.lower().endswith('.pdf')
+
+
+def open_pdf(file_path, warning_callback=None):
+    """用 fitz 打开PDF文件
+
+    打开失败时区分文件无法读取（如文件句柄数超限、没有权限）和文件内容无效：
+    MuPDF对两者报告相同的错误，这里再直接读取文件头来判断。
+
+    Raises:
+        Exception: 错误信息中包含实际的错误原因
+    """
+    name = os.path.basename(file_path)
+    try:
+        doc = fitz.open(file_path)
+        if doc.is_pdf:
+            return doc
+        doc.close()
+        reason = "文件内容不是PDF格式"
+    except Exception as e:
+        reason = describe_open_error(file_path, e)
+
+    report_warning(warning_callback, f"无法打开文件 '{name}': {reason}")
+    raise Exception(f"无法打开文件 '{name}': {reason}")
+
+
+def describe_open_error(file_path, error):
+    """说明 fitz.open 失败的实际原因"""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(1024)
+    except OSError as e:
+        # 文件本身无法读取，与PDF内容无关
+        return str(e)
+    if b"%PDF-" not in header:
+        return f"不是有效的PDF文件: {str(error)}"
+    return f"PDF文件已损坏或无法解析: {str(error)}"
+
+
+class DocumentRegistry:
+    """合并输入文件的文档句柄登记表
+
+    PDF在第一次用到时才打开和校验，每个文件从打开到处理完只打开一次，
+    不会在开始合并前把所有输入文件先打开一遍。
+    最多同时保留 max_open 个句柄，超出时关闭最久未使用的句柄，避免超过系统的文件句柄上限；
+    只有同一个文件在列表中出现多次、且句柄已被关闭时才会重新打开。
+
+    总页数 total_pages 中尚未打开的PDF按一页计算，打开后更新为实际页数，
+    进度的总数会随处理逐步修正。图片按一页计算，不在这里打开。
+    """
+
+    def __init__(self, file_paths, warning_callback=None, max_open=MAX_OPEN_DOCUMENTS):
+        self.max_open = max_open
+        self.warning_callback = warning_callback
+        self._counted = set()
+        self._remaining_uses = {}
+        self._open_docs = OrderedDict()
+        self.total_pages = 0
+        for file_path in file_paths:
+            self.total_pages += 1
+            if is_pdf_file(file_path):
+                self._remaining_uses[file_path] = self._remaining_uses.get(file_path, 0) + 1
+        self._uses = dict(self._remaining_uses)
+
+    def document(self, file_path):
+        """返回文档句柄，第一次使用时打开并校验，并按需关闭最久未使用的句柄
+
+        Raises:
+            Exception: 文件无法打开或不是有效的PDF文件
+        """
+        doc = self._open_docs.get(file_path)
+        if doc is not None:
+            self._open_docs.move_to_end(file_path)
+            return doc
+        while len(self._open_docs) >= self.max_open:
+            _, oldest = self._open_docs.popitem(last=False)
+            oldest.close()
+        doc = open_pdf(file_path, self.warning_callback)
+        if file_path not in self._counted:
+            # 同一个文件出现多次时每次都按实际页数计算
+            self._counted.add(file_path)
+            self.total_pages += (len(doc) - 1) * self._uses[file_path]
+        self._open_docs[file_path] = doc
+        return doc
+
+    def release(self, file_path):
+        """用完一次文档，最后一次使用后关闭句柄"""
+        self._remaining_uses[file_path] -= 1
+        if self._remaining_uses[file_path] == 0 and file_path in self._open_docs:
+            self._open_docs.pop(file_path).close()
+
+    @property
+    def open_count(self):
+        """当前打开的句柄数"""
+        return len(self._open_docs)
+
+    def close(self):
+        for doc in self._open_docs.values():
+            doc.close()
+        self._open_docs.clear()
+
+
+class StreamingPdfWriter:
+    """逐批写出页面的输出文档
+
+    flush_pages 为空时所有页面都在内存中，结束时一次保存；否则每处理完一个源文件，
+    攒够 flush_pages 页就把这一批保存到输出文件并释放内存，之后的批次重新打开输出文件
+    （只读取交叉引用表）再增量追加。流式写出时先写到临时文件，完成后再改名。
+
+    重新打开输出文件后，PyMuPDF记录的已复制对象会清空，同一源文件跨批次的页面会把共享的
+    字体和图片再复制一份，所以只在源文件之间写出，一个源文件的页面总在同一批中。
+    内存占用与一批页面加上最大的单个源文件有关。
+    save_options 中的 garbage 只在第一批保存时合并重复对象，之后增量追加的批次不再去重，
+    不同源文件中内容相同的图片会各保存一份，输出文件可能比非流式合并大。
+    """
+
+    def __init__(self, output_path, flush_pages=None, **save_options):
+        self.output_path = output_path
+        self.flush_pages = flush_pages
+        self.save_options = save_options
+        self.doc = None
+        self.page_count = 0
+        self._pending_pages = 0
+        self._saved = False
+        self._write_path = f"{output_path}.partial" if flush_pages else output_path
+
+    def _document(self):
+        if self.doc is None:
+            self.doc = fitz.open(self._write_path) if self._saved else fitz.open()
+        return self.doc
+
+    def new_page(self, width, height):
+        """新建一页，页面内容绘制完成后需要调用 page_done"""
+        return self._document().new_page(width=width, height=height)
+
+    def page_done(self, count=1):
+        self.page_count += count
+        self._pending_pages += count
+
+    def file_done(self):
+        """一个源文件的页面全部写入后调用，攒够 flush_pages 页时写出"""
+        if self.flush_pages and self._pending_pages >= self.flush_pages:
+            self.flush()
+
+    def insert_pdf(self, src_doc, from_page=0, to_page=-1):
+        """从源文档复制页面"""
+        if to_page < 0:
+            to_page = len(src_doc) - 1
+        self._document().insert_pdf(src_doc, from_page=from_page, to_page=to_page)
+        self.page_done(to_page - from_page + 1)
+
+    def flush(self):
+        """把内存中的页面写到输出文件并关闭文档"""
+        if self.doc is None or self._pending_pages == 0:
+            return
+        if self._saved:
+            self.doc.save(self._write_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+        else:
+            self.doc.save(self._write_path, **self.save_options)
+            self._saved = True
+        self.doc.close()
+        self.doc = None
+        self._pending_pages = 0
+
+    def finish(self):
+        """写出剩余页面，流式写出时把临时文件改名为输出文件"""
+        self.flush()
+        if self._write_path != self.output_path:
+            os.replace(self._write_path, self.output_path)
+
+    def close(self):
+        """关闭未写出的文档，出错时清理临时文件"""
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+        if self._write_path != self.output_path and os.path.exists(self._write_path):
+            os.remove(self._write_path)
+
+
+def merge_files(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """按照合并参数把多个PDF和图片合并为一个PDF
+
+    Args:
+        file_paths: 按顺序排列的输入文件路径
+        output_path: 输出PDF路径
+        options: MergeOptions，为空时使用默认参数
+        progress_callback: 进度回调 (当前, 总数, 状态信息)
+        warning_callback: 单个文件处理失败但合并继续时的回调 (错误信息)
+    """
+    if options is None:
+        options = MergeOptions()
+
+    if options.layout_mode == "原样":
+        if options.force_a4:
+            merge_to_a4_size(file_paths, output_path, options, progress_callback, warning_callback)
+        elif options.streaming:
+            merge_original_size_streaming(file_paths, output_path, options, progress_callback, warning_callback)
+        else:
+            merge_original_size(file_paths, output_path, options, progress_callback, warning_callback)
+    elif options.layout_mode == "自动调整":
+        if options.rasterize:
+            merge_auto_adjust_raster(file_paths, output_path, options, progress_callback, warning_callback)
+        else:
+            merge_auto_adjust(file_paths, output_path, options, progress_callback, warning_callback)
+    else:  # 手动调整
+        if options.rasterize:
+            merge_manual_adjust_raster(file_paths, output_path, options, progress_callback, warning_callback)
+        else:
+            merge_manual_adjust(file_paths, output_path, options, progress_callback, warning_callback)
+
+
+def prepare_original_image(file_path):
+    """为原样合并准备一张图片，在预处理线程中执行，只使用PIL
+
+    PyMuPDF不是线程安全的，需要 fitz 的步骤留给写入线程（见 original_image_pdf）。
+
+    Returns:
+        tuple: ("jpeg", JPEG原始数据, 页面宽度, 页面高度) 表示基线JPEG原样嵌入；
+            ("pdf", 单页PDF数据) 表示已由PIL转换好的页面
+    """
+    with Image.open(file_path) as img:
+        # 基线JPEG直接嵌入原始数据，不解码也不重新编码
+        if is_passthrough_jpeg(img):
+            page_width, page_height = image_page_size(img)
+            with open(file_path, 'rb') as f:
+                return "jpeg", f.read(), page_width, page_height
+
+        pdf_bytes = io.BytesIO()
+
+        if img.mode == 'RGBA':
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3])
+            img = background
+
+        dpi = (300, 300)
+        if hasattr(img, 'info') and 'dpi' in img.info:
+            original_dpi = img.info['dpi']
+            dpi = (max(original_dpi[0], 300), max(original_dpi[1], 300))
+
+        img.convert('RGB').save(pdf_bytes, format='PDF', resolution=dpi[0], quality=100)
+        return "pdf", pdf_bytes.getvalue()
+
+
+def original_image_pdf(prepared):
+    """把 prepare_original_image 的结果转换为单页PDF数据，在写入线程中执行"""
+    if prepared[0] == "jpeg":
+        return jpeg_passthrough_pdf(*prepared[1:])
+    return prepared[1]
+
+
+def prepare_images(file_paths, prepare_image, options):
+    """并行预处理列表中的图片，按列表顺序产出 (文件路径, 预处理结果, 异常)
+
+    PDF文件不做预处理，结果为None，由调用方在写出时处理。
+    PyMuPDF不是线程安全的，prepare_image 只能使用PIL，不能调用 fitz。
+    """
+    def prepare(file_path):
+        return None if is_pdf_file(file_path) else prepare_image(file_path)
+
+    return ordered_map(prepare, file_paths, options.workers, options.prefetch_window)
+
+
+def merge_original_size(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """以原始尺寸合并文件，图片在线程池中并行转换，按列表顺序写入"""
+    if options is None:
+        options = MergeOptions()
+
+    merger = PdfMerger()
+
+    total_files = len(file_paths)
+
+    prepared = prepare_images(file_paths, prepare_original_image, options)
+    for i, (file_path, prepared_image, error) in enumerate(prepared):
+        report_progress(progress_callback, i + 1, total_files, f"处理: {os.path.basename(file_path)}")
+
+        if is_pdf_file(file_path):
+            # 处理PDF文件
+            try:
+                # 解析一次，验证后直接交给合并器，不再重新解析文件
+                reader = PdfReader(file_path)
+                # 如果能读取页面，则PDF文件有效
+                _ = len(reader.pages)
+                merger.append(reader)
+            except Exception as e:
+                reason = str(e) if isinstance(e, OSError) else f"不是有效的PDF文件: {str(e)}"
+                report_warning(warning_callback, f"无法打开文件 '{os.path.basename(file_path)}': {reason}")
+                raise Exception(f"无法打开文件 '{os.path.basename(file_path)}': {reason}")
+        else:
+            # 处理图片文件
+            if error is not None:
+                report_warning(warning_callback, f"无法打开图片文件 '{os.path.basename(file_path)}': {str(error)}")
+                continue
+            try:
+                image_pdf = original_image_pdf(prepared_image)
+            except Exception as e:
+                report_warning(warning_callback, f"无法转换图片文件 '{os.path.basename(file_path)}': {str(e)}")
+                continue
+            merger.append(io.BytesIO(image_pdf))
+
+    # 最终保存
+    merger.write(output_path)
+    merger.close()
+
+
+def image_page_size(img):
+    """按图片自带的DPI（至少300）计算原样合并时的页面尺寸（点）
+
+    与PIL保存PDF时一样，宽高都按水平DPI换算。
+    """
+    dpi = 300
+    if hasattr(img, 'info') and 'dpi' in img.info:
+        dpi = max(img.info['dpi'][0], 300)
+    return img.width * 72 / dpi, img.height * 72 / dpi
+
+
+def is_passthrough_jpeg(img):
+    """是否为可以原样嵌入的RGB或灰度基线JPEG"""
+    if img.format != 'JPEG' or img.mode not in ('RGB', 'L'):
+        return False
+    return not (img.info.get('progressive') or img.info.get('progression'))
+
+
+def jpeg_passthrough_pdf(jpeg_bytes, page_width, page_height):
+    """把基线JPEG的原始DCT数据原样放进一页PDF，页面尺寸与PIL转换时相同
+
+    Returns:
+        bytes: 单页PDF数据
+    """
+    doc = fitz.open()
+    try:
+        page = doc.new_page(width=page_width, height=page_height)
+        # PyMuPDF对JPEG数据直接使用DCTDecode，不重新编码
+        page.insert_image(page.rect, stream=jpeg_bytes)
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def merge_original_size_streaming(file_paths, output_path, options=None, progress_callback=None,
+                                  warning_callback=None):
+    """以原始尺寸流式合并文件
+
+    源文件逐个打开、复制后立即关闭，已完成的页面分批增量写出，
+    不像 PdfMerger 那样同时保留所有源文件。源文件中的书签不会合并到输出文件。
+    图片与非流式合并一样在线程池中转换（基线JPEG原样嵌入），输出的页面相同。
+    """
+    if options is None:
+        options = MergeOptions(streaming=True)
+
+    writer = StreamingPdfWriter(output_path, STREAM_FLUSH_PAGES, garbage=3, deflate=True)
+    total_files = len(file_paths)
+    try:
+        prepared = prepare_images(file_paths, prepare_original_image, options)
+        for i, (file_path, prepared_image, error) in enumerate(prepared):
+            report_progress(progress_callback, i + 1, total_files, f"处理: {os.path.basename(file_path)}")
+
+            if is_pdf_file(file_path):
+                src_doc = open_pdf(file_path, warning_callback)
+                try:
+                    writer.insert_pdf(src_doc)
+                finally:
+                    src_doc.close()
+            else:
+                if error is not None:
+                    report_warning(warning_callback, f"无法打开图片文件 '{os.path.basename(file_path)}': {str(error)}")
+                    continue
+                try:
+                    with fitz.open("pdf", original_image_pdf(prepared_image)) as image_doc:
+                        writer.insert_pdf(image_doc)
+                except Exception as e:
+                    report_warning(warning_callback, f"无法转换图片文件 '{os.path.basename(file_path)}': {str(e)}")
+                    continue
+            writer.file_done()
+
+        writer.finish()
+    finally:
+        writer.close()
+
+
+def merge_to_a4_size(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """以A4尺寸合并文件，保持内容原样"""
+    if options is None:
+        options = MergeOptions()
+
+    is_landscape = options.page_orientation == "横向"
+    is_mixed = options.page_orientation == "混合"
+
+    # 根据方向设置A4尺寸（精确值）
+    a4_width, a4_height = A4_LANDSCAPE if is_landscape else A4_PORTRAIT
+
+    # PDF在处理到时才打开和校验
+    registry = DocumentRegistry(file_paths, warning_callback)
+    report_progress(progress_callback, 0, registry.total_pages)
+
+    # 创建一个新的输出PDF文档，流式合并时分批写出
+    output_pdf = StreamingPdfWriter(output_path, STREAM_FLUSH_PAGES if options.streaming else None)
+    try:
+        merge_pages_to_a4(file_paths, registry, output_pdf, options, is_mixed, a4_width, a4_height,
+                          progress_callback, warning_callback)
+        # 保存最终合并后的PDF
+        output_pdf.finish()
+    finally:
+        output_pdf.close()
+        registry.close()
+
+
+def prepare_a4_image(file_path, is_mixed, a4_width, a4_height):
+    """计算图片在A4页面上的位置，需要时缩小图片，在预处理线程中执行，只使用PIL
+
+    Returns:
+        tuple: (页面宽度, 页面高度, 图片区域 (x0, y0, x1, y1), 缩小后的图片数据)，不需要缩小时图片数据为None
+    """
+    # 只读取图片头信息，像素数据只在需要缩小时才解码
+    with Image.open(file_path) as img:
+        # 判断图片方向
+        img_width, img_height = img.size
+
+        # 如果是混合模式，根据图片方向决定页面方向
+        if is_mixed:
+            page_width, page_height = A4_LANDSCAPE if img_width > img_height else A4_PORTRAIT
+        else:
+            # 使用全局设置的方向
+            page_width, page_height = a4_width, a4_height
+
+        # 计算图片与页面的比例
+        img_ratio = img_width / img_height
+        page_ratio = page_width / page_height
+
+        # 计算适当的缩放以适应页面
+        if img_ratio > page_ratio:  # 图片更宽
+            new_width = int(page_width - 40)  # 留出边距，确保转为整数
+            new_height = int(new_width / img_ratio)
+        else:  # 图片更高或等比例
+            new_height = int(page_height - 40)  # 留出边距，确保转为整数
+            new_width = int(new_height * img_ratio)
+
+        # 图片的中心位置，确保使用整数坐标
+        x0 = int((page_width - new_width) / 2)
+        y0 = int((page_height - new_height) / 2)
+        x1 = int((page_width + new_width) / 2)
+        y1 = int((page_height + new_height) / 2)
+        return page_width, page_height, (x0, y0, x1, y1), downscaled_image_stream(img, x1 - x0, y1 - y0)
+
+
+def merge_pages_to_a4(file_paths, registry, output_pdf, options, is_mixed, a4_width, a4_height,
+                      progress_callback=None, warning_callback=None):
+    """把所有文件的页面缩放到A4页面上，写入 StreamingPdfWriter
+
+    图片在线程池中并行预处理，PDF页面和图片按列表顺序写入。
+    """
+    processed_pages = 0
+
+    def prepare_image(file_path):
+        return prepare_a4_image(file_path, is_mixed, a4_width, a4_height)
+
+    for file_path, prepared_image, error in prepare_images(file_paths, prepare_image, options):
+        report_progress(progress_callback, processed_pages, registry.total_pages,
+                        f"处理: {os.path.basename(file_path)}")
+
+        # PDF文件处理
+        if is_pdf_file(file_path):
+            # 无效的PDF文件中止合并
+            pdf_doc = registry.document(file_path)
+            try:
+                for page_num in range(len(pdf_doc)):
+                    # 从源文档获取页面
+                    src_page = pdf_doc[page_num]
+                    src_rect = src_page.rect
+
+                    # 如果是混合模式，根据原始页面方向决定新页面方向
+                    if is_mixed:
+                        page_width, page_height = A4_LANDSCAPE if src_rect.width > src_rect.height else A4_PORTRAIT
+                    else:
+                        # 使用全局设置的方向
+                        page_width, page_height = a4_width, a4_height
+
+                    # 使用整数值避免浮点数问题
+                    new_page = output_pdf.new_page(int(page_width), int(page_height))
+
+                    # 计算缩放比例以适应A4，同时保持内容
+                    dest_rect = new_page.rect
+
+                    # 计算合适的缩放比例
+                    scale_x = dest_rect.width / src_rect.width
+                    scale_y = dest_rect.height / src_rect.height
+                    scale = min(scale_x, scale_y, 1.0)  # 不放大，只缩小
+
+                    # 计算居中偏移量
+                    offset_x = (dest_rect.width - src_rect.width * scale) / 2
+                    offset_y = (dest_rect.height - src_rect.height * scale) / 2
+
+                    # 缩放后居中的目标区域
+                    target_rect = fitz.Rect(offset_x, offset_y,
+                                            offset_x + src_rect.width * scale, offset_y + src_rect.height * scale)
+
+                    # 将源文档内容绘制到新页面上
+                    new_page.show_pdf_page(target_rect, pdf_doc, page_num)
+                    output_pdf.page_done()
+
+                    # 更新进度
+                    processed_pages += 1
+                    report_progress(progress_callback, processed_pages, registry.total_pages)
+            except Exception as e:
+                report_warning(warning_callback, f"处理PDF文件时出错 '{os.path.basename(file_path)}': {str(e)}")
+                continue
+            finally:
+                # 源文件用完立即关闭
+                registry.release(file_path)
+            output_pdf.file_done()
+
+        # 图片文件处理
+        else:
+            try:
+                if error is not None:
+                    raise error
+                page_width, page_height, rect, image_stream = prepared_image
+                rect = fitz.Rect(rect)
+
+                # 直接插入到输出页面，不经过临时PDF文件
+                new_page = output_pdf.new_page(int(page_width), int(page_height))
+                if image_stream is None:
+                    # 不需要缩小：JPEG原始数据直接嵌入，不重新编码
+                    insert_image_file(new_page, rect, file_path)
+                else:
+                    new_page.insert_image(rect, stream=image_stream)
+                output_pdf.page_done()
+                output_pdf.file_done()
+
+                # 更新进度
+                processed_pages += 1
+                report_progress(progress_callback, processed_pages, registry.total_pages)
+
+            except Exception as e:
+                report_warning(warning_callback, f"处理图片文件时出错 '{os.path.basename(file_path)}': {str(e)}")
+                continue
+
+
+def insert_image_file(page, rect, file_path):
+    """把图片文件等比缩放后居中插入到 rect 中，PyMuPDF无法识别的格式先用PIL转换为PNG"""
+    try:
+        page.insert_image(rect, filename=file_path)
+    except Exception:
+        img = Image.open(file_path)
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='PNG')
+        page.insert_image(rect, stream=img_bytes.getvalue())
+
+
+def downscaled_image_stream(img, rect_width, rect_height):
+    """图片在 rect 中的分辨率超过 MAX_IMAGE_DPI 时返回缩小后的编码数据，否则返回None
+
+    JPEG先用 draft 在解码时按DCT比例缩小，再精确缩放并重新编码为JPEG；其他格式编码为PNG。
+    """
+    max_width = max(1, round(rect_width / 72 * MAX_IMAGE_DPI))
+    max_height = max(1, round(rect_height / 72 * MAX_IMAGE_DPI))
+    if img.width <= max_width and img.height <= max_height:
+        return None
+
+    scale = min(max_width / img.width, max_height / img.height)
+    target_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    is_jpeg = img.format == 'JPEG'
+    if is_jpeg:
+        img.draft(img.mode, target_size)
+
+    img_bytes = io.BytesIO()
+    if is_jpeg:
+        if img.mode not in ('RGB', 'L', 'CMYK'):
+            img = img.convert('RGB')
+        img.resize(target_size, Image.LANCZOS).save(img_bytes, format='JPEG', quality=90)
+    else:
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        img.resize(target_size, Image.LANCZOS).save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+
+def merge_by_placement(file_paths, output_path, layout, progress_callback=None, warning_callback=None,
+                       streaming=False):
+    """把每个PDF页面和图片放到新页面的指定区域中，PDF内容保持矢量，不做栅格化
+
+    Args:
+        layout: layout(内容宽度, 内容高度) 返回 (页面宽度, 页面高度, 内容区域)，
+            尺寸单位为点，内容在区域内等比缩放并居中；图片按 RASTER_DPI 换算为点
+        streaming: 是否分批写出已完成的页面
+    """
+    registry = DocumentRegistry(file_paths, warning_callback)
+    processed_pages = 0
+    report_progress(progress_callback, processed_pages, registry.total_pages)
+
+    output_pdf = StreamingPdfWriter(output_path, STREAM_FLUSH_PAGES if streaming else None,
+                                    garbage=3, deflate=True)
+    try:
+        for file_path in file_paths:
+            report_progress(progress_callback, processed_pages, registry.total_pages,
+                            f"处理: {os.path.basename(file_path)}")
+
+            if is_pdf_file(file_path):
+                # 无效的PDF文件中止合并
+                doc = registry.document(file_path)
+                try:
+                    for page_num in range(len(doc)):
+                        src_rect = doc[page_num].rect
+                        page_width, page_height, content_rect = layout(src_rect.width, src_rect.height)
+                        new_page = output_pdf.new_page(page_width, page_height)
+                        # 源页面作为表单对象引用，文字和矢量图形保持原样
+                        new_page.show_pdf_page(content_rect, doc, page_num)
+                        output_pdf.page_done()
+
+                        processed_pages += 1
+                        report_progress(progress_callback, processed_pages, registry.total_pages)
+                except Exception as e:
+                    report_warning(warning_callback, f"处理PDF文件时出错 '{os.path.basename(file_path)}': {str(e)}")
+                finally:
+                    registry.release(file_path)
+                output_pdf.file_done()
+            else:
+                try:
+                    with Image.open(file_path) as img:
+                        img_width, img_height = img.size
+                    page_width, page_height, content_rect = layout(img_width * 72 / RASTER_DPI,
+                                                                   img_height * 72 / RASTER_DPI)
+                    new_page = output_pdf.new_page(page_width, page_height)
+                    insert_image_file(new_page, content_rect, file_path)
+                except Exception as e:
+                    report_warning(warning_callback, f"无法打开图片文件 '{os.path.basename(file_path)}': {str(e)}")
+                    continue
+                output_pdf.page_done()
+                output_pdf.file_done()
+
+                processed_pages += 1
+                report_progress(progress_callback, processed_pages, registry.total_pages)
+
+        output_pdf.finish()
+    finally:
+        output_pdf.close()
+        registry.close()
+
+
+def merge_auto_adjust(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """自动调整尺寸合并文件，页面保持矢量
+
+    PDF页面保持原尺寸，图片页面的尺寸按 RASTER_DPI 由像素尺寸换算，与栅格化合并的版面一致。
+    """
+    def layout(width, height):
+        return width, height, fitz.Rect(0, 0, width, height)
+
+    merge_by_placement(file_paths, output_path, layout, progress_callback, warning_callback,
+                       streaming=options is not None and options.streaming)
+
+
+def raster_page_pdf(img):
+    """把图像保存为栅格化合并用的单页PDF数据"""
+    pdf_bytes = io.BytesIO()
+    img.save(pdf_bytes, format='PDF', resolution=RASTER_DPI, quality=100)
+    return pdf_bytes.getvalue()
+
+
+def merge_auto_adjust_raster(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """自动调整尺寸合并文件，所有页面渲染为300DPI图像"""
+    if options is None:
+        options = MergeOptions(layout_mode="自动调整")
+
+    writer = PdfWriter()
+
+    registry = DocumentRegistry(file_paths, warning_callback)
+    processed_pages = 0
+    report_progress(progress_callback, processed_pages, registry.total_pages)
+
+    try:
+        def prepare_image(file_path):
+            with Image.open(file_path) as img:
+                return raster_page_pdf(img.convert('RGB'))
+
+        for file_path, image_pdf, error in prepare_images(file_paths, prepare_image, options):
+            report_progress(progress_callback, processed_pages, registry.total_pages,
+                            f"处理: {os.path.basename(file_path)}")
+
+            if is_pdf_file(file_path):
+                doc = registry.document(file_path)
+
+                for page_num in range(len(doc)):
+                    page = doc.load_page(page_num)
+                    pix = render_pixmap(page, RASTER_DPI)
+                    img = pixmap_to_image(pix)
+
+                    pdf_bytes = io.BytesIO()
+                    img.save(pdf_bytes, format='PDF', resolution=RASTER_DPI, quality=100)
+                    pdf_bytes.seek(0)
+
+                    temp_reader = PdfReader(pdf_bytes)
+                    writer.add_page(temp_reader.pages[0])
+
+                    processed_pages += 1
+                    report_progress(progress_callback, processed_pages, registry.total_pages)
+                registry.release(file_path)
+            else:
+                if error is not None:
+                    report_warning(warning_callback, f"无法打开图片文件 '{os.path.basename(file_path)}': {str(error)}")
+                    continue
+
+                temp_reader = PdfReader(io.BytesIO(image_pdf))
+                writer.add_page(temp_reader.pages[0])
+
+                processed_pages += 1
+                report_progress(progress_callback, processed_pages, registry.total_pages)
+
+        with open(output_path, 'wb') as output_file:
+            writer.write(output_file)
+    finally:
+        registry.close()
+
+
+def get_manual_page_size(options):
+    """根据手动调整参数计算页面尺寸（点）
+
+    Returns:
+        tuple: (宽度, 高度, 页边距)
+    """
+    width_pt = options.width_mm * 72 / 25.4
+    height_pt = options.height_mm * 72 / 25.4
+    margin_pt = options.margin_mm * 72 / 25.4
+
+    if options.page_size in MANUAL_PAGE_SIZES:
+        width_pt, height_pt = MANUAL_PAGE_SIZES[options.page_size]
+        if options.page_orientation == "横向":
+            width_pt, height_pt = height_pt, width_pt
+
+    return width_pt, height_pt, margin_pt
+
+
+def _fit_image_on_page(img, width_pt, height_pt, margin_pt):
+    """把图像等比缩放后居中放到白色页面上"""
+    available_width = width_pt - 2 * margin_pt
+    available_height = height_pt - 2 * margin_pt
+
+    img_width, img_height = img.size
+    scale = min(available_width / img_width, available_height / img_height)
+
+    new_width = int(img_width * scale)
+    new_height = int(img_height * scale)
+
+    img = img.resize((new_width, new_height), Image.LANCZOS)
+
+    new_img = Image.new("RGB", (int(width_pt), int(height_pt)), "white")
+    paste_x = int((width_pt - new_width) / 2)
+    paste_y = int((height_pt - new_height) / 2)
+    new_img.paste(img, (paste_x, paste_y))
+    return new_img
+
+
+def merge_manual_adjust(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """根据手动设置合并文件，内容在页边距内等比缩放并居中，页面保持矢量"""
+    if options is None:
+        options = MergeOptions(layout_mode="手动调整")
+
+    width_pt, height_pt, margin_pt = get_manual_page_size(options)
+    content_rect = fitz.Rect(margin_pt, margin_pt, width_pt - margin_pt, height_pt - margin_pt)
+    if content_rect.is_empty:
+        raise ValueError("页边距过大，页面上没有可用的区域")
+
+    def layout(width, height):
+        return width_pt, height_pt, content_rect
+
+    merge_by_placement(file_paths, output_path, layout, progress_callback, warning_callback,
+                       streaming=options.streaming)
+
+
+def merge_manual_adjust_raster(file_paths, output_path, options=None, progress_callback=None, warning_callback=None):
+    """根据手动设置合并文件，所有页面渲染为300DPI图像"""
+    if options is None:
+        options = MergeOptions(layout_mode="手动调整")
+
+    writer = PdfWriter()
+
+    width_pt, height_pt, margin_pt = get_manual_page_size(options)
+
+    registry = DocumentRegistry(file_paths, warning_callback)
+    processed_pages = 0
+    report_progress(progress_callback, processed_pages, registry.total_pages)
+
+    try:
+        def prepare_image(file_path):
+            with Image.open(file_path) as img:
+                return raster_page_pdf(_fit_image_on_page(img, width_pt, height_pt, margin_pt))
+
+        for file_path, image_pdf, error in prepare_images(file_paths, prepare_image, options):
+            report_progress(progress_callback, processed_pages, registry.total_pages,
+                            f"处理: {os.path.basename(file_path)}")
+
+            if is_pdf_file(file_path):
+                doc = registry.document(file_path)
+
+                for page_num in range(len(doc)):
+                    page = doc.load_page(page_num)
+                    pix = render_pixmap(page, RASTER_DPI)
+                    img = pixmap_to_image(pix)
+
+                    new_img = _fit_image_on_page(img, width_pt, height_pt, margin_pt)
+
+                    pdf_bytes = io.BytesIO()
+                    new_img.save(pdf_bytes, format='PDF', resolution=RASTER_DPI, quality=100)
+                    pdf_bytes.seek(0)
+
+                    temp_reader = PdfReader(pdf_bytes)
+                    writer.add_page(temp_reader.pages[0])
+
+                    processed_pages += 1
+                    report_progress(progress_callback, processed_pages, registry.total_pages)
+                registry.release(file_path)
+            else:
+                if error is not None:
+                    report_warning(warning_callback, f"无法打开图片文件 '{os.path.basename(file_path)}': {str(error)}")
+                    continue
+
+                temp_reader = PdfReader(io.BytesIO(image_pdf))
+                writer.add_page(temp_reader.pages[0])
+
+                processed_pages += 1
+                report_progress(progress_callback, processed_pages, registry.total_pages)
+
+        with open(output_path, 'wb') as output_file:
+            writer.write(output_file)
+    finally:
+        registry.close()
@@ -0,0 +1,69 @@
+"""各处理功能的参数对象
+
+图形界面从 tk 变量中读取参数后构造这些对象，命令行则从命令行参数构造，
+核心处理函数只接收这些对象，不直接依赖任何界面控件。
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class MergeOptions:
+    """PDF/图片合并参数"""
+    layout_mode: str = "原样"  # 原样 / 自动调整 / 手动调整
+    force_a4: bool = False  # 原样模式下强制使用A4纸张
+    page_orientation: str = "纵向"  # 纵向 / 横向 / 混合
+    page_size: str = "A4"  # 手动调整模式: A4 / A5 / Letter / Legal / 自定义
+    width_mm: float = 210
+    height_mm: float = 297
+    margin_mm: float = 10
+    rasterize: bool = False  # 自动/手动调整模式下把PDF页面渲染为300DPI图像，默认保持矢量
+    streaming: bool = False  # 流式合并：分批写出已完成的页面并及时关闭源文件，内存占用与输入总大小无关
+    workers: Optional[int] = None  # 图片预处理线程数，None 表示使用CPU核心数
+    prefetch_window: int = 8  # 同时在预处理中或等待写入的文件数上限
+
+
+@dataclass
+class CompressOptions:
+    """PDF压缩参数"""
+    level: str = "标准"  # 低 / 标准 / 高 / 最高
+    mode: str = "整页栅格化"  # 整页栅格化 / 图像重压缩（保留文字和矢量）
+    image_quality: int = 75
+    image_dpi: int = 150
+    optimize_images: bool = True
+    remove_metadata: bool = True
+    keep_page_size: bool = True
+    target_size: Optional[int] = None  # 目标文件大小（字节），设置后按整页栅格化方式自动搜索DPI和图像质量
+
+
+@dataclass
+class RenderOptions:
+    """PDF转图片参数"""
+    output_format: str = "jpg"
+    dpi: int = 300
+    page_range: Optional[str] = None  # None 表示全部页面，否则如 "1-3,5,7-9"
+    workers: Optional[int] = None  # None 表示使用CPU核心数
+    container: Optional[str] = None  # None 每页一个文件；"tiff" 多页TIFF；"zip"/"tar" 所有页面打包为一个文件
+    pyramid_sizes: Optional[List[int]] = None  # 预览图长边像素，如 [1024, 512, 128]；设置后忽略DPI和打包方式
+    color_mode: str = "rgb"  # "rgb" 彩色；"gray" 8位灰度；"mono" 1位黑白（PNG为1位深度，TIFF为CCITT G4）
+    anti_alias: Optional[int] = None  # 抗锯齿级别0-8，0为关闭，None 使用PyMuPDF的默认值
+    incremental: bool = False  # 按输出目录中的清单跳过源文件和参数都没有变化的页面（只用于每页一个文件）
+
+
+@dataclass
+class ConvertOptions:
+    """图片格式转换参数"""
+    output_format: str = "jpg"
+    quality: int = 85
+    input_format: str = "全部"  # 只处理指定源格式的文件
+    width: Optional[int] = None  # 宽高都为空时不调整尺寸
+    height: Optional[int] = None
+    keep_ratio: bool = True
+    fast_resize: bool = False  # 优先速度：JPEG按比例降采样解码，先整数倍缩小再精细缩放
+
+
+@dataclass
+class ResizeOptions:
+    """PDF页面尺寸转换参数（单位：毫米）"""
+    width_mm: float = 210
+    height_mm: float = 297
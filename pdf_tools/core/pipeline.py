@@ -0,0 +1,55 @@
+"""有序的并行预处理流水线
+
+生产者（线程池）并行准备数据，消费者按输入顺序逐个取出结果。
+同时在准备中或已准备好但还没被取走的任务数不超过 window，内存占用因此有上限。
+"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 默认的在途任务数上限
+DEFAULT_WINDOW = 8
+
+
+def ordered_map(func, items, workers=None, window=DEFAULT_WINDOW):
+    """并行执行 func(item)，按 items 的顺序产出结果
+
+    Args:
+        func: 预处理函数，在工作线程中执行
+        items: 输入序列
+        workers: 工作线程数，None 表示使用CPU核心数
+        window: 在途任务数上限（至少为1）
+
+    Yields:
+        tuple: (item, 结果, 异常)，func 抛出异常时结果为None
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    window = max(1, window)
+    workers = max(1, min(workers, window))
+
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            for item in items:
+                pending.append((item, executor.submit(func, item)))
+                return
+
+        try:
+            for _ in range(window):
+                submit_next()
+
+            while pending:
+                item, future = pending.popleft()
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                # 先补充任务再交给消费者，写出时工作线程继续准备后面的数据
+                submit_next()
+                yield item, result, error
+        finally:
+            # 消费者提前退出（出错或中止）时不再执行排队中的任务
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,126 @@
+"""PyMuPDF像素图的渲染与编码
+
+PNG和JPEG直接交给PyMuPDF编码，不经过Python bytes和PIL缓冲区；
+其他格式或需要PIL处理（缩放、粘贴）时用 frombuffer 包装像素图的内存，
+避免 pix.samples 先复制出一份完整的 bytes。
+
+颜色模式为灰度或黑白时直接渲染单通道像素图，像素缓冲区只有RGB的三分之一；
+黑白图像再按阈值转换为1位，PNG输出1位深度，TIFF使用CCITT G4压缩。
+"""
+import io
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# 渲染为JPEG时的默认质量，与PIL保存JPEG的默认值一致
+DEFAULT_JPEG_QUALITY = 75
+
+# 颜色模式: "rgb" 彩色，"gray" 8位灰度，"mono" 1位黑白
+COLOR_MODES = ("rgb", "gray", "mono")
+# 黑白模式下灰度值不低于该值的像素为白色
+MONO_THRESHOLD = 128
+_MONO_TABLE = [0] * MONO_THRESHOLD + [255] * (256 - MONO_THRESHOLD)
+
+
+def pixmap_colorspace(color_mode):
+    """颜色模式对应的渲染色彩空间，黑白模式先渲染为灰度"""
+    if color_mode not in COLOR_MODES:
+        raise ValueError(f"不支持的颜色模式: {color_mode}")
+    return fitz.csRGB if color_mode == "rgb" else fitz.csGRAY
+
+
+@contextmanager
+def antialias(level):
+    """在代码块内使用指定的抗锯齿级别（0-8，0为关闭），结束后恢复
+
+    PyMuPDF的抗锯齿级别是进程内的全局设置。level 为 None 时不做改变。
+    """
+    if level is None:
+        yield
+        return
+    previous = fitz.TOOLS.show_aa_level()
+    fitz.TOOLS.set_aa_level(level)
+    try:
+        yield
+    finally:
+        fitz.TOOLS.set_aa_level(previous["graphics"])
+
+
+def render_pixmap(page, dpi, alpha=False, colorspace=None):
+    """按指定DPI渲染页面（72是PDF的基准DPI）"""
+    zoom_factor = dpi / 72
+    return page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor), colorspace=colorspace or fitz.csRGB,
+                           alpha=alpha)
+
+
+def pixmap_mode(pix):
+    """像素图对应的PIL图像模式"""
+    if pix.alpha:
+        return "LA" if pix.n == 2 else "RGBA"
+    return {1: "L", 3: "RGB", 4: "CMYK"}[pix.n]
+
+
+def pixmap_to_image(pix):
+    """把像素图包装为PIL图像
+
+    L、RGBA、CMYK 模式直接引用像素图的内存，使用图像期间必须保留 pix；
+    RGB 模式由PIL复制一次，仍比先取 pix.samples 再 frombytes 少一次完整复制。
+    """
+    mode = pixmap_mode(pix)
+    # samples_mv 不复制数据，旧版PyMuPDF没有该属性
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    return Image.frombuffer(mode, (pix.width, pix.height), samples, "raw", mode, pix.stride, 1)
+
+
+def pixmap_to_jpeg(pix, quality):
+    """把像素图编码为JPEG字节"""
+    try:
+        return pix.tobytes("jpeg", jpg_quality=quality)
+    except (TypeError, ValueError):
+        # 旧版PyMuPDF不支持输出JPEG
+        buffer = io.BytesIO()
+        pixmap_to_image(pix).save(buffer, format='JPEG', quality=quality, optimize=True)
+        return buffer.getvalue()
+
+
+def to_mono(img):
+    """按固定阈值把图像转换为1位黑白图像（不抖动，文字边缘保持清晰）"""
+    if img.mode != "L":
+        img = img.convert("L")
+    return img.point(_MONO_TABLE, "1")
+
+
+def save_mono(img, output_path, output_format, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """保存1位黑白图像：TIFF使用CCITT G4压缩，PNG/BMP为1位深度，JPEG不支持1位，保存为灰度"""
+    output_format = output_format.lower()
+    if output_format in ("tif", "tiff"):
+        img.save(output_path, format="TIFF", compression="group4")
+    elif output_format in ("jpg", "jpeg"):
+        img.convert("L").save(output_path, format="JPEG", quality=jpeg_quality)
+    else:
+        img.save(output_path)
+
+
+def save_pixmap(pix, output_path, output_format, jpeg_quality=DEFAULT_JPEG_QUALITY, mono=False):
+    """把像素图保存为图片文件
+
+    Args:
+        output_format: 输出格式扩展名，如 "jpg"、"png"、"tiff"
+        mono: 为真时按阈值转换为1位黑白图像后保存
+    """
+    output_format = output_format.lower()
+    if mono:
+        save_mono(to_mono(pixmap_to_image(pix)), output_path, output_format, jpeg_quality)
+        return
+    if output_format == "png":
+        pix.save(output_path, output="png")
+        return
+    if output_format in ("jpg", "jpeg"):
+        try:
+            pix.save(output_path, output="jpeg", jpg_quality=jpeg_quality)
+            return
+        except (TypeError, ValueError):
+            # 旧版PyMuPDF不支持输出JPEG，交给PIL
+            pass
+    pixmap_to_image(pix).save(output_path)
@@ -0,0 +1,18 @@
+"""进度与警告回调的辅助函数
+
+核心处理函数统一使用两种可选回调:
+    progress_callback(current, total, message): 汇报进度，message 可以为 None
+    warning_callback(message): 汇报可以跳过、不影响整体结果的错误
+"""
+
+
+def report_progress(callback, current, total, message=None):
+    """调用进度回调，回调为空时忽略"""
+    if callback:
+        callback(current, total, message)
+
+
+def report_warning(callback, message):
+    """调用警告回调，回调为空时忽略"""
+    if callback:
+        callback(message)
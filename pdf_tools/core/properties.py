@@ -0,0 +1,216 @@
+"""PDF文件属性分析的核心实现"""
+import os
+import datetime
+
+import fitz  # PyMuPDF
+from PyPDF2 import PdfReader
+
+# 定义标准纸张尺寸（单位：毫米）
+# ISO 216标准的A系列纸张
+STANDARD_PAPER_SIZES = {
+    "A0": (841, 1189),
+    "A1": (594, 841),
+    "A2": (420, 594),
+    "A3": (297, 420),
+    "A4": (210, 297),
+    "A5": (148, 210),
+    "A6": (105, 148),
+    "A7": (74, 105),
+    "A8": (52, 74),
+    # B系列
+    "B0": (1000, 1414),
+    "B1": (707, 1000),
+    "B2": (500, 707),
+    "B3": (353, 500),
+    "B4": (250, 353),
+    "B5": (176, 250),
+    # C系列
+    "C0": (917, 1297),
+    "C1": (648, 917),
+    "C2": (458, 648),
+    "C3": (324, 458),
+    "C4": (229, 324),
+    "C5": (162, 229),
+    "C6": (114, 162),
+    # 美国标准尺寸
+    "Letter": (216, 279),
+    "Legal": (216, 356),
+    "Tabloid": (279, 432),
+    "Executive": (184, 267),
+    # 中国标准尺寸
+    "16K": (194, 267),
+    "8K": (267, 388),
+}
+
+# 允许的误差（毫米）
+SIZE_TOLERANCE = 3
+
+
+def format_file_size(size_in_bytes):
+    """格式化文件大小显示"""
+    if size_in_bytes < 1024:
+        return f"{size_in_bytes} 字节"
+    elif size_in_bytes < 1024 * 1024:
+        return f"{size_in_bytes/1024:.2f} KB"
+    elif size_in_bytes < 1024 * 1024 * 1024:
+        return f"{size_in_bytes/(1024*1024):.2f} MB"
+    else:
+        return f"{size_in_bytes/(1024*1024*1024):.2f} GB"
+
+
+def format_date(date_str):
+    """格式化日期显示"""
+    if not date_str:
+        return "未知"
+
+    try:
+        # 尝试将PDF日期格式转换为可读格式
+        if isinstance(date_str, str) and date_str.startswith("D:"):
+            # 处理D:YYYYMMDDHHmmSS格式
+            date_str = date_str[2:]
+            if len(date_str) >= 14:
+                year = date_str[0:4]
+                month = date_str[4:6]
+                day = date_str[6:8]
+                hour = date_str[8:10]
+                minute = date_str[10:12]
+                second = date_str[12:14]
+                return f"{year}-{month}-{day} {hour}:{minute}:{second}"
+        return str(date_str)
+    except:
+        return str(date_str)
+
+
+def identify_paper_size(width_mm, height_mm):
+    """识别标准纸张尺寸
+
+    Args:
+        width_mm: 宽度（毫米）
+        height_mm: 高度（毫米）
+
+    Returns:
+        str: 标准纸张尺寸名称，如果不匹配则返回None
+    """
+    # 确保宽度小于高度，以便正确匹配（横向/纵向都可以）
+    w, h = min(width_mm, height_mm), max(width_mm, height_mm)
+
+    # 检查是否匹配标准尺寸（考虑误差范围）
+    for name, (std_width, std_height) in STANDARD_PAPER_SIZES.items():
+        # 标准化尺寸（宽度小于高度）
+        std_w, std_h = min(std_width, std_height), max(std_width, std_height)
+
+        # 检查是否在误差范围内
+        if (abs(w - std_w) <= SIZE_TOLERANCE and
+                abs(h - std_h) <= SIZE_TOLERANCE):
+            orientation = "纵向" if width_mm < height_mm else "横向"
+            return f"{name} ({orientation})"
+
+    return None
+
+
+def analyze_pdf(file_path, doc=None):
+    """分析PDF文件属性
+
+    Args:
+        file_path: PDF文件路径
+        doc: 已打开的 fitz 文档，为空时在函数内打开并关闭
+
+    Returns:
+        dict: {属性名: 属性值}，顺序即显示顺序
+    """
+    # 获取基本文件信息
+    file_size = os.path.getsize(file_path)
+    file_mod_time = os.path.getmtime(file_path)
+    mod_time_str = datetime.datetime.fromtimestamp(file_mod_time).strftime('%Y-%m-%d %H:%M:%S')
+
+    # 使用PyPDF2获取PDF信息
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+
+    # 获取文档信息
+    info = reader.metadata
+    creator = info.creator if hasattr(info, 'creator') else "未知"
+    producer = info.producer if hasattr(info, 'producer') else "未知"
+    creation_date = format_date(info.creation_date if hasattr(info, 'creation_date') else None)
+    mod_date = format_date(info.modification_date if hasattr(info, 'modification_date') else None)
+
+    # 获取页面信息
+    first_page = reader.pages[0]
+    width_pts = first_page.mediabox.width
+    height_pts = first_page.mediabox.height
+
+    # 点转毫米 (1 点 = 0.353 毫米)
+    width_mm = width_pts * 0.353
+    height_mm = height_pts * 0.353
+
+    # 检测是否为标准尺寸
+    paper_size = identify_paper_size(width_mm, height_mm)
+    paper_size_info = f"{paper_size}" if paper_size else "非标准尺寸"
+
+    # 使用PyMuPDF获取更多信息
+    own_doc = doc is None
+    if own_doc:
+        doc = fitz.open(file_path)
+
+    try:
+        has_toc = "有" if doc.get_toc() else "无"
+        form_fields = "有" if doc.is_form_pdf else "无"
+
+        # 检查是否所有页面都是同一尺寸
+        uniform_size = True
+        page_sizes = []
+        size_distribution = {}
+
+        for page_num in range(doc.page_count):
+            page = doc[page_num]
+            page_rect = page.rect
+            w_mm = page_rect.width * 0.353
+            h_mm = page_rect.height * 0.353
+            size = (round(w_mm, 1), round(h_mm, 1))
+            page_sizes.append(size)
+
+            # 记录尺寸分布
+            size_key = f"{size[0]:.1f}x{size[1]:.1f}"
+            size_distribution[size_key] = size_distribution.get(size_key, 0) + 1
+
+            if page_num > 0 and abs(w_mm - page_sizes[0][0]) > 1 or abs(h_mm - page_sizes[0][1]) > 1:
+                uniform_size = False
+
+        # 统计图片数量
+        image_count = 0
+        for page_num in range(doc.page_count):
+            page = doc[page_num]
+            image_list = page.get_images(full=True)
+            image_count += len(image_list)
+    finally:
+        if own_doc:
+            doc.close()
+
+    # 准备尺寸分布信息
+    size_info = ""
+    if not uniform_size:
+        size_info = "\n\n页面尺寸分布:\n"
+        for size_key, count in size_distribution.items():
+            # 对每种尺寸检测是否为标准尺寸
+            w, h = map(float, size_key.split('x'))
+            std_size = identify_paper_size(w, h)
+            size_desc = f"{std_size}" if std_size else "非标准尺寸"
+            size_info += f"  - {size_key} 毫米 ({size_desc}): {count}页\n"
+
+    return {
+        "文件名": os.path.basename(file_path),
+        "文件路径": file_path,
+        "文件大小": format_file_size(file_size),
+        "修改时间": mod_time_str,
+        "页数": total_pages,
+        "页面尺寸": f"{width_pts:.2f} × {height_pts:.2f} 点 ({width_mm:.2f} × {height_mm:.2f} 毫米)",
+        "纸张规格": paper_size_info,
+        "页面尺寸统一": "是" if uniform_size else "否" + size_info,
+        "创建者": creator,
+        "生成器": producer,
+        "创建日期": creation_date,
+        "修改日期": mod_date,
+        "目录": has_toc,
+        "表单字段": form_fields,
+        "图片数量": image_count
+    }
@@ -0,0 +1,528 @@
+"""PDF页面多进程渲染引擎
+
+每个工作进程只用 fitz.open 打开一次文档，然后从共享任务队列中领取页面区间，
+自行完成渲染和编码，并通过结果队列把每页的结果回传给调用方。
+本模块不依赖Tk，图形界面和批处理都可以直接调用。
+"""
+import os
+import json
+import multiprocessing
+import queue
+import tempfile
+
+import fitz  # PyMuPDF
+
+from core.options import RenderOptions
+from core.progress import report_progress, report_warning
+from core.cache import file_digest
+from core.pixmap import (DEFAULT_JPEG_QUALITY, antialias, pixmap_colorspace, render_pixmap, pixmap_to_image,
+                         save_pixmap, to_mono, save_mono)
+from core.convert import fast_downscale, save_image
+from core.tiling import needs_tiling, render_large_page
+from core.containers import container_output_path, open_page_container
+from core.manifest import ExportManifest
+
+# 页数少于该值时直接在当前进程渲染，避免启动进程池的开销
+MIN_PAGES_FOR_POOL = 8
+
+# 每个任务区间的最大页数，区间越小负载越均衡，越大则调度开销越低
+MAX_CHUNK_SIZE = 16
+
+
+def default_worker_count():
+    """返回默认的工作进程数（CPU核心数）"""
+    return os.cpu_count() or 1
+
+
+def parse_page_range(page_range_str, total_pages):
+    """解析页码范围字符串，例如 "1-3,5,7-9"
+
+    Args:
+        page_range_str: 页码范围，为空表示全部页面
+        total_pages: 文档总页数
+
+    Returns:
+        list: 0起始的页码列表（可能包含超出范围的页码）
+
+    Raises:
+        ValueError: 页码范围格式不正确
+    """
+    if not page_range_str:
+        return list(range(total_pages))
+
+    pages = []
+    for part in page_range_str.split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+            # PDF页码通常从1开始，但PyMuPDF从0开始
+            pages.extend(range(start-1, end))
+        else:
+            # 单页
+            pages.append(int(part)-1)
+    return pages
+
+
+def parse_pyramid_sizes(text):
+    """解析 "1024,512,128" 这样的预览图尺寸列表，空文本返回None
+
+    Raises:
+        ValueError: 尺寸不是正整数
+    """
+    sizes = [int(part) for part in text.replace("，", ",").split(",") if part.strip()]
+    if any(size <= 0 for size in sizes):
+        raise ValueError("预览图尺寸必须是正整数")
+    return sizes or None
+
+
+def split_page_chunks(pages, workers):
+    """把页码列表切分为若干连续区间，供工作进程领取
+
+    Args:
+        pages: 0起始的页码列表
+        workers: 工作进程数
+
+    Returns:
+        list: 页码子列表的列表
+    """
+    pages = list(pages)
+    if not pages:
+        return []
+    # 每个进程大约领取4个区间，保证最后阶段仍有任务可以分摊
+    chunk_size = max(1, min(MAX_CHUNK_SIZE, len(pages) // (workers * 4)))
+    return [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+
+
+def page_output_path(output_dir, base_filename, page_num, output_format):
+    """按"原文件名_页码.格式"生成输出文件路径"""
+    filename = f"{base_filename}_{page_num+1}.{output_format}"
+    return os.path.join(output_dir, filename)
+
+
+def pyramid_output_path(output_dir, base_filename, page_num, size, output_format):
+    """按"原文件名_页码_尺寸px.格式"生成预览图路径"""
+    return os.path.join(output_dir, f"{base_filename}_{page_num+1}_{size}px.{output_format}")
+
+
+def render_page_to_file(page, dpi, output_path, color_mode="rgb"):
+    """渲染单个页面并保存为图片文件，PNG/JPEG由PyMuPDF直接编码
+
+    渲染后像素数过大的页面分块渲染并流式写入（PNG/TIFF），不分配整页的像素缓冲区。
+    color_mode 为 "gray" 或 "mono" 时渲染单通道像素图，"mono" 再转换为1位黑白图像。
+    """
+    output_format = os.path.splitext(output_path)[1].lstrip(".")
+    if needs_tiling(page, dpi):
+        render_large_page(page, dpi, output_path, output_format, color_mode=color_mode)
+        return
+    pix = render_pixmap(page, dpi, colorspace=pixmap_colorspace(color_mode))
+    save_pixmap(pix, output_path, output_format, mono=color_mode == "mono")
+
+
+class PageFileJob:
+    """把页面渲染为"原文件名_页码.格式"的图片文件，返回文件名
+
+    页面任务对象会被传给工作进程，只保存可以序列化的参数。
+    """
+
+    def __init__(self, output_dir, base_filename, output_format, dpi, color_mode="rgb", anti_alias=None):
+        self.output_dir = output_dir
+        self.base_filename = base_filename
+        self.output_format = output_format
+        self.dpi = dpi
+        self.color_mode = color_mode
+        self.anti_alias = anti_alias
+
+    def __call__(self, page, page_num):
+        output_path = page_output_path(self.output_dir, self.base_filename, page_num, self.output_format)
+        with antialias(self.anti_alias):
+            render_page_to_file(page, self.dpi, output_path, self.color_mode)
+        return os.path.basename(output_path)
+
+
+class PyramidJob:
+    """把页面按最大尺寸渲染一次，再逐级缩小得到各个尺寸的预览图
+
+    Returns（每页）:
+        list: [{"size": 长边像素, "file": 文件名, "width": 宽, "height": 高}]，按尺寸从大到小
+    """
+
+    def __init__(self, output_dir, base_filename, output_format, sizes, color_mode="rgb", anti_alias=None):
+        self.output_dir = output_dir
+        self.base_filename = base_filename
+        self.output_format = output_format
+        self.sizes = sorted(set(sizes), reverse=True)
+        self.color_mode = color_mode
+        self.anti_alias = anti_alias
+
+    def __call__(self, page, page_num):
+        largest = self.sizes[0]
+        zoom = largest / max(page.rect.width, page.rect.height)
+        with antialias(self.anti_alias):
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=pixmap_colorspace(self.color_mode),
+                                  alpha=False)
+        # 图像可能直接引用 pix 的内存，整个循环期间保留 pix；黑白模式在灰度图上缩小，保存时再转为1位
+        img = pixmap_to_image(pix)
+
+        images = []
+        for size in self.sizes:
+            if size < largest:
+                scale = size / max(pix.width, pix.height)
+                new_size = (max(1, round(pix.width * scale)), max(1, round(pix.height * scale)))
+                # 从上一级缩小，而不是每次从最大的图像开始
+                img = fast_downscale(img, new_size)
+            output_path = pyramid_output_path(self.output_dir, self.base_filename, page_num, size, self.output_format)
+            if size == largest:
+                save_pixmap(pix, output_path, self.output_format, mono=self.color_mode == "mono")
+            elif self.color_mode == "mono":
+                save_mono(to_mono(img), output_path, self.output_format)
+            else:
+                save_image(img, output_path, self.output_format, DEFAULT_JPEG_QUALITY)
+            images.append({"size": size, "file": os.path.basename(output_path),
+                           "width": img.width, "height": img.height})
+        return images
+
+
+def _render_worker(pdf_path, job, task_queue, result_queue):
+    """工作进程入口：打开文档一次，循环领取页面区间直到收到结束标记"""
+    try:
+        pdf_doc = fitz.open(pdf_path)
+    except Exception as e:
+        result_queue.put(("fatal", None, str(e)))
+        result_queue.put(("done", None, None))
+        return
+
+    try:
+        while True:
+            chunk = task_queue.get()
+            if chunk is None:
+                break
+            for page_num in chunk:
+                try:
+                    result_queue.put(("page", page_num, job(pdf_doc.load_page(page_num), page_num)))
+                except Exception as e:
+                    result_queue.put(("error", page_num, str(e)))
+    finally:
+        pdf_doc.close()
+        result_queue.put(("done", None, None))
+
+
+def _render_serial(pdf_path, pages, job, report):
+    """在当前进程中逐页渲染（页数较少或只用一个进程时）"""
+    pdf_doc = fitz.open(pdf_path)
+    try:
+        for page_num in pages:
+            try:
+                report("page", page_num, job(pdf_doc.load_page(page_num), page_num))
+            except Exception as e:
+                report("error", page_num, str(e))
+    finally:
+        pdf_doc.close()
+
+
+def render_pages(pdf_path, pages, job, workers=None, progress_callback=None):
+    """在工作进程中对PDF的指定页面执行页面任务
+
+    Args:
+        pdf_path: PDF文件路径
+        pages: 0起始的有效页码列表
+        job: 页面任务，如 PageFileJob，以 job(page, 页码) 调用，返回值回传给 progress_callback
+        workers: 工作进程数，None 表示使用CPU核心数
+        progress_callback: 每完成一页调用一次，参数为
+            (已完成页数, 总页数, 页码, 任务返回值, 错误信息)，成功时错误信息为None；
+            回调抛出异常时立即结束所有工作进程，异常传给调用方（用于取消）
+
+    Returns:
+        int: 成功转换的页数
+
+    Raises:
+        RuntimeError: 工作进程无法打开文档或意外退出，未能处理所有页面
+    """
+    pages = list(pages)
+    total = len(pages)
+    if total == 0:
+        return 0
+
+    if workers is None:
+        workers = default_worker_count()
+    workers = max(1, min(workers, total))
+
+    state = {"finished": 0, "converted": 0}
+
+    def report(kind, page_num, payload):
+        state["finished"] += 1
+        if kind == "page":
+            state["converted"] += 1
+            if progress_callback:
+                progress_callback(state["finished"], total, page_num, payload, None)
+        elif progress_callback:
+            progress_callback(state["finished"], total, page_num, None, payload)
+
+    if workers == 1 or total < MIN_PAGES_FOR_POOL:
+        _render_serial(pdf_path, pages, job, report)
+        return state["converted"]
+
+    chunks = split_page_chunks(pages, workers)
+    workers = min(workers, len(chunks))
+
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    for chunk in chunks:
+        task_queue.put(chunk)
+    for _ in range(workers):
+        task_queue.put(None)
+
+    processes = []
+    for _ in range(workers):
+        process = multiprocessing.Process(
+            target=_render_worker,
+            args=(pdf_path, job, task_queue, result_queue),
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+
+    fatal_error = None
+    running = workers
+    finished = False
+    try:
+        while running > 0:
+            try:
+                kind, page_num, payload = result_queue.get(timeout=0.5)
+            except queue.Empty:
+                # 工作进程异常退出时不会发送结束标记，避免无限等待
+                if not any(p.is_alive() for p in processes) and result_queue.empty():
+                    break
+                continue
+
+            if kind == "done":
+                running -= 1
+            elif kind == "fatal":
+                fatal_error = payload
+            else:
+                report(kind, page_num, payload)
+        finished = True
+    finally:
+        for process in processes:
+            # 取消或出错时不再等待剩余页面
+            if finished:
+                process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    if state["finished"] < total:
+        raise RuntimeError(fatal_error or f"渲染进程意外退出，已完成 {state['finished']}/{total} 页")
+
+    return state["converted"]
+
+
+def render_pyramid(pdf_path, pages, output_dir, base_filename, output_format, options,
+                   progress_callback=None):
+    """每页只渲染一次，生成多个尺寸的预览图和清单文件
+
+    清单保存为"原文件名_pyramid.json"，记录每页的原始尺寸和各个预览图的文件名与像素尺寸。
+
+    Returns:
+        int: 成功生成预览图的页数
+    """
+    sizes = sorted(set(options.pyramid_sizes), reverse=True)
+    results = {}
+
+    def on_page(done, total, page_num, images, error):
+        if error is None:
+            results[page_num] = images
+            message = f"页面 {page_num+1} 已生成 {len(images)} 个尺寸的预览图"
+        else:
+            message = f"页面 {page_num+1} 转换失败: {error}"
+        report_progress(progress_callback, done, total, message)
+
+    job = PyramidJob(output_dir, base_filename, output_format, sizes, options.color_mode, options.anti_alias)
+    converted = render_pages(pdf_path, pages, job, workers=options.workers, progress_callback=on_page)
+
+    # 清单中的页面尺寸在主进程中读取，只需要解析页面对象
+    manifest_pages = []
+    with fitz.open(pdf_path) as pdf_doc:
+        for page_num in sorted(results):
+            rect = pdf_doc.load_page(page_num).rect
+            manifest_pages.append({
+                "page": page_num + 1,
+                "width_pt": round(rect.width, 2),
+                "height_pt": round(rect.height, 2),
+                "images": results[page_num]
+            })
+    manifest = {
+        "source": os.path.basename(pdf_path),
+        "format": output_format,
+        "sizes": sizes,
+        "pages": manifest_pages
+    }
+    manifest_path = os.path.join(output_dir, f"{base_filename}_pyramid.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return converted
+
+
+def render_to_container(pdf_path, pages, output_dir, base_filename, output_format, options,
+                        progress_callback=None, warning_callback=None):
+    """把页面渲染到本地临时目录，再逐页追加到一个多页TIFF或ZIP/TAR文件
+
+    Returns:
+        int: 成功写入的页数
+    """
+    container_path = container_output_path(output_dir, base_filename, options.container)
+    # 多页TIFF的页面先保存为未压缩TIFF，读回时不需要解码
+    page_format = "tiff" if options.container == "tiff" else output_format
+    container_name = os.path.basename(container_path)
+
+    with tempfile.TemporaryDirectory(prefix="pdf_tools_") as temp_dir:
+        container = open_page_container(options.container, container_path, pages, options.dpi)
+        try:
+            def on_page(done, total, page_num, filename, error):
+                if error is None:
+                    container.add(page_num, os.path.join(temp_dir, filename), filename)
+                    message = f"页面 {page_num+1} 已写入 {container_name}"
+                else:
+                    container.skip(page_num)
+                    message = f"页面 {page_num+1} 转换失败: {error}"
+                report_progress(progress_callback, done, total, message)
+
+            job = PageFileJob(temp_dir, base_filename, page_format, options.dpi, options.color_mode,
+                              options.anti_alias)
+            render_pages(pdf_path, pages, job, workers=options.workers, progress_callback=on_page)
+        finally:
+            container.close()
+
+    for page_num, error in container.failures:
+        report_warning(warning_callback, f"页面 {page_num+1} 写入 {container_name} 失败: {error}")
+    return container.written
+
+
+def convert_pdf_to_images(pdf_path, output_dir, options=None, progress_callback=None, warning_callback=None,
+                          cache=None, manifest=None):
+    """把一个PDF文件的指定页面转换为图片
+
+    Args:
+        pdf_path: PDF文件路径
+        output_dir: 输出目录
+        options: RenderOptions，为空时使用默认参数
+        progress_callback: 每完成一页调用一次 (已完成页数, 总页数, 日志信息)
+        warning_callback: 页码无效等可忽略问题的回调 (错误信息)
+        cache: ResultCache，为空时不使用结果缓存；按页缓存，不同页码范围之间也能复用。
+            生成预览图或输出到多页TIFF、ZIP/TAR时不使用缓存
+        manifest: ExportManifest，不为空时跳过清单中未变化的页面并记录新生成的页面，由调用方保存；
+            为空且 options.incremental 为真时自动加载并保存输出目录中的清单。
+            只用于每页一个文件的输出方式
+
+    Returns:
+        int: 成功转换的页数（包括未变化而跳过的页面）
+    """
+    if options is None:
+        options = RenderOptions()
+
+    # 获取不带扩展名的文件名
+    base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
+    output_format = options.output_format.lower()
+
+    pdf_doc = fitz.open(pdf_path)
+    total_pages = len(pdf_doc)
+    # 渲染进程会各自打开文档
+    pdf_doc.close()
+
+    # 确定需要转换的页面
+    try:
+        pages_to_convert = parse_page_range(options.page_range, total_pages)
+    except ValueError:
+        report_warning(warning_callback, "错误: 页码范围格式不正确，将转换全部页面")
+        pages_to_convert = list(range(total_pages))
+
+    # 过滤无效页码
+    valid_pages = []
+    for page_num in pages_to_convert:
+        if page_num >= total_pages or page_num < 0:
+            report_warning(warning_callback, f"跳过无效页码 {page_num+1}")
+        else:
+            valid_pages.append(page_num)
+
+    if options.color_mode == "mono" and output_format in ("jpg", "jpeg") and options.container != "tiff":
+        report_warning(warning_callback, "JPEG不支持1位黑白图像，将保存为灰度JPEG，建议改用PNG或TIFF")
+
+    report_progress(progress_callback, 0, len(valid_pages))
+
+    if options.pyramid_sizes:
+        return render_pyramid(pdf_path, valid_pages, output_dir, base_filename, output_format, options,
+                              progress_callback)
+    if options.container:
+        return render_to_container(pdf_path, valid_pages, output_dir, base_filename, output_format, options,
+                                   progress_callback, warning_callback)
+
+    if manifest is None and options.incremental:
+        manifest = ExportManifest(output_dir)
+        try:
+            return _render_page_files(pdf_path, valid_pages, output_dir, base_filename, output_format, options,
+                                      progress_callback, cache, manifest)
+        finally:
+            manifest.save()
+    return _render_page_files(pdf_path, valid_pages, output_dir, base_filename, output_format, options,
+                              progress_callback, cache, manifest)
+
+
+def _render_page_files(pdf_path, valid_pages, output_dir, base_filename, output_format, options,
+                       progress_callback, cache, manifest):
+    """每页一个文件：跳过清单中未变化的页面，再从缓存恢复，最后渲染剩余页面"""
+    params = {"dpi": options.dpi, "output_format": output_format}
+    # 只在不是默认值时加入参数，原有的缓存和清单记录继续有效
+    if options.color_mode != "rgb":
+        params["color_mode"] = options.color_mode
+    if options.anti_alias is not None:
+        params["anti_alias"] = options.anti_alias
+    digest = None
+    skipped = 0
+    pages_to_check = valid_pages
+    if manifest is not None and valid_pages:
+        digest = manifest.source_digest(pdf_path)
+        pages_to_check = []
+        for page_num in valid_pages:
+            output_path = page_output_path(output_dir, base_filename, page_num, output_format)
+            if not manifest.is_current(os.path.basename(output_path), digest, page_num, params):
+                pages_to_check.append(page_num)
+        skipped = len(valid_pages) - len(pages_to_check)
+        if skipped:
+            report_progress(progress_callback, skipped, len(valid_pages), f"{skipped} 页未变化，已跳过")
+
+    # 先从缓存恢复已经渲染过的页面，只渲染剩余页面
+    cache_keys = {}
+    cache_entry_name = f"page.{output_format}"
+    pages_to_render = pages_to_check
+    if cache is not None and pages_to_check:
+        if digest is None:
+            digest = file_digest(pdf_path)
+        pages_to_render = []
+        for index, page_num in enumerate(pages_to_check):
+            cache_keys[page_num] = cache.make_key(digest, "render", dict(params, page=page_num))
+            output_path = page_output_path(output_dir, base_filename, page_num, output_format)
+            if cache.fetch(cache_keys[page_num], {cache_entry_name: output_path}):
+                if manifest is not None:
+                    manifest.record(os.path.basename(output_path), digest, page_num, params)
+                report_progress(progress_callback, skipped + index + 1 - len(pages_to_render), len(valid_pages),
+                                f"页面 {page_num+1} 命中缓存: {os.path.basename(output_path)}")
+            else:
+                pages_to_render.append(page_num)
+    restored = len(valid_pages) - len(pages_to_render)
+
+    def on_page(done, total, page_num, filename, error):
+        if error is None:
+            message = f"页面 {page_num+1} 已转换为 {filename}"
+            if page_num in cache_keys:
+                cache.store(cache_keys[page_num], {cache_entry_name: os.path.join(output_dir, filename)},
+                            evict=False)
+            if manifest is not None:
+                manifest.record(filename, digest, page_num, params)
+        else:
+            message = f"页面 {page_num+1} 转换失败: {error}"
+        report_progress(progress_callback, restored + done, len(valid_pages), message)
+
+    job = PageFileJob(output_dir, base_filename, output_format, options.dpi, options.color_mode, options.anti_alias)
+    converted = render_pages(pdf_path, pages_to_render, job, workers=options.workers, progress_callback=on_page)
+    if cache_keys and pages_to_render:
+        cache.evict()
+    return restored + converted
@@ -0,0 +1,100 @@
+"""PDF页面尺寸转换的核心实现"""
+import os
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from core.options import ResizeOptions
+from core.progress import report_progress
+
+# 预定义尺寸，格式为 {名称: (宽度mm, 高度mm)}
+PREDEFINED_SIZES = {
+    "A4": (210, 297),
+    "A3": (297, 420),
+    "A5": (148, 210),
+    "B4": (250, 353),
+    "B5": (176, 250),
+    "Letter": (215.9, 279.4),
+    "Legal": (215.9, 355.6),
+    "Executive": (184.1, 266.7)
+}
+
+# 1mm = 2.83465pt
+MM_TO_PT = 2.83465
+
+
+def resized_output_path(input_path, output_dir):
+    """按"原文件名_resized_时间戳.pdf"生成输出文件路径"""
+    name, ext = os.path.splitext(os.path.basename(input_path))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(output_dir, f"{name}_resized_{timestamp}.pdf")
+
+
+def resize_pdf(input_path, output_path, options=None, progress_callback=None):
+    """把PDF的每一页缩放到目标尺寸，页面方向保持与原PDF一致
+
+    Args:
+        input_path: 输入PDF路径
+        output_path: 输出PDF路径
+        options: ResizeOptions，为空时使用A4
+        progress_callback: 每处理一页调用一次 (当前页, 总页数, 状态信息)
+    """
+    if options is None:
+        options = ResizeOptions()
+
+    # 打开输入PDF
+    pdf_doc = fitz.open(input_path)
+    # 创建新PDF
+    new_doc = fitz.open()
+
+    # 设置目标尺寸（毫米转换为点）
+    target_width_pt = options.width_mm * MM_TO_PT
+    target_height_pt = options.height_mm * MM_TO_PT
+
+    total_pages = len(pdf_doc)
+    for i, page in enumerate(pdf_doc):
+        # 检查页面方向
+        is_landscape = page.rect.width > page.rect.height
+
+        # 根据原始页面方向决定目标页面方向
+        if is_landscape:
+            # 如果原页面是横向，交换宽高
+            rect = fitz.Rect(0, 0,
+                             int(max(target_width_pt, target_height_pt)),
+                             int(min(target_width_pt, target_height_pt)))
+        else:
+            # 如果原页面是纵向，正常设置宽高
+            rect = fitz.Rect(0, 0,
+                             int(min(target_width_pt, target_height_pt)),
+                             int(max(target_width_pt, target_height_pt)))
+
+        # 创建新页面
+        new_page = new_doc.new_page(width=int(rect.width), height=int(rect.height))
+
+        # 缩放内容到新页面大小
+        mat = fitz.Matrix(rect.width/page.rect.width, rect.height/page.rect.height)
+
+        # 修复: 处理不同版本PyMuPDF的API差异
+        try:
+            # 旧版PyMuPDF API (不使用命名参数)
+            new_page.show_pdf_page(rect, pdf_doc, i, mat)
+        except TypeError:
+            try:
+                # 如果失败，尝试不同参数顺序
+                new_page.show_pdf_page(rect, pdf_doc, page.number, mat)
+            except TypeError:
+                try:
+                    # 再尝试一种不带矩阵的方式，但会导致不精确的缩放
+                    new_page.show_pdf_page(rect, pdf_doc, i)
+                except:
+                    # 如果所有方法都失败，尝试直接复制页面然后进行缩放变形
+                    new_page = new_doc.new_page(-1, width=rect.width, height=rect.height)
+                    new_page.insert_pdf(pdf_doc, from_page=i, to_page=i)
+
+        # 更新进度
+        report_progress(progress_callback, i + 1, total_pages, f"处理页面 {i+1}/{total_pages}")
+
+    # 保存新PDF
+    new_doc.save(output_path)
+    new_doc.close()
+    pdf_doc.close()
@@ -0,0 +1,141 @@
+"""文件夹扫描
+
+用 os.scandir 逐层遍历文件夹，找到扩展名匹配的文件后立即交给线程池，
+并行读取文件大小、按文件头识别实际格式。PyMuPDF不是线程安全的，
+PDF的页数在取出结果的线程中逐个读取，不在线程池中调用 fitz。
+结果按发现顺序分批产出，调用方不必等整个文件夹遍历完。
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from core.pipeline import ordered_map
+
+# 每批返回的文件数
+SCAN_BATCH_SIZE = 500
+# 同时在检查中的文件数上限
+SCAN_WINDOW = 64
+# 识别格式时读取的文件头字节数，PDF规范允许 %PDF- 前有少量其他数据
+SNIFF_BYTES = 1024
+
+PDF_EXTENSIONS = ('.pdf',)
+
+
+@dataclass
+class ScanEntry:
+    """扫描到的文件及其大小、格式和页数提示"""
+    path: str
+    size: int = 0
+    kind: Optional[str] = None  # 按文件头识别的格式，如 "pdf"、"jpeg"，无法识别时为None
+    page_count: Optional[int] = None  # 只有PDF会读取页数
+    error: Optional[str] = None  # 文件无法读取或内容与扩展名不符
+
+
+def sniff_format(header):
+    """根据文件头识别格式
+
+    Args:
+        header: 文件开头的字节
+
+    Returns:
+        str: 格式名称，无法识别时返回None
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if b"%PDF-" in header:
+        return "pdf"
+    return None
+
+
+def iter_matching_files(folder_path, extensions):
+    """递归遍历文件夹，逐个产出扩展名匹配的文件路径
+
+    无法读取的子文件夹被跳过；不跟随指向文件夹的符号链接，避免循环。
+    """
+    pending = [folder_path]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirectories = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                        elif entry.name.lower().endswith(extensions) and entry.is_file():
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        # 倒序入栈，按目录中的顺序处理子文件夹
+        pending.extend(reversed(subdirectories))
+
+
+def inspect_file(file_path):
+    """读取文件大小、按文件头识别格式，只读取文件头，可以在线程池中执行"""
+    entry = ScanEntry(path=file_path)
+    try:
+        entry.size = os.stat(file_path).st_size
+        with open(file_path, "rb") as f:
+            header = f.read(SNIFF_BYTES)
+    except OSError as e:
+        entry.error = f"无法读取文件: {str(e)}"
+        return entry
+
+    entry.kind = sniff_format(header)
+    is_pdf_name = file_path.lower().endswith(PDF_EXTENSIONS)
+    if entry.kind is None:
+        entry.error = "不是有效的PDF文件" if is_pdf_name else "无法识别的图片格式"
+    elif is_pdf_name != (entry.kind == "pdf"):
+        entry.error = f"文件内容({entry.kind})与扩展名不符"
+    return entry
+
+
+def read_page_count(entry):
+    """用 fitz 读取PDF的页数，打不开时记录错误；不能在多个线程中同时调用"""
+    try:
+        with fitz.open(entry.path) as doc:
+            entry.page_count = len(doc)
+    except Exception as e:
+        entry.error = f"无法打开PDF文件: {str(e)}"
+
+
+def scan_folder(folder_path, extensions, workers=None, batch_size=SCAN_BATCH_SIZE, window=SCAN_WINDOW):
+    """扫描文件夹，按发现顺序分批产出检查结果
+
+    Args:
+        folder_path: 要扫描的文件夹
+        extensions: 小写扩展名元组，如 ('.pdf',)
+        workers: 读取文件头的线程数，None 表示使用CPU核心数；PDF页数只在当前线程中读取
+        batch_size: 每批文件数
+        window: 同时在检查中的文件数上限
+
+    Yields:
+        list: 一批 ScanEntry
+    """
+    batch = []
+    paths = iter_matching_files(folder_path, extensions)
+    for file_path, entry, error in ordered_map(inspect_file, paths, workers, window):
+        if error is not None:
+            entry = ScanEntry(path=file_path, error=str(error))
+        elif entry.kind == "pdf" and entry.error is None:
+            read_page_count(entry)
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,301 @@
+"""超大页面的分块渲染
+
+高DPI下整页渲染需要 宽×高×通道数 字节的像素缓冲区，A0图纸在1200DPI时超过9GB。
+这里先取得页面的显示列表，再逐块按裁剪区域渲染，边渲染边写入文件：
+TIFF输出为分块(tiled)TIFF，内存只与块大小有关；
+PNG输出按整行宽度的窄条带写入，内存只与页面宽度×条带高度有关。
+JPEG等格式无法分块写出，页面过大时报错并提示改用PNG或TIFF。
+灰度和黑白模式按单通道渲染，黑白模式的每块再按阈值打包为1位，
+TIFF中的1位块与整页保存时一样使用CCITT G4压缩。
+"""
+import io
+import struct
+import zlib
+
+import fitz  # PyMuPDF
+from PIL import Image, features
+
+from core.pixmap import pixmap_colorspace, to_mono
+
+# 渲染后像素数超过该值的页面改为分块渲染（约64MP，RGB约192MB）
+MAX_UNTILED_PIXELS = 64 * 1024 * 1024
+
+# TIFF块边长，TIFF规范要求为16的倍数
+DEFAULT_TILE_SIZE = 1024
+# PNG每次渲染和压缩的行数
+PNG_STRIP_HEIGHT = 128
+
+# 分块渲染时空白填充的像素值（白色）
+FILL_BYTE = 255
+
+# 经典TIFF的偏移量是32位，预计超过该大小时写BigTIFF
+CLASSIC_TIFF_LIMIT = 0xF0000000
+
+# TIFF压缩方式: CCITT G4、Adobe Deflate
+TIFF_GROUP4 = 4
+TIFF_DEFLATE = 8
+
+# TIFF字段类型: SHORT, LONG, RATIONAL, LONG8
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_RATIONAL = 5
+TIFF_LONG8 = 16
+TIFF_TYPE_SIZES = {TIFF_SHORT: 2, TIFF_LONG: 4, TIFF_RATIONAL: 8, TIFF_LONG8: 8}
+TIFF_TYPE_FORMATS = {TIFF_SHORT: "H", TIFF_LONG: "I", TIFF_RATIONAL: "II", TIFF_LONG8: "Q"}
+
+
+def page_pixel_size(page, dpi):
+    """页面按指定DPI渲染后的像素尺寸"""
+    zoom = dpi / 72
+    irect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    return irect.width, irect.height
+
+
+def needs_tiling(page, dpi, max_pixels=MAX_UNTILED_PIXELS):
+    """整页渲染的像素数是否超过上限"""
+    width, height = page_pixel_size(page, dpi)
+    return width * height > max_pixels
+
+
+def render_region(display_list, zoom, x0, y0, x1, y1, colorspace=None):
+    """渲染页面上 [x0, x1) × [y0, y1) 像素范围的区域
+
+    Returns:
+        tuple: (每行像素数据的列表, 通道数)，每行正好 (x1 - x0) 个像素
+    """
+    clip = fitz.Rect(x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom)
+    pix = display_list.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace or fitz.csRGB,
+                                  alpha=False, clip=clip)
+    channels = pix.n
+    width = x1 - x0
+    row_bytes = width * channels
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    rows = []
+    for y in range(y1 - y0):
+        if y < pix.height:
+            row = bytes(samples[y * pix.stride:y * pix.stride + min(pix.width, width) * channels])
+        else:
+            row = b""
+        # 浮点误差可能使裁剪结果差一个像素，不足的部分补白
+        if len(row) < row_bytes:
+            row += bytes([FILL_BYTE]) * (row_bytes - len(row))
+        rows.append(row)
+    return rows, channels
+
+
+def group4_tile(data, tile_size):
+    """用PIL(libtiff)把一块打包好的1位数据编码为CCITT G4数据"""
+    img = Image.frombytes("1", (tile_size, tile_size), data)
+    buffer = io.BytesIO()
+    # 整块编码为一个条带，条带数据就是块数据
+    img.save(buffer, format="TIFF", compression="group4", strip_size=len(data) + 1)
+    buffer.seek(0)
+    with Image.open(buffer) as encoded:
+        offset = encoded.tag_v2[273][0]
+        byte_count = encoded.tag_v2[279][0]
+    return buffer.getvalue()[offset:offset + byte_count]
+
+
+def pack_mono_rows(rows, width):
+    """把8位灰度行按阈值打包为1位行（每字节8个像素，高位在前，1为白色）"""
+    img = to_mono(Image.frombytes("L", (width, len(rows)), b"".join(rows)))
+    data = img.tobytes()
+    row_bytes = (width + 7) // 8
+    return [data[i * row_bytes:(i + 1) * row_bytes] for i in range(len(rows))]
+
+
+class TiledTiffWriter:
+    """按块顺序写入的TIFF文件，块数据写完后在文件末尾写目录(IFD)
+
+    块按从左到右、从上到下的顺序写入，每块都是完整的 tile_size×tile_size，
+    右侧和底部超出图像的部分用白色填充。bits 为1时每行是打包后的1位数据，
+    压缩时使用CCITT G4（PIL没有libtiff时改用Deflate）。
+    """
+
+    def __init__(self, output_path, width, height, channels, tile_size=DEFAULT_TILE_SIZE, dpi=None,
+                 compress=True, bits=8):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.tile_size = tile_size
+        self.dpi = dpi
+        self.bits = bits
+        self.compression = None
+        if compress:
+            self.compression = TIFF_GROUP4 if bits == 1 and features.check("libtiff") else TIFF_DEFLATE
+        # 未压缩大小接近4GB时改用64位偏移量的BigTIFF
+        self.bigtiff = width * height * channels * bits // 8 >= CLASSIC_TIFF_LIMIT
+        self.offsets = []
+        self.byte_counts = []
+        self.file = open(output_path, "wb")
+        if self.bigtiff:
+            self.file.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+        else:
+            self.file.write(b"II" + struct.pack("<HI", 42, 0))
+
+    @property
+    def tiles_across(self):
+        return -(-self.width // self.tile_size)
+
+    @property
+    def tiles_down(self):
+        return -(-self.height // self.tile_size)
+
+    def write_tile(self, rows):
+        """写入一块，rows 为该块中实际图像区域的每行数据"""
+        row_bytes = self.tile_size * self.channels * self.bits // 8
+        padding_row = bytes([FILL_BYTE]) * row_bytes
+        data = b"".join(row + bytes([FILL_BYTE]) * (row_bytes - len(row)) for row in rows)
+        data += padding_row * (self.tile_size - len(rows))
+        if self.compression == TIFF_GROUP4:
+            data = group4_tile(data, self.tile_size)
+        elif self.compression == TIFF_DEFLATE:
+            data = zlib.compress(data, 6)
+        self._align()
+        self.offsets.append(self.file.tell())
+        self.byte_counts.append(len(data))
+        self.file.write(data)
+
+    def _align(self):
+        # TIFF要求偏移量为偶数
+        if self.file.tell() % 2:
+            self.file.write(b"\0")
+
+    def _write_ifd(self):
+        offset_type = TIFF_LONG8 if self.bigtiff else TIFF_LONG
+        entries = [
+            (256, TIFF_LONG, [self.width]),
+            (257, TIFF_LONG, [self.height]),
+            (258, TIFF_SHORT, [self.bits] * self.channels),
+            (259, TIFF_SHORT, [self.compression or 1]),
+            (262, TIFF_SHORT, [2 if self.channels >= 3 else 1]),  # RGB / 灰度（黑为0）
+            (277, TIFF_SHORT, [self.channels]),
+            (284, TIFF_SHORT, [1]),
+            (322, TIFF_LONG, [self.tile_size]),
+            (323, TIFF_LONG, [self.tile_size]),
+            (324, offset_type, self.offsets),
+            (325, offset_type, self.byte_counts),
+        ]
+        if self.dpi:
+            entries += [
+                (282, TIFF_RATIONAL, [(int(self.dpi), 1)]),
+                (283, TIFF_RATIONAL, [(int(self.dpi), 1)]),
+                (296, TIFF_SHORT, [2]),  # 分辨率单位: 英寸
+            ]
+        entries.sort()
+
+        inline_size = 8 if self.bigtiff else 4
+        count_format = "Q" if self.bigtiff else "I"
+        offset_format = "Q" if self.bigtiff else "I"
+
+        # 放不进目录项的数值先写在目录前面
+        packed_entries = []
+        for tag, field_type, values in entries:
+            fmt = "<" + TIFF_TYPE_FORMATS[field_type] * len(values)
+            flat = [v for value in values for v in (value if isinstance(value, tuple) else (value,))]
+            data = struct.pack(fmt, *flat)
+            if len(data) <= inline_size:
+                field = data.ljust(inline_size, b"\0")
+            else:
+                self._align()
+                field = struct.pack("<" + offset_format, self.file.tell())
+                self.file.write(data)
+            packed_entries.append(struct.pack("<HH" + count_format, tag, field_type, len(values)) + field)
+
+        self._align()
+        ifd_offset = self.file.tell()
+        self.file.write(struct.pack("<" + ("Q" if self.bigtiff else "H"), len(packed_entries)))
+        self.file.write(b"".join(packed_entries))
+        self.file.write(struct.pack("<" + offset_format, 0))
+
+        # 回填文件头中的目录偏移量
+        self.file.seek(8 if self.bigtiff else 4)
+        self.file.write(struct.pack("<" + offset_format, ifd_offset))
+
+    def close(self):
+        """写入目录并关闭文件"""
+        if self.file.closed:
+            return
+        try:
+            expected = self.tiles_across * self.tiles_down
+            if len(self.offsets) != expected:
+                raise ValueError(f"TIFF块数不完整: {len(self.offsets)}/{expected}")
+            self._write_ifd()
+        finally:
+            self.file.close()
+
+
+def _png_chunk(chunk_type, data):
+    return (struct.pack(">I", len(data)) + chunk_type + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def render_tiled_tiff(page, dpi, output_path, tile_size=DEFAULT_TILE_SIZE, color_mode="rgb"):
+    """逐块渲染页面并写入分块TIFF，内存占用只与块大小有关"""
+    zoom = dpi / 72
+    width, height = page_pixel_size(page, dpi)
+    colorspace = pixmap_colorspace(color_mode)
+    mono = color_mode == "mono"
+    display_list = page.get_displaylist()
+    writer = None
+    try:
+        for y0 in range(0, height, tile_size):
+            y1 = min(y0 + tile_size, height)
+            for x0 in range(0, width, tile_size):
+                x1 = min(x0 + tile_size, width)
+                rows, channels = render_region(display_list, zoom, x0, y0, x1, y1, colorspace)
+                if mono:
+                    rows = pack_mono_rows(rows, x1 - x0)
+                if writer is None:
+                    writer = TiledTiffWriter(output_path, width, height, channels, tile_size, dpi,
+                                             bits=1 if mono else 8)
+                writer.write_tile(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def render_png_strips(page, dpi, output_path, strip_height=PNG_STRIP_HEIGHT, color_mode="rgb"):
+    """按整行宽度的条带渲染页面并流式写入PNG，黑白模式写1位深度"""
+    zoom = dpi / 72
+    width, height = page_pixel_size(page, dpi)
+    colorspace = pixmap_colorspace(color_mode)
+    mono = color_mode == "mono"
+    display_list = page.get_displaylist()
+    compressor = zlib.compressobj(6)
+    with open(output_path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        for y0 in range(0, height, strip_height):
+            y1 = min(y0 + strip_height, height)
+            rows, channels = render_region(display_list, zoom, 0, y0, width, y1, colorspace)
+            if mono:
+                rows = pack_mono_rows(rows, width)
+            if y0 == 0:
+                color_type = 2 if channels >= 3 else 0  # RGB / 灰度
+                bit_depth = 1 if mono else 8
+                f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)))
+                pixels_per_meter = round(dpi / 0.0254)
+                f.write(_png_chunk(b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1)))
+            # 每行前加过滤类型0（不过滤）
+            data = compressor.compress(b"".join(b"\0" + row for row in rows))
+            if data:
+                f.write(_png_chunk(b"IDAT", data))
+        f.write(_png_chunk(b"IDAT", compressor.flush()))
+        f.write(_png_chunk(b"IEND", b""))
+
+
+def render_large_page(page, dpi, output_path, output_format, tile_size=DEFAULT_TILE_SIZE, color_mode="rgb"):
+    """分块渲染超大页面，color_mode 为 "rgb"、"gray" 或 "mono"
+
+    Raises:
+        ValueError: 输出格式无法分块写出
+    """
+    output_format = output_format.lower()
+    if output_format in ("tif", "tiff"):
+        render_tiled_tiff(page, dpi, output_path, tile_size, color_mode)
+    elif output_format == "png":
+        render_png_strips(page, dpi, output_path, color_mode=color_mode)
+    else:
+        width, height = page_pixel_size(page, dpi)
+        raise ValueError(f"页面渲染后为 {width}×{height} 像素，{output_format.upper()} 格式无法分块写出，"
+                         f"请改用PNG或TIFF格式或降低DPI")
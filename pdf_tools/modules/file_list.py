@@ -0,0 +1,362 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+from core.scanner import scan_folder
+
+# 界面从遍历结果队列取数据的间隔（毫秒）和每次最多处理的批数
+SCAN_POLL_INTERVAL = 50
+SCAN_BATCHES_PER_TICK = 4
+
+# 筛选框输入停止多久后再重新筛选（毫秒）
+FILTER_DELAY = 200
+# 鼠标滚轮每格滚动的行数
+WHEEL_ROWS = 3
+
+
+def scan_folder_async(widget, folder_path, extensions, on_batch, on_done):
+    """在后台线程扫描文件夹，按批次把文件交给Tk主线程
+
+    文件的大小、格式和页数在扫描线程池中检查，内容与扩展名不符或无法打开的文件不会加入列表。
+
+    Args:
+        widget: 用于 after() 调度的Tk组件
+        extensions: 小写扩展名元组
+        on_batch: 在Tk主线程中调用 on_batch(有效的 ScanEntry 列表)
+        on_done: 扫描结束后在Tk主线程中调用 on_done(有效文件数, 被跳过的 ScanEntry 列表)
+    """
+    results = queue.Queue()
+
+    def walk():
+        try:
+            for batch in scan_folder(folder_path, extensions):
+                results.put(batch)
+        finally:
+            results.put(None)
+
+    found = 0
+    rejected = []
+
+    def drain():
+        nonlocal found
+        # 每次只处理几批，避免一次插入太多行使界面停顿
+        for _ in range(SCAN_BATCHES_PER_TICK):
+            try:
+                batch = results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                on_done(found, rejected)
+                return
+            valid = [entry for entry in batch if entry.error is None]
+            rejected.extend(entry for entry in batch if entry.error is not None)
+            found += len(valid)
+            if valid:
+                on_batch(valid)
+        widget.after(SCAN_POLL_INTERVAL, drain)
+
+    threading.Thread(target=walk, daemon=True).start()
+    widget.after(SCAN_POLL_INTERVAL, drain)
+
+
+def describe_rejected(rejected, limit=10):
+    """生成被跳过文件的提示信息，最多列出 limit 个"""
+    lines = [f"{os.path.basename(entry.path)}: {entry.error}" for entry in rejected[:limit]]
+    if len(rejected) > limit:
+        lines.append(f"... 等共 {len(rejected)} 个文件")
+    return "\n".join(lines)
+
+
+class VirtualFileList(ttk.Frame):
+    """只渲染可见行的文件列表
+
+    数据保存在共享的 FileSet 中，列表框里始终只有一屏的行，滚动时重新填充，
+    添加和删除文件只改动数据再重绘一次，十万个文件时也不会卡顿。
+    选中状态按文件在 FileSet 中的位置记录，由本类自己处理点击和滚动。
+    """
+
+    def __init__(self, master, files, show_filter=True, **listbox_options):
+        super().__init__(master)
+        self.files = files
+        self.view = None  # 符合筛选条件的文件位置列表，None 表示不筛选
+        self.selected = set()
+        self.anchor = None  # Shift多选的起点（视图中的行号）
+        self.top = 0  # 第一个可见行在视图中的行号
+        self.rows = 1  # 可见行数
+        self._filter_text = ""
+        self._filter_job = None
+
+        self.filter_var = tk.StringVar()
+        if show_filter:
+            filter_frame = ttk.Frame(self)
+            filter_frame.pack(side=tk.TOP, fill="x", pady=(0, 5))
+            ttk.Label(filter_frame, text="筛选:").pack(side=tk.LEFT, padx=5)
+            ttk.Entry(filter_frame, textvariable=self.filter_var).pack(side=tk.LEFT, fill="x", expand=True, padx=5)
+            self.count_label = ttk.Label(filter_frame, text="")
+            self.count_label.pack(side=tk.RIGHT, padx=5)
+            self.filter_var.trace_add("write", self._schedule_filter)
+        else:
+            self.count_label = None
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.listbox = tk.Listbox(self, selectmode=tk.EXTENDED, exportselection=False,
+                                  activestyle="none", **listbox_options)
+        self.listbox.pack(side=tk.LEFT, fill="both", expand=True)
+
+        font = tkfont.Font(font=self.listbox.cget("font"))
+        # 与Tk列表框内部的行高计算方式一致
+        self.line_height = font.metrics("linespace") + 1 + 2 * int(self.listbox.cget("selectborderwidth"))
+
+        self.listbox.bind("<Configure>", self._on_resize)
+        self.listbox.bind("<Button-1>", self._on_click)
+        self.listbox.bind("<Control-Button-1>", self._on_ctrl_click)
+        self.listbox.bind("<Shift-Button-1>", self._on_shift_click)
+        self.listbox.bind("<B1-Motion>", self._on_shift_click)
+        # 列表框自带的拖出边界自动滚动会移动内部视图，这里由 _on_shift_click 处理
+        self.listbox.bind("<B1-Leave>", lambda e: "break")
+        self.listbox.bind("<MouseWheel>", self._on_wheel)
+        self.listbox.bind("<Button-4>", lambda e: self._scroll_rows(-WHEEL_ROWS))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll_rows(WHEEL_ROWS))
+        self.listbox.bind("<Up>", lambda e: self._move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self._move_selection(1))
+        self.listbox.bind("<Control-a>", self._select_all)
+        self.listbox.bind("<Control-A>", self._select_all)
+        self._render()
+
+    # ---- 数据操作 ----
+
+    def add_files(self, file_paths):
+        """批量添加文件，已在列表中的文件被跳过
+
+        Returns:
+            list: 新添加的文件
+        """
+        start = len(self.files)
+        added = self.files.extend(file_paths)
+        if added:
+            if self.view is not None:
+                # 只检查新添加的文件是否符合筛选条件
+                self.view.extend(position for position in range(start, len(self.files))
+                                 if self._matches(self.files[position]))
+            self._render()
+        return added
+
+    def add_scanned(self, entries):
+        """添加扫描得到的文件并保存其大小和页数提示"""
+        self.files.set_hints(entries)
+        return self.add_files([entry.path for entry in entries])
+
+    def delete_selected(self):
+        """删除所有选中且在当前筛选结果中可见的文件
+
+        Returns:
+            list: 被删除的文件
+        """
+        removed = self.files.remove_indices(self.selected_indices())
+        self.clear_selection()
+        self.refresh()
+        return removed
+
+    def clear(self):
+        """清空文件列表"""
+        self.files.clear()
+        self.clear_selection()
+        self.refresh()
+
+    def refresh(self):
+        """文件列表被直接修改（如交换顺序）后重新筛选并重绘"""
+        self._apply_filter()
+        self._render()
+
+    # ---- 选中状态 ----
+
+    def selected_indices(self):
+        """选中且在当前筛选结果中可见的文件在 FileSet 中的位置，从小到大排列"""
+        if self.view is None:
+            return sorted(self.selected)
+        return sorted(self.selected.intersection(self.view))
+
+    def clear_selection(self):
+        self.selected.clear()
+        self.anchor = None
+
+    def select(self, position):
+        """只选中指定位置的文件并滚动到该行"""
+        self.selected = {position}
+        row = self._row_of(position)
+        self.anchor = row
+        if row is not None:
+            self.see(row)
+        self._render()
+
+    def see(self, row):
+        """滚动使视图中的指定行可见"""
+        if row < self.top:
+            self.top = row
+        elif row >= self.top + self.rows:
+            self.top = row - self.rows + 1
+        self._render()
+
+    # ---- 筛选 ----
+
+    def _schedule_filter(self, *args):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY, self._on_filter_changed)
+
+    def _on_filter_changed(self):
+        self._filter_job = None
+        self.top = 0
+        # 筛选条件变化后原来的选中行可能被隐藏，清除选中，避免删除看不到的文件
+        self.clear_selection()
+        self.refresh()
+
+    def _matches(self, file_path):
+        return self._filter_text in os.path.basename(file_path).lower()
+
+    def _apply_filter(self):
+        self._filter_text = self.filter_var.get().strip().lower()
+        if not self._filter_text:
+            self.view = None
+        else:
+            self.view = [position for position, file_path in enumerate(self.files) if self._matches(file_path)]
+
+    def _row_count(self):
+        return len(self.files) if self.view is None else len(self.view)
+
+    def _position_at(self, row):
+        return row if self.view is None else self.view[row]
+
+    def _row_of(self, position):
+        if self.view is None:
+            return position if position < len(self.files) else None
+        try:
+            return self.view.index(position)
+        except ValueError:
+            return None
+
+    # ---- 绘制与滚动 ----
+
+    def _render(self):
+        total = self._row_count()
+        self.top = max(0, min(self.top, total - self.rows))
+        end = min(self.top + self.rows, total)
+        positions = [self._position_at(row) for row in range(self.top, end)]
+
+        self.listbox.delete(0, tk.END)
+        if positions:
+            self.listbox.insert(0, *[os.path.basename(self.files[position]) for position in positions])
+        for offset, position in enumerate(positions):
+            if position in self.selected:
+                self.listbox.selection_set(offset)
+
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+        if self.count_label is not None:
+            if self.view is None:
+                self.count_label.config(text=f"共 {len(self.files)} 个文件")
+            else:
+                self.count_label.config(text=f"显示 {total} / {len(self.files)} 个文件")
+
+    def yview(self, *args):
+        """滚动条回调"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * self._row_count())
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.rows
+            self.top += amount
+        self._render()
+
+    def _scroll_rows(self, amount):
+        self.top += amount
+        self._render()
+        return "break"
+
+    def _on_wheel(self, event):
+        # Windows上每格为120，macOS上为较小的整数
+        notches = int(event.delta / 120) or (1 if event.delta > 0 else -1)
+        return self._scroll_rows(-notches * WHEEL_ROWS)
+
+    def _on_resize(self, event):
+        border = 2 * (int(self.listbox.cget("borderwidth")) + int(self.listbox.cget("highlightthickness")))
+        rows = max(1, (event.height - border) // self.line_height)
+        if rows != self.rows:
+            self.rows = rows
+            self._render()
+
+    # ---- 鼠标和键盘选择 ----
+
+    def _row_at(self, event):
+        """鼠标位置对应视图中的行号，空白处返回None"""
+        if self.listbox.size() == 0:
+            return None
+        offset = self.listbox.nearest(event.y)
+        bbox = self.listbox.bbox(offset)
+        if bbox and event.y > bbox[1] + bbox[3]:
+            return None
+        return self.top + offset
+
+    def _on_click(self, event):
+        self.listbox.focus_set()
+        row = self._row_at(event)
+        if row is None:
+            self.clear_selection()
+        else:
+            self.selected = {self._position_at(row)}
+            self.anchor = row
+        self._render()
+        return "break"
+
+    def _on_ctrl_click(self, event):
+        row = self._row_at(event)
+        if row is not None:
+            self.selected ^= {self._position_at(row)}
+            self.anchor = row
+            self._render()
+        return "break"
+
+    def _on_shift_click(self, event):
+        total = self._row_count()
+        # 拖动到列表框上下边界外时继续滚动
+        if event.y < 0:
+            self.top = max(0, self.top - 1)
+            row = self.top if total else None
+        elif event.y >= self.listbox.winfo_height():
+            self.top = max(0, min(self.top + 1, total - self.rows))
+            row = min(self.top + self.rows, total) - 1 if total else None
+        else:
+            row = self._row_at(event)
+        if row is None:
+            return "break"
+        if self.anchor is None:
+            self.anchor = row
+        start, end = sorted((self.anchor, row))
+        self.selected = {self._position_at(r) for r in range(start, end + 1)}
+        self._render()
+        return "break"
+
+    def _move_selection(self, step):
+        total = self._row_count()
+        if not total:
+            return "break"
+        row = self.anchor if self.anchor is not None else -step
+        row = max(0, min(row + step, total - 1))
+        self.selected = {self._position_at(row)}
+        self.anchor = row
+        self.see(row)
+        return "break"
+
+    def _select_all(self, event=None):
+        total = self._row_count()
+        self.selected = {self._position_at(row) for row in range(total)}
+        self._render()
+        return "break"
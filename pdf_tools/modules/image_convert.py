@@ -4,7 +4,17 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter.scrolledtext import ScrolledText
 import threading
-from PIL import Image
+import queue
+from core.options import ConvertOptions
+from core.convert import IMAGE_EXTENSIONS, convert_batch
+from core.cache import ResultCache
+from core.memory import memory_report
+from core.filelist import FileSet
+from modules.file_list import scan_folder_async, describe_rejected, VirtualFileList
+
+# 界面从结果队列取消息的间隔（毫秒）和每次最多处理的消息数
+QUEUE_POLL_INTERVAL = 100
+QUEUE_BATCH_SIZE = 500
 
 class ImageConvertTab:
     """图片格式转换标签页类"""
@@ -13,7 +23,9 @@ class ImageConvertTab:
         self.parent = parent
         self.theme_manager = theme_manager
         self.style = theme_manager.style
-        self.img_file_paths = []
+        self.img_file_paths = FileSet()
+        # 后台转换线程放入消息，Tk主线程定时取出并更新界面
+        self.result_queue = queue.Queue()
         
         # 创建界面
         self.frame = ttk.Frame(parent)
@@ -40,14 +52,9 @@ class ImageConvertTab:
         file_list_frame.pack(fill="both", expand=True, padx=10, pady=5)
         
         # 图片文件列表
-        self.img_listbox = tk.Listbox(file_list_frame, selectmode=tk.EXTENDED, height=8)
+        self.img_listbox = VirtualFileList(file_list_frame, self.img_file_paths, height=8)
         self.img_listbox.pack(side=tk.LEFT, fill="both", expand=True, padx=5, pady=5)
         
-        # 滚动条
-        scrollbar = ttk.Scrollbar(file_list_frame, orient="vertical", command=self.img_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill="y")
-        self.img_listbox.config(yscrollcommand=scrollbar.set)
-        
         # 移除选中的文件按钮
         ttk.Button(file_list_frame, text="移除选中", command=self.remove_selected_images).pack(side=tk.BOTTOM, padx=5, pady=5)
         
@@ -57,12 +64,12 @@ class ImageConvertTab:
         
         ttk.Label(format_frame, text="源格式:").pack(side=tk.LEFT, padx=5, pady=5)
         self.input_format = tk.StringVar(value="全部")
-        input_formats = ["全部", "JPG", "PNG", "TIFF", "BMP", "GIF"]
+        input_formats = ["全部", "JPG", "PNG", "TIFF", "BMP", "GIF", "WEBP"]
         ttk.Combobox(format_frame, textvariable=self.input_format, values=input_formats, width=10).pack(side=tk.LEFT, padx=5, pady=5)
         
         ttk.Label(format_frame, text="目标格式:").pack(side=tk.LEFT, padx=5, pady=5)
         self.img_output_format = tk.StringVar(value="JPG")
-        output_formats = ["JPG", "PNG", "TIFF", "BMP", "GIF"]
+        output_formats = ["JPG", "PNG", "TIFF", "BMP", "GIF", "WEBP"]
         ttk.Combobox(format_frame, textvariable=self.img_output_format, values=output_formats, width=10).pack(side=tk.LEFT, padx=5, pady=5)
         
         # 图像质量和尺寸选项
@@ -73,6 +80,13 @@ class ImageConvertTab:
         self.quality_var = tk.StringVar(value="85")
         ttk.Entry(quality_frame, textvariable=self.quality_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
         
+        ttk.Label(quality_frame, text="并行进程数:").pack(side=tk.LEFT, padx=20, pady=5)
+        self.workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        ttk.Entry(quality_frame, textvariable=self.workers_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.use_cache = tk.BooleanVar(value=True)
+        ttk.Checkbutton(quality_frame, text="使用结果缓存", variable=self.use_cache).pack(side=tk.LEFT, padx=20, pady=5)
+        
         # 调整尺寸选项
         resize_frame = ttk.Frame(self.frame)
         resize_frame.pack(fill="x", padx=10, pady=5)
@@ -94,6 +108,14 @@ class ImageConvertTab:
         self.keep_ratio = tk.BooleanVar(value=True)
         ttk.Checkbutton(self.resize_options_frame, variable=self.keep_ratio).pack(side=tk.LEFT, padx=5, pady=5)
         
+        # 缩放方式：质量优先直接LANCZOS缩放，速度优先先降采样解码再缩放
+        ttk.Label(self.resize_options_frame, text="缩放方式:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.fast_resize = tk.BooleanVar(value=False)
+        ttk.Radiobutton(self.resize_options_frame, text="质量优先", value=False,
+                        variable=self.fast_resize).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Radiobutton(self.resize_options_frame, text="速度优先", value=True,
+                        variable=self.fast_resize).pack(side=tk.LEFT, padx=5, pady=5)
+        
         # 输出目录
         output_frame = ttk.Frame(self.frame)
         output_frame.pack(fill="x", padx=10, pady=5)
@@ -110,7 +132,8 @@ class ImageConvertTab:
         self.img_progress = ttk.Progressbar(action_frame, orient="horizontal", length=100, mode="determinate")
         self.img_progress.pack(fill="x", side=tk.LEFT, expand=True, padx=5, pady=5)
         
-        ttk.Button(action_frame, text="转换", command=self.convert_images).pack(side=tk.RIGHT, padx=5, pady=5)
+        self.convert_button = ttk.Button(action_frame, text="转换", command=self.convert_images)
+        self.convert_button.pack(side=tk.RIGHT, padx=5, pady=5)
         
         # 日志区域
         log_frame = ttk.LabelFrame(self.frame, text="处理日志")
@@ -129,50 +152,39 @@ class ImageConvertTab:
         else:
             self.resize_options_frame.pack_forget()
     
+    def add_image_files(self, file_paths):
+        """把文件添加到列表，已在列表中的文件被跳过"""
+        self.img_listbox.add_files(file_paths)
+    
     def select_image_files(self):
         """选择多个图片文件"""
         file_paths = filedialog.askopenfilenames(
             title="选择图片文件",
-            filetypes=[("图片文件", "*.jpg *.jpeg *.png *.gif *.bmp *.tiff *.tif")]
+            filetypes=[("图片文件", "*.jpg *.jpeg *.png *.gif *.bmp *.tiff *.tif *.webp")]
         )
         if file_paths:
-            for file_path in file_paths:
-                if file_path not in self.img_file_paths:
-                    self.img_file_paths.append(file_path)
-                    self.img_listbox.insert(tk.END, os.path.basename(file_path))
+            self.add_image_files(file_paths)
     
     def select_image_folder(self):
         """选择包含图片文件的文件夹"""
         folder_path = filedialog.askdirectory(title="选择包含图片文件的文件夹")
         if folder_path:
-            # 搜索文件夹中的所有图片文件
-            image_files = []
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif')):
-                        full_path = os.path.join(root, file)
-                        image_files.append(full_path)
+            # 在后台线程中扫描文件夹，检查过的文件分批加入列表
+            def on_done(found, rejected):
+                if rejected:
+                    messagebox.showwarning("提示", f"以下文件无法识别或已损坏，未加入列表:\n{describe_rejected(rejected)}")
+                elif not found:
+                    messagebox.showinfo("提示", "所选文件夹中没有找到图片文件")
             
-            # 添加到列表中
-            for file_path in image_files:
-                if file_path not in self.img_file_paths:
-                    self.img_file_paths.append(file_path)
-                    self.img_listbox.insert(tk.END, os.path.basename(file_path))
-            
-            if not image_files:
-                messagebox.showinfo("提示", "所选文件夹中没有找到图片文件")
+            scan_folder_async(self.frame, folder_path, IMAGE_EXTENSIONS, self.img_listbox.add_scanned, on_done)
     
     def remove_selected_images(self):
         """移除选中的图片文件"""
-        selected_indices = self.img_listbox.curselection()
-        for index in reversed(selected_indices):
-            self.img_listbox.delete(index)
-            self.img_file_paths.pop(index)
+        self.img_listbox.delete_selected()
     
     def clear_image_list(self):
         """清空图片文件列表"""
-        self.img_listbox.delete(0, tk.END)
-        self.img_file_paths = []
+        self.img_listbox.clear()
     
     def select_img_output_dir(self):
         """选择图片输出目录"""
@@ -223,118 +235,89 @@ class ImageConvertTab:
                 messagebox.showwarning("警告", "宽度和高度必须是整数")
                 return
         
-        # 准备线程
+        options = ConvertOptions(
+            output_format=output_format,
+            quality=quality,
+            input_format=input_format,
+            width=width,
+            height=height,
+            keep_ratio=self.keep_ratio.get(),
+            fast_resize=self.fast_resize.get()
+        )
+        
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except ValueError:
+            workers = os.cpu_count() or 1
+        
+        file_paths = list(self.img_file_paths)
+        size_hints = self.img_file_paths.size_hints()
+        total_files = len(file_paths)
+        cache = ResultCache() if self.use_cache.get() else None
+        
+        # 后台线程只往队列里放消息，不直接操作Tk组件
+        def on_file_done(result, processed, total):
+            if result.skipped:
+                message = f"跳过非{input_format}文件: {result.file_path}\n"
+            elif result.error is None:
+                message = f"已转换: {os.path.basename(result.file_path)} -> {os.path.basename(result.output_path)}\n"
+            else:
+                message = f"{result.error}\n"
+            self.result_queue.put(("progress", processed, message))
+        
         def conversion_thread():
             try:
-                self.img_log_text.delete(1.0, tk.END)
-                self.img_log_text.insert(tk.END, "开始批量转换图片格式...\n")
-                
-                total_files = len(self.img_file_paths)
-                success_count = 0
-                
-                # 设置进度条
-                self.img_progress["maximum"] = total_files
-                self.img_progress["value"] = 0
-                
-                # 对每个文件进行处理
-                for i, file_path in enumerate(self.img_file_paths):
-                    # 获取文件扩展名和不带扩展名的文件名
-                    file_ext = os.path.splitext(file_path)[1].lower()
-                    base_filename = os.path.splitext(os.path.basename(file_path))[0]
-                    
-                    # 检查输入格式筛选
-                    if input_format != "全部":
-                        if input_format == "jpg" and file_ext not in ['.jpg', '.jpeg']:
-                            self.img_log_text.insert(tk.END, f"跳过非{input_format}文件: {file_path}\n")
-                            continue
-                        elif file_ext != f".{input_format}" and not (input_format == "jpg" and file_ext in ['.jpg', '.jpeg']):
-                            self.img_log_text.insert(tk.END, f"跳过非{input_format}文件: {file_path}\n")
-                            continue
-                    
-                    try:
-                        # 打开图片
-                        img = Image.open(file_path)
-                        
-                        # 如果是PNG带透明通道，并且转为JPG，需要处理背景
-                        if img.mode == 'RGBA' and output_format in ['jpg', 'jpeg']:
-                            # 创建白色背景
-                            background = Image.new('RGB', img.size, (255, 255, 255))
-                            # 合并图层
-                            background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-                            img = background
-                        
-                        # 调整图像大小
-                        if resize_enabled and (width or height):
-                            current_width, current_height = img.size
-                            new_width, new_height = width, height
-                            
-                            # 如果保持比例且只指定了宽度或高度
-                            if self.keep_ratio.get():
-                                if width and not height:
-                                    ratio = width / current_width
-                                    new_height = int(current_height * ratio)
-                                elif height and not width:
-                                    ratio = height / current_height
-                                    new_width = int(current_width * ratio)
-                                elif width and height:
-                                    # 使用较小的缩放比例以确保图像完全适合指定的尺寸
-                                    ratio_width = width / current_width
-                                    ratio_height = height / current_height
-                                    ratio = min(ratio_width, ratio_height)
-                                    new_width = int(current_width * ratio)
-                                    new_height = int(current_height * ratio)
-                            
-                            # 调整大小
-                            img = img.resize((new_width, new_height), Image.LANCZOS)
-                        
-                        # 构建输出文件名
-                        output_filename = f"{base_filename}.{output_format}"
-                        output_path = os.path.join(output_dir, output_filename)
-                        
-                        # 如果文件已存在，添加序号
-                        counter = 1
-                        while os.path.exists(output_path):
-                            output_filename = f"{base_filename}_{counter}.{output_format}"
-                            output_path = os.path.join(output_dir, output_filename)
-                            counter += 1
-                        
-                        # 根据输出格式保存
-                        if output_format in ['jpg', 'jpeg']:
-                            img.save(output_path, format='JPEG', quality=quality, optimize=True)
-                        elif output_format == 'png':
-                            img.save(output_path, format='PNG', optimize=True)
-                        elif output_format == 'gif':
-                            img.save(output_path, format='GIF')
-                        elif output_format == 'bmp':
-                            img.save(output_path, format='BMP')
-                        elif output_format in ['tiff', 'tif']:
-                            img.save(output_path, format='TIFF')
-                        else:
-                            img.save(output_path)
-                        
-                        success_count += 1
-                        self.img_log_text.insert(tk.END, f"已转换: {os.path.basename(file_path)} -> {output_filename}\n")
-                        self.img_log_text.see(tk.END)
-                        
-                    except Exception as e:
-                        self.img_log_text.insert(tk.END, f"转换失败 {os.path.basename(file_path)}: {str(e)}\n")
-                        self.img_log_text.see(tk.END)
-                    
-                    # 更新进度条
-                    self.img_progress["value"] = i + 1
-                    self.parent.update_idletasks()
-                
-                self.img_log_text.insert(tk.END, f"\n转换完成! 成功转换 {success_count}/{total_files} 个文件\n")
-                self.img_log_text.see(tk.END)
-                messagebox.showinfo("成功", f"成功转换 {success_count}/{total_files} 个图片文件，保存在: {output_dir}")
-                
+                summary = convert_batch(file_paths, output_dir, options, workers,
+                                        result_callback=on_file_done, cache=cache, size_hints=size_hints)
+                lines = [f"\n转换完成! 成功转换 {summary.success_count}/{total_files} 个文件\n"]
+                if cache is not None:
+                    lines.append(f"{cache.report(summary.cache_hits, summary.cache_misses)}\n")
+                lines.append(f"{memory_report()}\n")
+                self.result_queue.put(("done", summary.success_count, "".join(lines)))
             except Exception as e:
-                self.img_log_text.insert(tk.END, f"错误: {str(e)}\n")
-                self.img_log_text.see(tk.END)
-                messagebox.showerror("错误", f"转换失败: {str(e)}")
-            finally:
-                # 重置进度条
-                self.img_progress["value"] = 0
+                self.result_queue.put(("error", 0, f"错误: {str(e)}\n"))
+        
+        self.img_log_text.delete(1.0, tk.END)
+        self.img_log_text.insert(tk.END, f"开始批量转换图片格式... (并行进程数: {min(workers, total_files)})\n")
+        self.img_progress.config(maximum=total_files, value=0)
+        self.convert_button.config(state=tk.DISABLED)
         
         # 使用线程执行转换，避免界面卡顿
-        threading.Thread(target=conversion_thread).start()
+        threading.Thread(target=conversion_thread, daemon=True).start()
+        self.parent.after(QUEUE_POLL_INTERVAL, lambda: self.drain_result_queue(total_files, output_dir))
+    
+    def drain_result_queue(self, total_files, output_dir):
+        """在Tk主线程中取出转换消息，合并成一次日志插入和一次进度更新"""
+        lines = []
+        processed = None
+        finished = None
+        for _ in range(QUEUE_BATCH_SIZE):
+            try:
+                kind, value, message = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            lines.append(message)
+            if kind == "progress":
+                processed = value
+            else:
+                finished = (kind, value, message)
+                break
+        
+        if lines:
+            self.img_log_text.insert(tk.END, "".join(lines))
+            self.img_log_text.see(tk.END)
+        if processed is not None:
+            self.img_progress.config(value=processed)
+        
+        if finished is None:
+            self.parent.after(QUEUE_POLL_INTERVAL, lambda: self.drain_result_queue(total_files, output_dir))
+            return
+        
+        # 重置进度条
+        self.img_progress.config(value=0)
+        self.convert_button.config(state=tk.NORMAL)
+        kind, success_count, message = finished
+        if kind == "done":
+            messagebox.showinfo("成功", f"成功转换 {success_count}/{total_files} 个图片文件，保存在: {output_dir}")
+        else:
+            messagebox.showerror("错误", f"转换失败: {message.strip()}")
@@ -3,20 +3,20 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter.scrolledtext import ScrolledText
 import threading
-from PyPDF2 import PdfReader, PdfWriter
-from PIL import Image
-import fitz  # PyMuPDF
-import io
-import tempfile
-import shutil
 import time
+from core.options import CompressOptions
+from core.cache import ResultCache
+from core.memory import memory_report
+from core.filelist import FileSet
+from modules.file_list import scan_folder_async, describe_rejected, VirtualFileList
+from core.compress import COMPRESSION_LEVELS, COMPRESSION_MODES, apply_compression_level, compress_batch, format_size
 
 class PDFCompressorTab:
     def __init__(self, parent):
         self.parent = parent
         
         # 初始化PDF文件路径列表
-        self.pdf_file_paths = []
+        self.pdf_file_paths = FileSet()
         
         # 创建主框架
         self.frame = ttk.Frame(parent)
@@ -44,14 +44,9 @@ class PDFCompressorTab:
         file_list_frame.pack(fill="both", expand=True, padx=10, pady=5)
         
         # PDF文件列表
-        self.pdf_listbox = tk.Listbox(file_list_frame, selectmode=tk.EXTENDED, height=6)
+        self.pdf_listbox = VirtualFileList(file_list_frame, self.pdf_file_paths, height=6)
         self.pdf_listbox.pack(side=tk.LEFT, fill="both", expand=True, padx=5, pady=5)
         
-        # 滚动条
-        scrollbar = ttk.Scrollbar(file_list_frame, orient="vertical", command=self.pdf_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill="y")
-        self.pdf_listbox.config(yscrollcommand=scrollbar.set)
-        
         # 移除选中的文件按钮
         ttk.Button(file_list_frame, text="移除选中", command=self.remove_selected_pdfs).pack(side=tk.BOTTOM, padx=5, pady=5)
         
@@ -65,8 +60,11 @@ class PDFCompressorTab:
         
         ttk.Label(level_frame, text="压缩级别:").pack(side=tk.LEFT, padx=5, pady=5)
         self.compression_level = tk.StringVar(value="标准")
-        levels = ["低", "标准", "高", "最高"]
-        ttk.Combobox(level_frame, textvariable=self.compression_level, values=levels, width=10).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Combobox(level_frame, textvariable=self.compression_level, values=COMPRESSION_LEVELS, width=10).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        ttk.Label(level_frame, text="压缩方式:").pack(side=tk.LEFT, padx=20, pady=5)
+        self.compression_mode = tk.StringVar(value=COMPRESSION_MODES[0])
+        ttk.Combobox(level_frame, textvariable=self.compression_mode, values=COMPRESSION_MODES, width=12, state="readonly").pack(side=tk.LEFT, padx=5, pady=5)
         
         ttk.Label(level_frame, text="图像DPI:").pack(side=tk.LEFT, padx=20, pady=5)
         self.dpi_var = tk.StringVar(value="150")
@@ -80,6 +78,15 @@ class PDFCompressorTab:
         self.quality_var = tk.StringVar(value="75")
         ttk.Entry(quality_frame, textvariable=self.quality_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
         
+        ttk.Label(quality_frame, text="并行进程数:").pack(side=tk.LEFT, padx=20, pady=5)
+        self.workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        ttk.Entry(quality_frame, textvariable=self.workers_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # 目标大小模式：自动搜索不超过上面设置的DPI和图像质量
+        ttk.Label(quality_frame, text="目标大小(MB，留空不限制):").pack(side=tk.LEFT, padx=20, pady=5)
+        self.target_size_var = tk.StringVar(value="")
+        ttk.Entry(quality_frame, textvariable=self.target_size_var, width=8).pack(side=tk.LEFT, padx=5, pady=5)
+        
         # 优化选项
         options_frame = ttk.Frame(settings_frame)
         options_frame.pack(fill="x", padx=5, pady=5)
@@ -93,6 +100,9 @@ class PDFCompressorTab:
         self.keep_page_size = tk.BooleanVar(value=True)
         ttk.Checkbutton(options_frame, text="保持页面尺寸", variable=self.keep_page_size).pack(side=tk.LEFT, padx=20, pady=5)
         
+        self.use_cache = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="使用结果缓存", variable=self.use_cache).pack(side=tk.LEFT, padx=20, pady=5)
+        
         # 输出设置
         output_frame = ttk.Frame(self.frame)
         output_frame.pack(fill="x", padx=10, pady=10)
@@ -146,6 +156,10 @@ class PDFCompressorTab:
             self.output_dir_entry.configure(state="disabled")
             self.output_dir_button.configure(state="disabled")
     
+    def add_pdf_files(self, file_paths):
+        """把文件添加到列表，已在列表中的文件被跳过"""
+        self.pdf_listbox.add_files(file_paths)
+    
     def select_pdf_files(self):
         """选择多个PDF文件"""
         file_paths = filedialog.askopenfilenames(
@@ -153,43 +167,28 @@ class PDFCompressorTab:
             filetypes=[("PDF文件", "*.pdf")]
         )
         if file_paths:
-            for file_path in file_paths:
-                if file_path not in self.pdf_file_paths:
-                    self.pdf_file_paths.append(file_path)
-                    self.pdf_listbox.insert(tk.END, os.path.basename(file_path))
+            self.add_pdf_files(file_paths)
     
     def select_pdf_folder(self):
         """选择包含PDF文件的文件夹"""
         folder_path = filedialog.askdirectory(title="选择包含PDF文件的文件夹")
         if folder_path:
-            # 搜索文件夹中的所有PDF文件
-            pdf_files = []
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith('.pdf'):
-                        full_path = os.path.join(root, file)
-                        pdf_files.append(full_path)
+            # 在后台线程中扫描文件夹，检查过的文件分批加入列表
+            def on_done(found, rejected):
+                if rejected:
+                    messagebox.showwarning("提示", f"以下文件无法识别或已损坏，未加入列表:\n{describe_rejected(rejected)}")
+                elif not found:
+                    messagebox.showinfo("提示", "所选文件夹中没有找到PDF文件")
             
-            # 添加到列表中
-            for file_path in pdf_files:
-                if file_path not in self.pdf_file_paths:
-                    self.pdf_file_paths.append(file_path)
-                    self.pdf_listbox.insert(tk.END, os.path.basename(file_path))
-            
-            if not pdf_files:
-                messagebox.showinfo("提示", "所选文件夹中没有找到PDF文件")
+            scan_folder_async(self.frame, folder_path, ('.pdf',), self.pdf_listbox.add_scanned, on_done)
     
     def remove_selected_pdfs(self):
         """移除选中的PDF文件"""
-        selected_indices = self.pdf_listbox.curselection()
-        for index in reversed(selected_indices):
-            self.pdf_listbox.delete(index)
-            self.pdf_file_paths.pop(index)
+        self.pdf_listbox.delete_selected()
     
     def clear_pdf_list(self):
         """清空PDF文件列表"""
-        self.pdf_listbox.delete(0, tk.END)
-        self.pdf_file_paths = []
+        self.pdf_listbox.clear()
     
     def select_output_dir(self):
         """选择输出目录"""
@@ -199,32 +198,28 @@ class PDFCompressorTab:
     
     def get_compression_params(self):
         """根据选择的压缩级别返回压缩参数"""
-        # 获取界面选择的压缩级别
-        level = self.compression_level.get()
-        image_quality = int(self.quality_var.get())
-        image_dpi = int(self.dpi_var.get())
-        
-        # 根据压缩级别调整参数
-        if level == "低":
-            image_dpi = max(image_dpi, 200)
-            image_quality = max(image_quality, 85)
-        elif level == "标准":
-            # 使用界面设置的默认值
-            pass
-        elif level == "高":
-            image_dpi = min(image_dpi, 120)
-            image_quality = min(image_quality, 65)
-        elif level == "最高":
-            image_dpi = min(image_dpi, 96)
-            image_quality = min(image_quality, 45)
-        
-        return {
-            "image_quality": image_quality,
-            "image_dpi": image_dpi,
-            "optimize_images": self.optimize_images.get(),
-            "remove_metadata": self.remove_metadata.get(),
-            "keep_page_size": self.keep_page_size.get()
-        }
+        target_size = None
+        if self.target_size_var.get().strip():
+            target_size = int(float(self.target_size_var.get()) * 1024 * 1024)
+            if target_size <= 0:
+                raise ValueError("目标大小必须大于0")
+        
+        options = CompressOptions(
+            level=self.compression_level.get(),
+            mode=self.compression_mode.get(),
+            image_quality=int(self.quality_var.get()),
+            image_dpi=int(self.dpi_var.get()),
+            optimize_images=self.optimize_images.get(),
+            remove_metadata=self.remove_metadata.get(),
+            keep_page_size=self.keep_page_size.get(),
+            target_size=target_size
+        )
+        return apply_compression_level(options)
+    
+    def log(self, message):
+        """在Tk主线程中追加日志"""
+        self.log_text.insert(tk.END, message)
+        self.log_text.see(tk.END)
     
     def compress_pdfs(self):
         """压缩PDF文件"""
@@ -247,220 +242,89 @@ class PDFCompressorTab:
                     return
         
         # 获取压缩参数
-        compression_params = self.get_compression_params()
+        try:
+            compression_params = self.get_compression_params()
+        except ValueError:
+            messagebox.showwarning("警告", "图像DPI和图像质量必须是整数，目标大小必须是正数")
+            return
+        
+        replace_mode = self.output_mode.get() == "替换"
+        output_dir = self.output_dir.get()
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except ValueError:
+            workers = os.cpu_count() or 1
+        
+        pdf_paths = list(self.pdf_file_paths)
+        size_hints = self.pdf_file_paths.size_hints()
+        total_files = len(pdf_paths)
+        cache = ResultCache() if self.use_cache.get() else None
+        
+        # 压缩在后台线程和子进程中进行，界面更新都交给Tk主线程
+        def log(message):
+            self.parent.after(0, lambda m=message: self.log(m))
+        
+        def on_page_progress(current, total, message):
+            log(f"{message}\n")
+        
+        def on_file_done(result, processed, total):
+            lines = [f"\n[{processed}/{total}] {os.path.basename(result.pdf_path)}\n"]
+            if result.error is None:
+                lines.append(f"原始大小: {format_size(result.size_before)}\n")
+                if result.size_before > 0:
+                    reduction_percent = ((result.size_before - result.size_after) / result.size_before) * 100
+                    lines.append(f"压缩后大小: {format_size(result.size_after)} (减小了 {reduction_percent:.2f}%)\n")
+                lines.append(f"处理用时: {result.elapsed:.2f} 秒\n")
+                if result.note:
+                    lines.append(f"{result.note}\n")
+            else:
+                lines.append(f"{result.error}\n")
+            log("".join(lines))
+            self.parent.after(0, lambda v=processed: self.progress.config(value=v))
         
         # 准备线程
         def compression_thread():
             try:
-                self.log_text.delete(1.0, tk.END)
-                self.log_text.insert(tk.END, "开始压缩PDF文件...\n")
-                
-                total_files = len(self.pdf_file_paths)
-                processed_files = 0
-                success_count = 0
-                total_size_before = 0
-                total_size_after = 0
+                self.parent.after(0, lambda: self.log_text.delete(1.0, tk.END))
+                log(f"开始压缩PDF文件... (并行进程数: {min(workers, total_files)})\n")
+                self.parent.after(0, lambda: self.progress.config(maximum=total_files, value=0))
                 
-                # 设置进度条
-                self.progress["maximum"] = total_files
-                self.progress["value"] = 0
-                
-                # 处理每个文件
-                for file_index, pdf_path in enumerate(self.pdf_file_paths):
-                    try:
-                        self.log_text.insert(tk.END, f"\n处理文件 [{file_index+1}/{total_files}]: {os.path.basename(pdf_path)}\n")
-                        self.log_text.see(tk.END)
-                        
-                        # 记录原始文件大小
-                        size_before = os.path.getsize(pdf_path)
-                        total_size_before += size_before
-                        self.log_text.insert(tk.END, f"原始大小: {self.format_size(size_before)}\n")
-                        
-                        # 确定输出文件路径
-                        if self.output_mode.get() == "新文件":
-                            output_dir = self.output_dir.get()
-                            output_filename = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_compressed.pdf"
-                            output_path = os.path.join(output_dir, output_filename)
-                        else:  # 替换原文件
-                            output_path = f"{pdf_path}.temp.pdf"
-                        
-                        # 压缩PDF
-                        start_time = time.time()
-                        self.compress_pdf_file(pdf_path, output_path, compression_params)
-                        end_time = time.time()
-                        
-                        # 获取压缩后的文件大小
-                        if os.path.exists(output_path):
-                            size_after = os.path.getsize(output_path)
-                            total_size_after += size_after
-                            
-                            # 计算压缩比
-                            if size_before > 0:
-                                reduction_percent = ((size_before - size_after) / size_before) * 100
-                                self.log_text.insert(tk.END, f"压缩后大小: {self.format_size(size_after)} "
-                                                           f"(减小了 {reduction_percent:.2f}%)\n")
-                                self.log_text.insert(tk.END, f"处理用时: {end_time - start_time:.2f} 秒\n")
-                            
-                            # 如果是替换原文件模式，进行替换
-                            if self.output_mode.get() == "替换":
-                                # 创建原文件的备份
-                                backup_path = f"{pdf_path}.bak"
-                                try:
-                                    shutil.copy2(pdf_path, backup_path)
-                                    # 替换原文件
-                                    os.remove(pdf_path)
-                                    os.rename(output_path, pdf_path)
-                                    # 删除备份
-                                    os.remove(backup_path)
-                                except Exception as e:
-                                    self.log_text.insert(tk.END, f"替换文件时出错: {str(e)}\n")
-                                    # 尝试恢复原文件
-                                    if os.path.exists(backup_path):
-                                        try:
-                                            if not os.path.exists(pdf_path):
-                                                os.rename(backup_path, pdf_path)
-                                            else:
-                                                os.remove(backup_path)
-                                        except:
-                                            pass
-                                    continue
-                            
-                            success_count += 1
-                    except Exception as e:
-                        self.log_text.insert(tk.END, f"处理文件时出错: {str(e)}\n")
-                    
-                    # 更新进度条
-                    processed_files += 1
-                    self.progress["value"] = processed_files
-                    self.parent.update_idletasks()
+                summary = compress_batch(
+                    pdf_paths, compression_params,
+                    output_dir=None if replace_mode else output_dir,
+                    workers=workers,
+                    result_callback=on_file_done,
+                    progress_callback=on_page_progress,
+                    cache=cache,
+                    size_hints=size_hints
+                )
                 
                 # 显示总体结果
-                self.log_text.insert(tk.END, f"\n压缩完成! 成功处理 {success_count}/{total_files} 个文件\n")
-                
-                if success_count > 0:
-                    # 计算总体压缩比
-                    if total_size_before > 0:
-                        total_reduction_percent = ((total_size_before - total_size_after) / total_size_before) * 100
-                        self.log_text.insert(tk.END, 
-                            f"总体压缩效果: {self.format_size(total_size_before)} -> {self.format_size(total_size_after)} "
-                            f"(减小了 {total_reduction_percent:.2f}%)\n")
+                log(f"\n压缩完成! 成功处理 {summary.success_count}/{total_files} 个文件\n")
                 
-                self.log_text.see(tk.END)
+                # 计算总体压缩比
+                if summary.success_count > 0 and summary.total_size_before > 0:
+                    total_reduction_percent = ((summary.total_size_before - summary.total_size_after) / summary.total_size_before) * 100
+                    log(f"总体压缩效果: {format_size(summary.total_size_before)} -> {format_size(summary.total_size_after)} "
+                        f"(减小了 {total_reduction_percent:.2f}%)\n")
+                if cache is not None:
+                    log(f"{cache.report(summary.cache_hits, summary.cache_misses)}\n")
+                log(f"{memory_report()}\n")
                 
-                if self.output_mode.get() == "新文件" and success_count > 0:
-                    messagebox.showinfo("成功", f"成功压缩 {success_count} 个PDF文件，保存在: {self.output_dir.get()}")
-                elif success_count > 0:
-                    messagebox.showinfo("成功", f"成功压缩并替换 {success_count} 个PDF文件")
+                if not replace_mode and summary.success_count > 0:
+                    self.parent.after(0, lambda n=summary.success_count: messagebox.showinfo(
+                        "成功", f"成功压缩 {n} 个PDF文件，保存在: {output_dir}"))
+                elif summary.success_count > 0:
+                    self.parent.after(0, lambda n=summary.success_count: messagebox.showinfo(
+                        "成功", f"成功压缩并替换 {n} 个PDF文件"))
                 
             except Exception as e:
-                self.log_text.insert(tk.END, f"压缩过程中出错: {str(e)}\n")
-                self.log_text.see(tk.END)
-                messagebox.showerror("错误", f"压缩失败: {str(e)}")
+                error_msg = str(e)
+                log(f"压缩过程中出错: {error_msg}\n")
+                self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", f"压缩失败: {msg}"))
             finally:
                 # 重置进度条
-                self.progress["value"] = 0
+                self.parent.after(0, lambda: self.progress.config(value=0))
         
         # 使用线程执行压缩，避免界面卡顿
         threading.Thread(target=compression_thread).start()
-    
-    def compress_pdf_file(self, input_path, output_path, params):
-        """压缩单个PDF文件"""
-        # 创建临时目录用于处理图像
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 打开PDF文件
-            pdf_doc = fitz.open(input_path)
-            
-            # 创建新的PDF写入器
-            pdf_writer = PdfWriter()
-            
-            # 处理每一页
-            for page_num in range(len(pdf_doc)):
-                # 更新日志
-                self.log_text.insert(tk.END, f"处理第 {page_num + 1}/{len(pdf_doc)} 页...\n")
-                self.log_text.see(tk.END)
-                self.parent.update_idletasks()
-                
-                # 获取页面
-                page = pdf_doc.load_page(page_num)
-                
-                # 判断该页是否包含图像
-                image_list = page.get_images()
-                
-                if image_list and params["optimize_images"]:
-                    # 创建临时PDF写入器来存储这一页
-                    temp_writer = PdfWriter()
-                    
-                    # 获取原始页面尺寸
-                    page_rect = page.rect
-                    original_width = page_rect.width
-                    original_height = page_rect.height
-                    
-                    # 根据是否保持页面尺寸设置渲染参数
-                    if params["keep_page_size"]:
-                        # 计算适合的矩阵以保持原始尺寸但使用指定的DPI
-                        zoom_factor = params["image_dpi"] / 72  # 72是PDF的基准DPI
-                        pix = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor))
-                    else:
-                        # 直接使用DPI值进行渲染
-                        pix = page.get_pixmap(matrix=fitz.Matrix(params["image_dpi"]/72, params["image_dpi"]/72))
-                    
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    
-                    # 保存压缩后的图像到临时PDF
-                    img_temp = io.BytesIO()
-                    img.save(img_temp, format='JPEG', quality=params["image_quality"], optimize=True)
-                    img_temp.seek(0)
-                    
-                    # 从压缩后的图像创建新的PDF页面
-                    temp_pdf_path = os.path.join(temp_dir, f"temp_page_{page_num}.pdf")
-                    
-                    if params["keep_page_size"]:
-                        # 创建特定大小的PDF
-                        c = fitz.open()
-                        new_page = c.new_page(width=original_width, height=original_height)
-                        
-                        # 将图像放置在页面上并调整大小以适应原始尺寸
-                        rect = fitz.Rect(0, 0, original_width, original_height)
-                        new_page.insert_image(rect, stream=img_temp.getvalue())
-                        
-                        c.save(temp_pdf_path)
-                        c.close()
-                    else:
-                        # 直接保存为PDF，尺寸会根据图像大小确定
-                        img.save(temp_pdf_path, format='PDF')
-                    
-                    # 打开临时PDF并添加到写入器
-                    with open(temp_pdf_path, 'rb') as f:
-                        temp_reader = PdfReader(f)
-                        pdf_writer.add_page(temp_reader.pages[0])
-                else:
-                    # 如果页面没有图像或不优化图像，则保持原样
-                    pdf_reader = PdfReader(open(input_path, 'rb'))
-                    pdf_writer.add_page(pdf_reader.pages[page_num])
-            
-            # 处理元数据
-            if not params["remove_metadata"]:
-                # 复制原PDF的元数据
-                pdf_reader = PdfReader(open(input_path, 'rb'))
-                if pdf_reader.metadata:
-                    pdf_writer.add_metadata(pdf_reader.metadata)
-            
-            # 保存压缩后的PDF
-            with open(output_path, 'wb') as f:
-                pdf_writer.write(f)
-    
-    def format_size(self, size_in_bytes):
-        """格式化文件大小为易读的形式"""
-        # 转换为KB
-        size_in_kb = size_in_bytes / 1024.0
-        if size_in_kb < 1024:
-            return f"{size_in_kb:.2f} KB"
-        
-        # 转换为MB
-        size_in_mb = size_in_kb / 1024.0
-        if size_in_mb < 1024:
-            return f"{size_in_mb:.2f} MB"
-        
-        # 转换为GB
-        size_in_gb = size_in_mb / 1024.0
-        return f"{size_in_gb:.2f} GB"
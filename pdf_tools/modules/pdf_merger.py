@@ -2,10 +2,10 @@ import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
-from PIL import Image
-import fitz  # PyMuPDF
-import io
+from core.options import MergeOptions
+from core import merge
+from core.filelist import FileSet
+from modules.file_list import VirtualFileList
 
 class MergePDFTab:
     """PDF合并标签页类"""
@@ -14,9 +14,11 @@ class MergePDFTab:
         self.parent = parent
         self.theme_manager = theme_manager
         self.style = theme_manager.style
-        self.file_paths = []
+        self.file_paths = FileSet()
         self.layout_mode = tk.StringVar(value="原样")
         self.force_a4 = tk.BooleanVar(value=False)  # 强制使用A4纸张大小选项
+        self.rasterize = tk.BooleanVar(value=False)  # 调整模式下栅格化页面
+        self.streaming = tk.BooleanVar(value=False)  # 流式合并，适合超大文件
         self.page_orientation = tk.StringVar(value="纵向")  # 新增：页面方向选项
         
         # 创建界面
@@ -37,6 +39,22 @@ class MergePDFTab:
             ttk.Radiobutton(mode_container, text=mode, value=mode,
                           variable=self.layout_mode).pack(side=tk.LEFT, padx=25, pady=5)
         
+        # 自动/手动调整默认保持矢量内容，栅格化只在需要时手动开启
+        ttk.Checkbutton(mode_container, text="调整模式下栅格化页面(300DPI)",
+                      variable=self.rasterize).pack(side=tk.LEFT, padx=25, pady=5)
+        ttk.Checkbutton(mode_container, text="流式合并(低内存)",
+                      variable=self.streaming).pack(side=tk.LEFT, padx=25, pady=5)
+        
+        # 图片预处理（解码、缩放、编码）在多个线程中并行进行，窗口限制同时在内存中的图片数
+        prepare_frame = ttk.Frame(mode_frame)
+        prepare_frame.pack(fill="x", padx=5, pady=0)
+        ttk.Label(prepare_frame, text="图片预处理线程数:").pack(side=tk.LEFT, padx=(25, 5), pady=5)
+        self.workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        ttk.Entry(prepare_frame, textvariable=self.workers_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(prepare_frame, text="预处理窗口(文件数):").pack(side=tk.LEFT, padx=(25, 5), pady=5)
+        self.window_var = tk.StringVar(value="8")
+        ttk.Entry(prepare_frame, textvariable=self.window_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
+        
         # 原样模式下的A4选项
         self.original_options_frame = ttk.Frame(mode_frame)
         self.original_options_frame.pack(fill="x", padx=5, pady=0)
@@ -59,19 +77,14 @@ class MergePDFTab:
         file_frame.pack(fill="both", expand=True, padx=15, pady=10)
         
         # 文件列表显示 - 添加边框和颜色
-        self.file_listbox = tk.Listbox(file_frame, selectmode=tk.EXTENDED, 
-                                      font=("Arial", 10), 
-                                      bg="white", fg=self.theme_manager.text_color,
-                                      selectbackground=self.theme_manager.accent_color,
-                                      relief=tk.SUNKEN, bd=1,
-                                      highlightthickness=1)
+        self.file_listbox = VirtualFileList(file_frame, self.file_paths,
+                                            font=("Arial", 10), 
+                                            bg="white", fg=self.theme_manager.text_color,
+                                            selectbackground=self.theme_manager.accent_color,
+                                            relief=tk.SUNKEN, bd=1,
+                                            highlightthickness=1)
         self.file_listbox.pack(side=tk.LEFT, fill="both", expand=True, padx=8, pady=8)
         
-        # 滚动条
-        scrollbar = ttk.Scrollbar(file_frame, orient="vertical", command=self.file_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill="y", pady=8, padx=(0, 8))
-        self.file_listbox.config(yscrollcommand=scrollbar.set)
-        
         # 文件操作按钮
         file_btn_frame = ttk.Frame(self.frame)
         file_btn_frame.pack(fill="x", padx=15, pady=10)
@@ -137,21 +150,15 @@ class MergePDFTab:
             filetypes=[("PDF和图片", "*.pdf *.jpg *.jpeg *.png *.bmp *.tiff *.tif")]
         )
         if file_paths:
-            for file_path in file_paths:
-                if file_path not in self.file_paths:
-                    self.file_paths.append(file_path)
-                    self.file_listbox.insert(tk.END, os.path.basename(file_path))
+            self.file_listbox.add_files(file_paths)
     
     def remove_selected(self):
         """移除选中的文件"""
-        selected_indices = self.file_listbox.curselection()
-        for index in reversed(selected_indices):
-            self.file_listbox.delete(index)
-            self.file_paths.pop(index)
+        self.file_listbox.delete_selected()
     
     def move_item(self, direction):
         """移动列表项"""
-        selected_indices = self.file_listbox.curselection()
+        selected_indices = self.file_listbox.selected_indices()
         if not selected_indices:
             return
             
@@ -166,24 +173,15 @@ class MergePDFTab:
     def swap_items(self, pos1, pos2):
         """交换两个列表项"""
         # 交换文件路径
-        self.file_paths[pos1], self.file_paths[pos2] = self.file_paths[pos2], self.file_paths[pos1]
-        
-        # 更新显示
-        item1 = self.file_listbox.get(pos1)
-        item2 = self.file_listbox.get(pos2)
-        self.file_listbox.delete(pos1)
-        self.file_listbox.insert(pos1, item2)
-        self.file_listbox.delete(pos2)
-        self.file_listbox.insert(pos2, item1)
-        
-        # 保持选中状态
-        self.file_listbox.selection_clear(0, tk.END)
-        self.file_listbox.selection_set(pos2)
+        self.file_paths.swap(pos1, pos2)
+        
+        # 更新显示并保持选中状态
+        self.file_listbox.refresh()
+        self.file_listbox.select(pos2)
     
     def clear_list(self):
         """清空文件列表"""
-        self.file_listbox.delete(0, tk.END)
-        self.file_paths = []
+        self.file_listbox.clear()
         
     def on_layout_mode_change(self, *args):
         """处理版面模式变化"""
@@ -192,6 +190,37 @@ class MergePDFTab:
         else:
             self.manual_frame.pack_forget()
     
+    def get_merge_options(self):
+        """从界面读取合并参数"""
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except ValueError:
+            workers = None
+        try:
+            prefetch_window = max(1, int(self.window_var.get()))
+        except ValueError:
+            prefetch_window = 8
+        
+        return MergeOptions(
+            layout_mode=self.layout_mode.get(),
+            force_a4=self.force_a4.get(),
+            page_orientation=self.page_orientation.get(),
+            page_size=self.page_size_var.get(),
+            width_mm=float(self.width_var.get()),
+            height_mm=float(self.height_var.get()),
+            margin_mm=float(self.margin_var.get()),
+            rasterize=self.rasterize.get(),
+            streaming=self.streaming.get(),
+            workers=workers,
+            prefetch_window=prefetch_window
+        )
+    
+    def update_progress(self, current, total, message=None):
+        """在Tk主线程中更新进度条和状态"""
+        self.progress.config(maximum=total, value=current)
+        if message:
+            self.status_label.config(text=message)
+    
     def merge_files(self):
         """合并文件"""
         if len(self.file_paths) < 2:
@@ -207,20 +236,27 @@ class MergePDFTab:
         if not output_path:
             return
         
+        try:
+            options = self.get_merge_options()
+        except ValueError:
+            messagebox.showwarning("警告", "宽度、高度和页边距必须是数字")
+            return
+        
         # 更新界面状态
         self.status_label.config(text="正在合并文件...")
         self.progress["value"] = 0
         
+        # 后台线程中的回调统一交给Tk主线程处理
+        def on_progress(current, total, message):
+            self.parent.after(0, lambda c=current, t=total, m=message: self.update_progress(c, t, m))
+        
+        def on_warning(message):
+            self.parent.after(0, lambda msg=message: messagebox.showerror("错误", msg))
+        
         # 使用线程执行合并，避免界面卡顿
         def merge_thread():
             try:
-                mode = self.layout_mode.get()
-                if mode == "原样":
-                    self.merge_original_size(output_path)
-                elif mode == "自动调整":
-                    self.merge_auto_adjust(output_path)
-                else:  # 手动调整
-                    self.merge_manual_adjust(output_path)
+                merge.merge_files(list(self.file_paths), output_path, options, on_progress, on_warning)
                 
                 # 合并完成后在主线程更新UI
                 self.parent.after(0, lambda path=output_path: self.show_success_message(path))
@@ -249,467 +285,3 @@ class MergePDFTab:
         """重置界面状态"""
         self.progress["value"] = 0
         self.status_label.config(text="就绪")
-    
-    def merge_original_size(self, output_path):
-        """以原始尺寸合并文件"""
-        # 检查是否强制使用A4尺寸
-        if self.force_a4.get():
-            # 使用修改后的方法合并为A4尺寸
-            self.merge_to_a4_size(output_path)
-            return
-        
-        # 原始的合并代码
-        merger = PdfMerger()
-        
-        # 更新进度条设置
-        total_files = len(self.file_paths)
-        self.parent.after(0, lambda: self.progress.config(maximum=total_files))
-        
-        for i, file_path in enumerate(self.file_paths):
-            # 更新进度条
-            self.parent.after(0, lambda v=i+1: self.progress.config(value=v))
-            self.parent.after(0, lambda p=file_path: self.status_label.config(text=f"处理: {os.path.basename(p)}"))
-            
-            if file_path.lower().endswith(('.pdf')):
-                # 处理PDF文件
-                try:
-                    # 尝试打开PDF以验证它是有效的
-                    with open(file_path, 'rb') as f:
-                        reader = PdfReader(f)
-                        # 如果能读取页面，则PDF文件有效
-                        _ = len(reader.pages)
-                    merger.append(file_path)
-                except Exception as e:
-                    error_msg = f"'{os.path.basename(file_path)}' 不是有效的PDF文件: {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    raise Exception(f"文件 '{os.path.basename(file_path)}' 不是有效的PDF文件")
-            else:
-                # 处理图片文件
-                try:
-                    img = Image.open(file_path)
-                    pdf_bytes = io.BytesIO()
-                    
-                    if img.mode == 'RGBA':
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[3])
-                        img = background
-                    
-                    dpi = (300, 300)
-                    if hasattr(img, 'info') and 'dpi' in img.info:
-                        original_dpi = img.info['dpi']
-                        dpi = (max(original_dpi[0], 300), max(original_dpi[1], 300))
-                    
-                    img.convert('RGB').save(pdf_bytes, format='PDF', resolution=dpi[0], quality=100)
-                    pdf_bytes.seek(0)
-                    merger.append(pdf_bytes)
-                except Exception as e:
-                    error_msg = f"无法打开图片文件 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    continue
-        
-        # 最终保存
-        merger.write(output_path)
-        merger.close()
-    
-    def merge_to_a4_size(self, output_path):
-        """以A4尺寸合并文件，保持内容原样"""
-        # A4尺寸（点）- 确保使用准确的标准尺寸
-        is_landscape = self.page_orientation.get() == "横向"
-        is_mixed = self.page_orientation.get() == "混合"
-        
-        # 根据方向设置A4尺寸（精确值）
-        if is_landscape:
-            a4_width = 841.89  # 297mm in points (精确值)
-            a4_height = 595.28  # 210mm in points (精确值)
-        else:
-            a4_width = 595.28  # 210mm in points (精确值)
-            a4_height = 841.89  # 297mm in points (精确值)
-        
-        # 更新进度条和状态
-        total_pages = 0
-        for file_path in self.file_paths:
-            if file_path.lower().endswith('.pdf'):
-                try:
-                    pdf_doc = fitz.open(file_path)
-                    total_pages += len(pdf_doc)
-                    pdf_doc.close()
-                except Exception as e:
-                    error_msg = f"无法打开文件 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    raise Exception(f"文件 '{os.path.basename(file_path)}' 不是有效的PDF文件")
-            else:
-                total_pages += 1
-        
-        self.parent.after(0, lambda: self.progress.config(maximum=total_pages))
-        processed_pages = 0
-        
-        # 创建一个新的输出PDF文档
-        output_pdf = fitz.open()
-        
-        for file_path in self.file_paths:
-            self.parent.after(0, lambda p=file_path: self.status_label.config(text=f"处理: {os.path.basename(p)}"))
-            
-            # PDF文件处理
-            if file_path.lower().endswith('.pdf'):
-                try:
-                    pdf_doc = fitz.open(file_path)
-                    for page_num in range(len(pdf_doc)):
-                        # 创建新A4页面
-                        # 如果是混合模式，根据原始页面方向决定新页面方向
-                        if is_mixed:
-                            src_page = pdf_doc[page_num]
-                            src_rect = src_page.rect
-                            page_is_landscape = src_rect.width > src_rect.height
-                            
-                            if page_is_landscape:
-                                # 横向A4
-                                page_width = 841.89
-                                page_height = 595.28
-                            else:
-                                # 纵向A4
-                                page_width = 595.28
-                                page_height = 841.89
-                        else:
-                            # 使用全局设置的方向
-                            page_width = a4_width
-                            page_height = a4_height
-                            
-                        # 使用整数值避免浮点数问题
-                        new_page = output_pdf.new_page(width=int(page_width), height=int(page_height))
-                        
-                        # 从源文档获取页面
-                        src_page = pdf_doc[page_num]
-                        
-                        # 计算缩放比例以适应A4，同时保持内容
-                        src_rect = src_page.rect
-                        dest_rect = new_page.rect
-                        
-                        # 计算合适的缩放比例
-                        scale_x = dest_rect.width / src_rect.width
-                        scale_y = dest_rect.height / src_rect.height
-                        scale = min(scale_x, scale_y, 1.0)  # 不放大，只缩小
-                        
-                        # 计算居中偏移量
-                        offset_x = (dest_rect.width - src_rect.width * scale) / 2
-                        offset_y = (dest_rect.height - src_rect.height * scale) / 2
-                        
-                        # 创建转换矩阵
-                        matrix = fitz.Matrix(scale, scale).preTranslate(offset_x/scale, offset_y/scale)
-                        
-                        # 将源文档内容绘制到新页面上
-                        new_page.show_pdf_page(dest_rect, pdf_doc, page_num, matrix=matrix)
-                        
-                        # 更新进度
-                        processed_pages += 1
-                        self.parent.after(0, lambda v=processed_pages: self.progress.config(value=v))
-                    
-                    pdf_doc.close()
-                except Exception as e:
-                    error_msg = f"处理PDF文件时出错 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    continue
-                    
-            # 图片文件处理
-            else:
-                try:
-                    # 打开图像
-                    img = Image.open(file_path)
-                    if hasattr(img, 'draft'):
-                        img.draft(None, img.size)  # 取消草图模式
-                    
-                    # 如果有透明通道，添加白色背景
-                    if img.mode == 'RGBA':
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[3])
-                        img = background
-                    
-                    # 判断图片方向
-                    img_width, img_height = img.size
-                    
-                    # 如果是混合模式，根据图片方向决定页面方向
-                    if is_mixed:
-                        page_is_landscape = img_width > img_height
-                        
-                        if page_is_landscape:
-                            # 横向A4
-                            page_width = 841.89
-                            page_height = 595.28
-                        else:
-                            # 纵向A4
-                            page_width = 595.28
-                            page_height = 841.89
-                    else:
-                        # 使用全局设置的方向
-                        page_width = a4_width
-                        page_height = a4_height
-                    
-                    # 计算图片与页面的比例
-                    img_ratio = img_width / img_height
-                    page_ratio = page_width / page_height
-                    
-                    # 计算适当的缩放以适应页面
-                    if img_ratio > page_ratio:  # 图片更宽
-                        new_width = int(page_width - 40)  # 留出边距，确保转为整数
-                        new_height = int(new_width / img_ratio)
-                    else:  # 图片更高或等比例
-                        new_height = int(page_height - 40)  # 留出边距，确保转为整数
-                        new_width = int(new_height * img_ratio)
-                    
-                    # 调整图像大小
-                    img_resized = img.resize((new_width, new_height), Image.LANCZOS)
-                    
-                    # 将图像转换为临时PDF
-                    temp_pdf_path = f"{output_path}.temp_img.pdf"
-                    
-                    # 创建页面
-                    temp_pdf = fitz.open()
-                    # 使用整数值避免浮点数问题
-                    temp_page = temp_pdf.new_page(width=int(page_width), height=int(page_height))
-                    
-                    # 将图像数据转换为PNG字节流
-                    img_bytes = io.BytesIO()
-                    img_resized.save(img_bytes, format='PNG')
-                    img_bytes.seek(0)
-                    
-                    # 插入图像到中心位置，确保使用整数坐标
-                    rect = fitz.Rect(
-                        int((page_width - new_width) / 2),
-                        int((page_height - new_height) / 2),
-                        int((page_width + new_width) / 2),
-                        int((page_height + new_height) / 2)
-                    )
-                    temp_page.insert_image(rect, stream=img_bytes.getvalue())
-                    
-                    # 保存临时PDF
-                    temp_pdf.save(temp_pdf_path)
-                    temp_pdf.close()
-                    
-                    # 将临时PDF的页面添加到输出PDF
-                    temp_doc = fitz.open(temp_pdf_path)
-                    output_pdf.insert_pdf(temp_doc)
-                    temp_doc.close()
-                    
-                    # 删除临时文件
-                    os.remove(temp_pdf_path)
-                    
-                    # 更新进度
-                    processed_pages += 1
-                    self.parent.after(0, lambda v=processed_pages: self.progress.config(value=v))
-                    
-                except Exception as e:
-                    error_msg = f"处理图片文件时出错 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    continue
-        
-        # 保存最终合并后的PDF
-        output_pdf.save(output_path)
-        output_pdf.close()
-
-    def merge_auto_adjust(self, output_path):
-            """自动调整尺寸合并文件"""
-            writer = PdfWriter()
-            
-            total_files = len(self.file_paths)
-            total_pages = 0
-            for file_path in self.file_paths:
-                if file_path.lower().endswith('.pdf'):
-                    try:
-                        with open(file_path, 'rb') as file:
-                            reader = PdfReader(file)
-                            total_pages += len(reader.pages)
-                    except Exception as e:
-                        error_msg = f"无法打开PDF文件 '{os.path.basename(file_path)}': {str(e)}"
-                        self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                        raise Exception(f"文件 '{os.path.basename(file_path)}' 不是有效的PDF文件")
-                else:
-                    total_pages += 1
-            
-            self.parent.after(0, lambda: self.progress.config(maximum=total_pages))
-            processed_pages = 0
-            
-            for file_path in self.file_paths:
-                self.parent.after(0, lambda p=file_path: self.status_label.config(text=f"处理: {os.path.basename(p)}"))
-                
-                if file_path.lower().endswith('.pdf'):
-                    try:
-                        doc = fitz.open(file_path)
-                    except Exception as e:
-                        error_msg = f"无法打开PDF文件 '{os.path.basename(file_path)}': {str(e)}"
-                        self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                        continue
-                    
-                    for page_num in range(len(doc)):
-                        page = doc.load_page(page_num)
-                        pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        
-                        pdf_bytes = io.BytesIO()
-                        img.convert('RGB').save(pdf_bytes, format='PDF', resolution=300, quality=100)
-                        pdf_bytes.seek(0)
-                        
-                        temp_reader = PdfReader(pdf_bytes)
-                        writer.add_page(temp_reader.pages[0])
-                        
-                        processed_pages += 1
-                        self.parent.after(0, lambda v=processed_pages: self.progress.config(value=v))
-                else:
-                    try:
-                        img = Image.open(file_path)
-                    except Exception as e:
-                        error_msg = f"无法打开图片文件 '{os.path.basename(file_path)}': {str(e)}"
-                        self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                        continue
-                    
-                    pdf_bytes = io.BytesIO()
-                    img.convert('RGB').save(pdf_bytes, format='PDF', resolution=300, quality=100)
-                    pdf_bytes.seek(0)
-                    
-                    temp_reader = PdfReader(pdf_bytes)
-                    writer.add_page(temp_reader.pages[0])
-                    
-                    processed_pages += 1
-                    self.parent.after(0, lambda v=processed_pages: self.progress.config(value=v))
-            
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-    def merge_manual_adjust(self, output_path):
-        """根据手动设置合并文件"""
-        writer = PdfWriter()
-        
-        page_size = self.page_size_var.get()
-        width_mm = float(self.width_var.get())
-        height_mm = float(self.height_var.get())
-        margin_mm = float(self.margin_var.get())
-        
-        width_pt = width_mm * 72 / 25.4
-        height_pt = height_mm * 72 / 25.4
-        margin_pt = margin_mm * 72 / 25.4
-        
-        is_landscape = self.page_orientation.get() == "横向"
-        is_mixed = self.page_orientation.get() == "混合"
-        
-        if page_size == "A4":
-            if is_landscape:
-                width_pt = 841.89
-                height_pt = 595.28
-            else:
-                width_pt = 595.28
-                height_pt = 841.89
-        elif page_size == "A5":
-            if is_landscape:
-                width_pt = 595.28
-                height_pt = 419.53
-            else:
-                width_pt = 419.53
-                height_pt = 595.28
-        elif page_size == "Letter":
-            if is_landscape:
-                width_pt = 792.0
-                height_pt = 612.0
-            else:
-                width_pt = 612.0
-                height_pt = 792.0
-        elif page_size == "Legal":
-            if is_landscape:
-                width_pt = 1008.0
-                height_pt = 612.0
-            else:
-                width_pt = 612.0
-                height_pt = 1008.0
-        
-        total_files = len(self.file_paths)
-        total_pages = 0
-        for file_path in self.file_paths:
-            if file_path.lower().endswith('.pdf'):
-                try:
-                    with open(file_path, 'rb') as file:
-                        reader = PdfReader(file)
-                        total_pages += len(reader.pages)
-                except Exception as e:
-                    error_msg = f"无法打开PDF文件 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    raise Exception(f"文件 '{os.path.basename(file_path)}' 不是有效的PDF文件")
-            else:
-                total_pages += 1
-        
-        self.parent.after(0, lambda: self.progress.config(maximum=total_pages))
-        processed_pages = 0
-        
-        for file_path in self.file_paths:
-            self.parent.after(0, lambda p=file_path: self.status_label.config(text=f"处理: {os.path.basename(p)}"))
-            
-            if file_path.lower().endswith('.pdf'):
-                try:
-                    doc = fitz.open(file_path)
-                except Exception as e:
-                    error_msg = f"无法打开PDF文件 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    continue
-                
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    
-                    available_width = width_pt - 2 * margin_pt
-                    available_height = height_pt - 2 * margin_pt
-                    
-                    img_width, img_height = img.size
-                    scale = min(available_width / img_width, available_height / img_height)
-                    
-                    new_width = int(img_width * scale)
-                    new_height = int(img_height * scale)
-                    
-                    img = img.resize((new_width, new_height), Image.LANCZOS)
-                    
-                    new_img = Image.new("RGB", (int(width_pt), int(height_pt)), "white")
-                    paste_x = int((width_pt - new_width) / 2)
-                    paste_y = int((height_pt - new_height) / 2)
-                    new_img.paste(img, (paste_x, paste_y))
-                    
-                    pdf_bytes = io.BytesIO()
-                    new_img.save(pdf_bytes, format='PDF', resolution=300, quality=100)
-                    pdf_bytes.seek(0)
-                    
-                    temp_reader = PdfReader(pdf_bytes)
-                    writer.add_page(temp_reader.pages[0])
-                    
-                    processed_pages += 1
-                    self.parent.after(0, lambda v=processed_pages: self.progress.config(value=v))
-            else:
-                try:
-                    img = Image.open(file_path)
-                except Exception as e:
-                    error_msg = f"无法打开图片文件 '{os.path.basename(file_path)}': {str(e)}"
-                    self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", msg))
-                    continue
-                
-                available_width = width_pt - 2 * margin_pt
-                available_height = height_pt - 2 * margin_pt
-                
-                img_width, img_height = img.size
-                scale = min(available_width / img_width, available_height / img_height)
-                
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-                
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                
-                new_img = Image.new("RGB", (int(width_pt), int(height_pt)), "white")
-                paste_x = int((width_pt - new_width) / 2)
-                paste_y = int((height_pt - new_height) / 2)
-                new_img.paste(img, (paste_x, paste_y))
-                
-                pdf_bytes = io.BytesIO()
-                new_img.save(pdf_bytes, format='PDF', resolution=300, quality=100)
-                pdf_bytes.seek(0)
-                
-                temp_reader = PdfReader(pdf_bytes)
-                writer.add_page(temp_reader.pages[0])
-                
-                processed_pages += 1
-                self.parent.after(0, lambda v=processed_pages: self.progress.config(value=v))
-        
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
\ No newline at end of file
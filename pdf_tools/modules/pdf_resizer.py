@@ -1,10 +1,10 @@
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import fitz  # PyMuPDF
 import threading
-from datetime import datetime
 import sys
+from core.options import ResizeOptions
+from core.resize import PREDEFINED_SIZES, resized_output_path, resize_pdf
 
 class PDFResizerTab:
     """处理PDF页面尺寸转换的标签页"""
@@ -15,16 +15,7 @@ class PDFResizerTab:
         self.frame = ttk.Frame(parent)
         
         # 预定义尺寸，格式为 {名称: (宽度mm, 高度mm)}
-        self.predefined_sizes = {
-            "A4": (210, 297),
-            "A3": (297, 420),
-            "A5": (148, 210),
-            "B4": (250, 353),
-            "B5": (176, 250),
-            "Letter": (215.9, 279.4),
-            "Legal": (215.9, 355.6),
-            "Executive": (184.1, 266.7)
-        }
+        self.predefined_sizes = PREDEFINED_SIZES
         
         self.create_widgets()
         
@@ -174,69 +165,14 @@ class PDFResizerTab:
             self.status_var.set("正在处理，请稍候...")
             
             # 准备输出文件名
-            file_name = os.path.basename(input_path)
-            name, ext = os.path.splitext(file_name)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(output_dir, f"{name}_resized_{timestamp}.pdf")
+            output_path = resized_output_path(input_path, output_dir)
             
-            # 打开输入PDF
-            pdf_doc = fitz.open(input_path)
-            # 创建新PDF
-            new_doc = fitz.open()
+            def on_progress(current, total, message):
+                self.progress_var.set(current / total * 100)
+                self.status_var.set(message)
             
-            # 设置目标尺寸（毫米转换为点）
-            target_width_pt = target_size[0] * 2.83465  # 1mm = 2.83465pt
-            target_height_pt = target_size[1] * 2.83465
-            
-            total_pages = len(pdf_doc)
-            for i, page in enumerate(pdf_doc):
-                # 检查页面方向
-                is_landscape = page.rect.width > page.rect.height
-                
-                # 根据原始页面方向决定目标页面方向
-                if is_landscape:
-                    # 如果原页面是横向，交换宽高
-                    rect = fitz.Rect(0, 0, 
-                                    int(max(target_width_pt, target_height_pt)), 
-                                    int(min(target_width_pt, target_height_pt)))
-                else:
-                    # 如果原页面是纵向，正常设置宽高
-                    rect = fitz.Rect(0, 0, 
-                                    int(min(target_width_pt, target_height_pt)), 
-                                    int(max(target_width_pt, target_height_pt)))
-                
-                # 创建新页面
-                new_page = new_doc.new_page(width=int(rect.width), height=int(rect.height))
-                
-                # 缩放内容到新页面大小
-                mat = fitz.Matrix(rect.width/page.rect.width, rect.height/page.rect.height)
-                
-                # 修复: 处理不同版本PyMuPDF的API差异
-                try:
-                    # 旧版PyMuPDF API (不使用命名参数)
-                    new_page.show_pdf_page(rect, pdf_doc, i, mat)
-                except TypeError:
-                    try:
-                        # 如果失败，尝试不同参数顺序
-                        new_page.show_pdf_page(rect, pdf_doc, page.number, mat)
-                    except TypeError:
-                        try:
-                            # 再尝试一种不带矩阵的方式，但会导致不精确的缩放
-                            new_page.show_pdf_page(rect, pdf_doc, i)
-                        except:
-                            # 如果所有方法都失败，尝试直接复制页面然后进行缩放变形
-                            new_page = new_doc.new_page(-1, width=rect.width, height=rect.height)
-                            new_page.insert_pdf(pdf_doc, from_page=i, to_page=i)
-                
-                # 更新进度
-                progress = (i + 1) / total_pages * 100
-                self.progress_var.set(progress)
-                self.status_var.set(f"处理页面 {i+1}/{total_pages}")
-            
-            # 保存新PDF
-            new_doc.save(output_path)
-            new_doc.close()
-            pdf_doc.close()
+            options = ResizeOptions(width_mm=target_size[0], height_mm=target_size[1])
+            resize_pdf(input_path, output_path, options, on_progress)
             
             self.status_var.set(f"完成! 输出文件保存至: {output_path}")
             messagebox.showinfo("完成", f"PDF尺寸转换成功!\n输出文件:\n{output_path}")
@@ -4,8 +4,37 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter.scrolledtext import ScrolledText
 import threading
-from PIL import Image
-import fitz  # PyMuPDF
+from core.options import RenderOptions
+from core import render
+from core.cache import ResultCache
+from core.manifest import ExportManifest
+from core.memory import memory_report
+from core.filelist import FileSet
+from modules.file_list import scan_folder_async, describe_rejected, VirtualFileList
+
+# 输出方式: RenderOptions.container
+OUTPUT_MODES = {
+    "每页一个文件": None,
+    "多页TIFF": "tiff",
+    "ZIP包(不压缩)": "zip",
+    "TAR包": "tar",
+}
+
+# 颜色模式: RenderOptions.color_mode
+COLOR_MODES = {
+    "彩色": "rgb",
+    "灰度": "gray",
+    "黑白(1位)": "mono",
+}
+
+# 抗锯齿: RenderOptions.anti_alias
+ANTI_ALIAS_LEVELS = {
+    "默认": None,
+    "关闭": 0,
+    "2": 2,
+    "4": 4,
+    "8": 8,
+}
 
 class PDFToImageTab:
     """PDF转图片标签页类"""
@@ -14,7 +43,7 @@ class PDFToImageTab:
         self.parent = parent
         self.theme_manager = theme_manager
         self.style = theme_manager.style
-        self.pdf_file_paths = []
+        self.pdf_file_paths = FileSet()
         
         # 创建界面
         self.frame = ttk.Frame(parent)
@@ -41,14 +70,9 @@ class PDFToImageTab:
         file_list_frame.pack(fill="both", expand=True, padx=10, pady=5)
         
         # PDF文件列表
-        self.pdf_listbox = tk.Listbox(file_list_frame, selectmode=tk.EXTENDED, height=6)
+        self.pdf_listbox = VirtualFileList(file_list_frame, self.pdf_file_paths, height=6)
         self.pdf_listbox.pack(side=tk.LEFT, fill="both", expand=True, padx=5, pady=5)
         
-        # 滚动条
-        scrollbar = ttk.Scrollbar(file_list_frame, orient="vertical", command=self.pdf_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill="y")
-        self.pdf_listbox.config(yscrollcommand=scrollbar.set)
-        
         # 移除选中的文件按钮
         ttk.Button(file_list_frame, text="移除选中", command=self.remove_selected_pdfs).pack(side=tk.BOTTOM, padx=5, pady=5)
         
@@ -65,6 +89,50 @@ class PDFToImageTab:
         self.dpi_var = tk.StringVar(value="300")
         ttk.Entry(format_frame, textvariable=self.dpi_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
         
+        ttk.Label(format_frame, text="并行进程数:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.workers_var = tk.StringVar(value=str(render.default_worker_count()))
+        ttk.Entry(format_frame, textvariable=self.workers_var, width=5).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.use_cache = tk.BooleanVar(value=True)
+        ttk.Checkbutton(format_frame, text="使用结果缓存", variable=self.use_cache).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.incremental = tk.BooleanVar(value=False)
+        ttk.Checkbutton(format_frame, text="增量导出(跳过未变化的页面)",
+                        variable=self.incremental).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # 颜色模式和抗锯齿：文字扫描件用灰度或黑白可大幅减小内存占用和文件大小
+        color_frame = ttk.Frame(self.frame)
+        color_frame.pack(fill="x", padx=10, pady=5)
+        
+        ttk.Label(color_frame, text="颜色模式:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.color_mode = tk.StringVar(value="彩色")
+        ttk.Combobox(color_frame, textvariable=self.color_mode, values=list(COLOR_MODES),
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        ttk.Label(color_frame, text="抗锯齿:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.anti_alias = tk.StringVar(value="默认")
+        ttk.Combobox(color_frame, textvariable=self.anti_alias, values=list(ANTI_ALIAS_LEVELS),
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(color_frame, text="(黑白模式: PNG为1位深度，TIFF为CCITT G4压缩)").pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # 输出方式：多页TIFF或打包时每个PDF只生成一个文件
+        mode_frame = ttk.Frame(self.frame)
+        mode_frame.pack(fill="x", padx=10, pady=5)
+        
+        ttk.Label(mode_frame, text="输出方式:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.output_mode = tk.StringVar(value="每页一个文件")
+        ttk.Combobox(mode_frame, textvariable=self.output_mode, values=list(OUTPUT_MODES),
+                     state="readonly", width=15).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(mode_frame, text="(多页TIFF忽略输出格式，打包和多页TIFF不使用结果缓存)").pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # 预览图模式：每页渲染一次，缩小得到多个尺寸，并生成清单JSON
+        pyramid_frame = ttk.Frame(self.frame)
+        pyramid_frame.pack(fill="x", padx=10, pady=5)
+        
+        ttk.Label(pyramid_frame, text="预览图尺寸(长边像素，如1024,512,128，留空不生成):").pack(side=tk.LEFT, padx=5, pady=5)
+        self.pyramid_var = tk.StringVar()
+        ttk.Entry(pyramid_frame, textvariable=self.pyramid_var, width=20).pack(side=tk.LEFT, padx=5, pady=5)
+        
         # 页面范围
         range_frame = ttk.Frame(self.frame)
         range_frame.pack(fill="x", padx=10, pady=5)
@@ -115,6 +183,10 @@ class PDFToImageTab:
         else:
             self.page_range_entry.config(state="disabled")
             
+    def add_pdf_files(self, file_paths):
+        """把文件添加到列表，已在列表中的文件被跳过"""
+        self.pdf_listbox.add_files(file_paths)
+    
     def select_pdf_files(self):
         """选择多个PDF文件"""
         file_paths = filedialog.askopenfilenames(
@@ -122,43 +194,28 @@ class PDFToImageTab:
             filetypes=[("PDF文件", "*.pdf")]
         )
         if file_paths:
-            for file_path in file_paths:
-                if file_path not in self.pdf_file_paths:
-                    self.pdf_file_paths.append(file_path)
-                    self.pdf_listbox.insert(tk.END, os.path.basename(file_path))
+            self.add_pdf_files(file_paths)
     
     def select_pdf_folder(self):
         """选择包含PDF文件的文件夹"""
         folder_path = filedialog.askdirectory(title="选择包含PDF文件的文件夹")
         if folder_path:
-            # 搜索文件夹中的所有PDF文件
-            pdf_files = []
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith('.pdf'):
-                        full_path = os.path.join(root, file)
-                        pdf_files.append(full_path)
+            # 在后台线程中扫描文件夹，检查过的文件分批加入列表
+            def on_done(found, rejected):
+                if rejected:
+                    messagebox.showwarning("提示", f"以下文件无法识别或已损坏，未加入列表:\n{describe_rejected(rejected)}")
+                elif not found:
+                    messagebox.showinfo("提示", "所选文件夹中没有找到PDF文件")
             
-            # 添加到列表中
-            for file_path in pdf_files:
-                if file_path not in self.pdf_file_paths:
-                    self.pdf_file_paths.append(file_path)
-                    self.pdf_listbox.insert(tk.END, os.path.basename(file_path))
-            
-            if not pdf_files:
-                messagebox.showinfo("提示", "所选文件夹中没有找到PDF文件")
+            scan_folder_async(self.frame, folder_path, ('.pdf',), self.pdf_listbox.add_scanned, on_done)
     
     def remove_selected_pdfs(self):
         """移除选中的PDF文件"""
-        selected_indices = self.pdf_listbox.curselection()
-        for index in reversed(selected_indices):
-            self.pdf_listbox.delete(index)
-            self.pdf_file_paths.pop(index)
+        self.pdf_listbox.delete_selected()
     
     def clear_pdf_list(self):
         """清空PDF文件列表"""
-        self.pdf_listbox.delete(0, tk.END)
-        self.pdf_file_paths = []
+        self.pdf_listbox.clear()
     
     def select_output_dir(self):
         """选择输出目录"""
@@ -166,6 +223,36 @@ class PDFToImageTab:
         if dir_path:
             self.output_dir.set(dir_path)
     
+    def update_progress(self, current, total, message=None):
+        """在Tk主线程中更新进度条和日志"""
+        self.progress.config(maximum=total, value=current)
+        if message:
+            self.append_log(message)
+    
+    def append_log(self, message):
+        """在Tk主线程中追加一行日志"""
+        self.log_text.insert(tk.END, f"{message}\n")
+        self.log_text.see(tk.END)
+    
+    def get_render_options(self):
+        """从界面读取转换参数"""
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except ValueError:
+            workers = render.default_worker_count()
+        
+        return RenderOptions(
+            output_format=self.output_format.get().lower(),
+            dpi=int(self.dpi_var.get()),
+            page_range=self.page_range.get() if self.range_var.get() == "自定义" else None,
+            workers=workers,
+            container=OUTPUT_MODES[self.output_mode.get()],
+            pyramid_sizes=render.parse_pyramid_sizes(self.pyramid_var.get()),
+            color_mode=COLOR_MODES[self.color_mode.get()],
+            anti_alias=ANTI_ALIAS_LEVELS[self.anti_alias.get()],
+            incremental=self.incremental.get()
+        )
+    
     def convert_pdf_to_images(self):
         """将PDF转换为图片"""
         if not self.pdf_file_paths:
@@ -182,113 +269,63 @@ class PDFToImageTab:
             os.makedirs(output_dir)
         
         # 获取转换参数
-        output_format = self.output_format.get().lower()
-        dpi = int(self.dpi_var.get())
+        try:
+            options = self.get_render_options()
+        except ValueError:
+            messagebox.showwarning("警告", "DPI和预览图尺寸必须是正整数")
+            return
+        
+        # 渲染在后台线程和子进程中进行，所有界面更新都交给Tk主线程
+        def log(message):
+            self.parent.after(0, lambda m=message: self.append_log(m))
         
-        # 获取页面范围
-        page_range_mode = self.range_var.get()
+        def on_progress(current, total, message):
+            self.parent.after(0, lambda c=current, t=total, m=message: self.update_progress(c, t, m))
+        
+        pdf_paths = list(self.pdf_file_paths)
+        cache = ResultCache() if self.use_cache.get() else None
+        # 整批共用一份清单，结束时写回一次
+        manifest = ExportManifest(output_dir) if options.incremental else None
         
         # 准备线程
         def conversion_thread():
             try:
-                self.log_text.delete(1.0, tk.END)
-                self.log_text.insert(tk.END, "开始批量转换...\n")
+                self.parent.after(0, lambda: self.log_text.delete(1.0, tk.END))
+                log("开始批量转换...")
                 
-                total_files = len(self.pdf_file_paths)
+                total_files = len(pdf_paths)
                 total_pages_converted = 0
                 
                 # 对每个文件进行处理
-                for file_index, pdf_path in enumerate(self.pdf_file_paths):
-                    # 获取不带扩展名的文件名
-                    base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
-                    
-                    self.log_text.insert(tk.END, f"\n处理文件 {file_index+1}/{total_files}: {os.path.basename(pdf_path)}\n")
-                    self.log_text.see(tk.END)
+                for file_index, pdf_path in enumerate(pdf_paths):
+                    log(f"\n处理文件 {file_index+1}/{total_files}: {os.path.basename(pdf_path)}")
                     
-                    # 打开PDF
                     try:
-                        pdf_doc = fitz.open(pdf_path)
-                        total_pages = len(pdf_doc)
+                        total_pages_converted += render.convert_pdf_to_images(pdf_path, output_dir, options, on_progress, log,
+                                                                              cache=cache, manifest=manifest)
                     except Exception as e:
-                        self.log_text.insert(tk.END, f"错误: 无法打开 {pdf_path}: {str(e)}\n")
-                        self.log_text.see(tk.END)
+                        log(f"错误: 无法转换 {pdf_path}: {str(e)}")
                         continue
-                    
-                    # 确定需要转换的页面
-                    pages_to_convert = []
-                    if page_range_mode == "全部":
-                        pages_to_convert = range(total_pages)
-                    else:
-                        # 解析页码范围，例如 "1-3,5,7-9"
-                        page_range_str = self.page_range.get()
-                        
-                        try:
-                            for part in page_range_str.split(','):
-                                part = part.strip()
-                                if '-' in part:
-                                    start, end = map(int, part.split('-'))
-                                    # PDF页码通常从1开始，但PyMuPDF从0开始
-                                    pages_to_convert.extend(range(start-1, end))
-                                else:
-                                    # 单页
-                                    pages_to_convert.append(int(part)-1)
-                        except ValueError:
-                            self.log_text.insert(tk.END, "错误: 页码范围格式不正确，将转换全部页面\n")
-                            self.log_text.see(tk.END)
-                            pages_to_convert = range(total_pages)
-                    
-                    # 设置当前文件的进度条
-                    self.progress["maximum"] = len(pages_to_convert)
-                    self.progress["value"] = 0
-                    
-                    # 转换每一页
-                    for i, page_num in enumerate(pages_to_convert):
-                        if page_num >= total_pages or page_num < 0:
-                            self.log_text.insert(tk.END, f"跳过无效页码 {page_num+1}\n")
-                            self.log_text.see(tk.END)
-                            continue
-                        
-                        # 获取页面
-                        page = pdf_doc.load_page(page_num)
-                        
-                        # 设置渲染参数
-                        matrix = fitz.Matrix(dpi/72, dpi/72)
-                        pix = page.get_pixmap(matrix=matrix)
-                        
-                        # 转换为PIL图像
-                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        
-                        # 使用"原文件名_页码.格式"命名输出文件
-                        filename = f"{base_filename}_{page_num+1}.{output_format}"
-                        output_path = os.path.join(output_dir, filename)
-                        
-                        # 保存图像
-                        img.save(output_path)
-                        
-                        # 更新日志
-                        self.log_text.insert(tk.END, f"页面 {page_num+1} 已转换为 {filename}\n")
-                        self.log_text.see(tk.END)
-                        
-                        # 更新进度条
-                        self.progress["value"] = i + 1
-                        self.parent.update_idletasks()
-                        
-                        total_pages_converted += 1
-                    
-                    # 关闭当前PDF文档
-                    pdf_doc.close()
                 
-                self.log_text.insert(tk.END, f"\n批量转换完成! 共处理 {total_files} 个文件, {total_pages_converted} 页\n")
-                self.log_text.see(tk.END)
-                messagebox.showinfo("成功", f"共处理 {total_files} 个PDF文件, {total_pages_converted} 页，保存在: {output_dir}")
+                log(f"\n批量转换完成! 共处理 {total_files} 个文件, {total_pages_converted} 页")
+                if cache is not None:
+                    log(cache.report())
+                log(memory_report())
+                self.parent.after(0, lambda n=total_pages_converted: messagebox.showinfo(
+                    "成功", f"共处理 {total_files} 个PDF文件, {n} 页，保存在: {output_dir}"))
                 
             except Exception as e:
-                self.log_text.insert(tk.END, f"错误: {str(e)}\n")
-                self.log_text.see(tk.END)
-                messagebox.showerror("错误", f"转换失败: {str(e)}")
+                error_msg = str(e)
+                log(f"错误: {error_msg}")
+                self.parent.after(0, lambda msg=error_msg: messagebox.showerror("错误", f"转换失败: {msg}"))
             finally:
+                if manifest is not None:
+                    try:
+                        manifest.save()
+                    except OSError as e:
+                        log(f"警告: 无法保存增量导出清单: {str(e)}")
                 # 重置进度条
-                self.progress["value"] = 0
+                self.parent.after(0, lambda: self.progress.config(value=0))
         
         # 使用线程执行转换，避免界面卡顿
-        threading.Thread(target=conversion_thread).start()
\ No newline at end of file
+        threading.Thread(target=conversion_thread).start()
@@ -8,6 +8,7 @@ from PIL import Image, ImageTk
 import fitz  # PyMuPDF
 import io
 import sys
+import multiprocessing
 
 # 应用版本号
 VERSION = "v0.0.1.21"
@@ -153,6 +154,9 @@ class PDFToolGUI:
 
 
 if __name__ == "__main__":
+    # 打包为EXE后，多进程渲染的子进程需要此调用才能正常启动
+    multiprocessing.freeze_support()
+    
     # 检查是否可以使用主题化的Tk
     if HAS_THEMED_TK:
         root = ThemedTk(theme="arc")
@@ -0,0 +1,438 @@
+"""
+PDF工具箱命令行入口，无需Tk和图形界面，适合服务器批处理、定时任务和容器环境
+使用方法:
+  python pdftools.py merge a.pdf b.jpg -o merged.pdf
+  python pdftools.py compress *.pdf -o out_dir --level high
+  python pdftools.py compress scan.pdf -o out_dir --target-size 5MB
+  python pdftools.py render doc.pdf -o images --format png --dpi 200
+  python pdftools.py convert *.png -o out_dir --format jpg --width 1024
+  python pdftools.py resize doc.pdf -o out_dir --size A4
+  python pdftools.py inspect doc.pdf
+执行 python pdftools.py <子命令> -h 查看各子命令的参数
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+
+from core.memory import memory_report
+from core.options import MergeOptions, CompressOptions, RenderOptions, ConvertOptions, ResizeOptions
+
+# 命令行参数值与界面选项之间的对应关系
+MERGE_MODES = {"original": "原样", "auto": "自动调整", "manual": "手动调整"}
+ORIENTATIONS = {"portrait": "纵向", "landscape": "横向", "mixed": "混合"}
+COMPRESSION_LEVELS = {"low": "低", "standard": "标准", "high": "高", "max": "最高"}
+COMPRESSION_MODES = {"raster": "整页栅格化", "images": "图像重压缩"}
+
+
+def print_progress(current, total, message):
+    """进度回调：只输出带信息的进度"""
+    if message:
+        print(f"[{current}/{total}] {message}")
+
+
+def print_warning(message):
+    """警告回调：输出到标准错误"""
+    print(f"警告: {message}", file=sys.stderr)
+
+
+def parse_size(value):
+    """解析 5MB、800KB、1048576 这样的文件大小参数，返回字节数"""
+    units = {"GB": 1024 ** 3, "MB": 1024 ** 2, "KB": 1024, "G": 1024 ** 3, "M": 1024 ** 2, "K": 1024, "B": 1}
+    text = value.strip().upper()
+    multiplier = 1
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            text = text[:-len(unit)].strip()
+            multiplier = factor
+            break
+    try:
+        size = int(float(text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的文件大小: {value}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"文件大小必须大于0: {value}")
+    return size
+
+
+def parse_number(value, convert, minimum, maximum=None, exclusive=False):
+    """把参数转换为数值并检查范围，超出范围时给出argparse能识别的错误"""
+    try:
+        number = convert(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的数值: {value}")
+    if exclusive and number <= minimum:
+        raise argparse.ArgumentTypeError(f"数值必须大于{minimum}: {value}")
+    if number < minimum:
+        raise argparse.ArgumentTypeError(f"数值不能小于{minimum}: {value}")
+    if maximum is not None and number > maximum:
+        raise argparse.ArgumentTypeError(f"数值不能大于{maximum}: {value}")
+    return number
+
+
+def positive_int(value):
+    """大于0的整数，用于DPI、尺寸、线程数等参数"""
+    return parse_number(value, int, 1)
+
+
+def positive_float(value):
+    """大于0的实数，用于以毫米为单位的页面尺寸"""
+    return parse_number(value, float, 0, exclusive=True)
+
+
+def non_negative_float(value):
+    """不小于0的实数，用于页边距"""
+    return parse_number(value, float, 0)
+
+
+def quality_value(value):
+    """1-100之间的图像质量"""
+    return parse_number(value, int, 1, 100)
+
+
+def parse_pyramid(value):
+    """解析 --pyramid 参数，如 1024,512,128"""
+    from core.render import parse_pyramid_sizes
+
+    try:
+        sizes = parse_pyramid_sizes(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的预览图尺寸: {value}")
+    if not sizes:
+        raise argparse.ArgumentTypeError("请至少指定一个预览图尺寸")
+    return sizes
+
+
+def make_cache(args):
+    """根据 --no-cache/--cache-dir/--cache-size 参数创建结果缓存，禁用时返回None"""
+    from core.cache import ResultCache
+
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache_dir, args.cache_size)
+
+
+def add_cache_arguments(parser):
+    """为会产生可复用结果的子命令添加缓存参数"""
+    from core.cache import DEFAULT_CACHE_SIZE
+
+    parser.add_argument("--no-cache", action="store_true", help="不使用结果缓存")
+    parser.add_argument("--cache-dir", help="结果缓存目录，默认为用户目录下的 .pdf_tools_cache")
+    parser.add_argument("--cache-size", type=parse_size, default=DEFAULT_CACHE_SIZE,
+                        help="结果缓存的大小上限，如 2GB，超出时淘汰最久未使用的结果")
+
+
+def ensure_output_dir(output_dir):
+    """确保输出目录存在"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+
+def cmd_merge(args):
+    """合并PDF和图片"""
+    from core.merge import merge_files
+
+    if len(args.files) < 2:
+        print_warning("请至少指定两个文件进行合并")
+        return 1
+
+    options = MergeOptions(
+        layout_mode=MERGE_MODES[args.mode],
+        force_a4=args.force_a4,
+        page_orientation=ORIENTATIONS[args.orientation],
+        page_size=args.page_size,
+        width_mm=args.width,
+        height_mm=args.height,
+        margin_mm=args.margin,
+        rasterize=args.rasterize,
+        streaming=args.streaming,
+        workers=args.workers,
+        prefetch_window=args.window
+    )
+    merge_files(args.files, args.output, options, print_progress, print_warning)
+    print(f"文件已成功合并为: {args.output}")
+    return 0
+
+
+def cmd_compress(args):
+    """压缩PDF"""
+    from core.compress import apply_compression_level, compress_batch, format_size
+
+    if not args.replace:
+        if not args.output:
+            print_warning("请使用 -o 指定输出目录，或使用 --replace 替换原文件")
+            return 1
+        ensure_output_dir(args.output)
+
+    options = apply_compression_level(CompressOptions(
+        level=COMPRESSION_LEVELS[args.level],
+        mode=COMPRESSION_MODES[args.mode],
+        image_quality=args.quality,
+        image_dpi=args.dpi,
+        optimize_images=not args.no_optimize_images,
+        remove_metadata=not args.keep_metadata,
+        keep_page_size=not args.no_keep_page_size,
+        target_size=args.target_size
+    ))
+
+    def print_result(result, processed, total):
+        if result.error is None:
+            print(f"[{processed}/{total}] {result.pdf_path}: {format_size(result.size_before)} -> "
+                  f"{format_size(result.size_after)}，用时 {result.elapsed:.2f} 秒")
+            if result.note:
+                print(f"  {result.note}")
+        else:
+            print_warning(f"[{processed}/{total}] {result.pdf_path}: {result.error}")
+
+    cache = make_cache(args)
+    summary = compress_batch(args.files, options,
+                             output_dir=None if args.replace else args.output,
+                             workers=args.workers,
+                             result_callback=print_result,
+                             cache=cache)
+
+    print(f"压缩完成! 成功处理 {summary.success_count}/{summary.total_files} 个文件")
+    if summary.total_size_before > 0:
+        total_reduction_percent = ((summary.total_size_before - summary.total_size_after)
+                                   / summary.total_size_before) * 100
+        print(f"总体压缩效果: {format_size(summary.total_size_before)} -> {format_size(summary.total_size_after)} "
+              f"(减小了 {total_reduction_percent:.2f}%)")
+    if cache is not None:
+        print(cache.report(summary.cache_hits, summary.cache_misses))
+    print(memory_report())
+    return 0 if summary.success_count == summary.total_files else 1
+
+
+def cmd_render(args):
+    """PDF转图片"""
+    from core.render import convert_pdf_to_images
+    from core.manifest import ExportManifest
+
+    ensure_output_dir(args.output)
+    options = RenderOptions(
+        output_format=args.format,
+        dpi=args.dpi,
+        page_range=args.pages,
+        workers=args.workers,
+        container=args.container,
+        pyramid_sizes=args.pyramid,
+        color_mode=args.color,
+        anti_alias=args.anti_alias,
+        incremental=args.incremental
+    )
+
+    cache = make_cache(args)
+    # 整批共用一份清单，结束时写回一次
+    manifest = ExportManifest(args.output) if args.incremental else None
+    failed = 0
+    total_pages_converted = 0
+    try:
+        for pdf_path in args.files:
+            print(f"处理文件: {pdf_path}")
+            try:
+                total_pages_converted += convert_pdf_to_images(pdf_path, args.output, options,
+                                                               print_progress, print_warning, cache, manifest)
+            except Exception as e:
+                print_warning(f"无法转换 {pdf_path}: {str(e)}")
+                failed += 1
+    finally:
+        if manifest is not None:
+            manifest.save()
+
+    print(f"批量转换完成! 共处理 {len(args.files)} 个文件, {total_pages_converted} 页")
+    if cache is not None:
+        print(cache.report())
+    print(memory_report())
+    return 1 if failed else 0
+
+
+def cmd_convert(args):
+    """图片格式转换"""
+    from core.convert import convert_batch
+
+    ensure_output_dir(args.output)
+    options = ConvertOptions(
+        output_format=args.format,
+        quality=args.quality,
+        input_format=args.input_format,
+        width=args.width,
+        height=args.height,
+        keep_ratio=not args.no_keep_ratio,
+        fast_resize=args.fast_resize
+    )
+
+    def on_file_done(result, processed, total):
+        if result.skipped:
+            print(f"跳过非{options.input_format}文件: {result.file_path}")
+        elif result.error is None:
+            print(f"[{processed}/{total}] 已转换: {os.path.basename(result.file_path)} -> "
+                  f"{os.path.basename(result.output_path)}")
+        else:
+            print_warning(result.error)
+
+    cache = make_cache(args)
+    summary = convert_batch(args.files, args.output, options, args.workers,
+                            result_callback=on_file_done, cache=cache)
+
+    # 被源格式筛选跳过的文件不算失败
+    attempted = len(args.files) - summary.skipped_count
+    print(f"转换完成! 成功转换 {summary.success_count}/{attempted} 个文件")
+    if summary.skipped_count:
+        print(f"跳过 {summary.skipped_count} 个不符合源格式的文件")
+    if cache is not None:
+        print(cache.report(summary.cache_hits, summary.cache_misses))
+    print(memory_report())
+    return 0 if summary.success_count == attempted else 1
+
+
+def cmd_resize(args):
+    """PDF页面尺寸转换"""
+    from core.resize import PREDEFINED_SIZES, resized_output_path, resize_pdf
+
+    if args.width_mm and args.height_mm:
+        options = ResizeOptions(width_mm=args.width_mm, height_mm=args.height_mm)
+    elif args.size in PREDEFINED_SIZES:
+        width_mm, height_mm = PREDEFINED_SIZES[args.size]
+        options = ResizeOptions(width_mm=width_mm, height_mm=height_mm)
+    else:
+        print_warning(f"未知的页面规格: {args.size}，可选: {', '.join(PREDEFINED_SIZES)}")
+        return 1
+
+    failed = 0
+    for input_path in args.files:
+        output_dir = args.output or os.path.dirname(os.path.abspath(input_path))
+        ensure_output_dir(output_dir)
+        output_path = resized_output_path(input_path, output_dir)
+        try:
+            resize_pdf(input_path, output_path, options)
+            print(f"完成! 输出文件保存至: {output_path}")
+        except Exception as e:
+            print_warning(f"处理PDF时出错 {input_path}: {str(e)}")
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_inspect(args):
+    """查看PDF属性"""
+    from core.properties import analyze_pdf
+
+    failed = 0
+    for file_path in args.files:
+        try:
+            properties_dict = analyze_pdf(file_path)
+        except Exception as e:
+            print_warning(f"分析PDF属性时出错 {file_path}: {str(e)}")
+            failed += 1
+            continue
+        for key, value in properties_dict.items():
+            print(f"{key}: {value}")
+        print()
+    return 1 if failed else 0
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="pdftools", description="PDF工具箱命令行版本")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # 合并
+    merge_parser = subparsers.add_parser("merge", help="合并PDF和图片")
+    merge_parser.add_argument("files", nargs="+", help="按顺序排列的PDF或图片文件")
+    merge_parser.add_argument("-o", "--output", required=True, help="输出PDF路径")
+    merge_parser.add_argument("--mode", choices=MERGE_MODES, default="original", help="版面模式")
+    merge_parser.add_argument("--force-a4", action="store_true", help="原样模式下强制使用A4纸张大小")
+    merge_parser.add_argument("--orientation", choices=ORIENTATIONS, default="portrait", help="页面方向")
+    merge_parser.add_argument("--page-size", default="A4", help="手动调整模式的页面尺寸: A4/A5/Letter/Legal/自定义")
+    merge_parser.add_argument("--width", type=positive_float, default=210, help="自定义宽度(mm)")
+    merge_parser.add_argument("--height", type=positive_float, default=297, help="自定义高度(mm)")
+    merge_parser.add_argument("--margin", type=non_negative_float, default=10, help="页边距(mm)")
+    merge_parser.add_argument("--rasterize", action="store_true",
+                              help="自动/手动调整模式下把页面渲染为300DPI图像，默认保持矢量")
+    merge_parser.add_argument("--streaming", action="store_true",
+                              help="流式合并：分批写出页面并及时关闭源文件，适合超大输入")
+    merge_parser.add_argument("--workers", type=positive_int, help="图片预处理线程数，默认等于CPU核心数")
+    merge_parser.add_argument("--window", type=positive_int, default=8, help="同时预处理的图片数上限，限制内存占用")
+    merge_parser.set_defaults(func=cmd_merge)
+
+    # 压缩
+    compress_parser = subparsers.add_parser("compress", help="压缩PDF")
+    compress_parser.add_argument("files", nargs="+", help="PDF文件")
+    compress_parser.add_argument("-o", "--output", help="输出目录")
+    compress_parser.add_argument("--replace", action="store_true", help="替换原文件")
+    compress_parser.add_argument("--level", choices=COMPRESSION_LEVELS, default="standard", help="压缩级别")
+    compress_parser.add_argument("--mode", choices=COMPRESSION_MODES, default="raster",
+                                 help="压缩方式: raster 整页栅格化, images 只重新压缩高分辨率图像并保留文字和矢量")
+    compress_parser.add_argument("--dpi", type=positive_int, default=150, help="图像DPI")
+    compress_parser.add_argument("--quality", type=quality_value, default=75, help="图像质量(1-100)")
+    compress_parser.add_argument("--no-optimize-images", action="store_true", help="不优化图像")
+    compress_parser.add_argument("--keep-metadata", action="store_true", help="保留元数据")
+    compress_parser.add_argument("--no-keep-page-size", action="store_true", help="不保持页面尺寸")
+    compress_parser.add_argument("--target-size", type=parse_size,
+                                 help="目标文件大小，如 5MB、800KB；按整页栅格化方式自动搜索DPI和图像质量")
+    compress_parser.add_argument("--workers", type=positive_int, help="并行处理的文件数，默认等于CPU核心数")
+    add_cache_arguments(compress_parser)
+    compress_parser.set_defaults(func=cmd_compress)
+
+    # PDF转图片
+    render_parser = subparsers.add_parser("render", help="PDF转图片")
+    render_parser.add_argument("files", nargs="+", help="PDF文件")
+    render_parser.add_argument("-o", "--output", required=True, help="输出目录")
+    render_parser.add_argument("--format", default="jpg", choices=["jpg", "png", "tiff", "bmp"], help="输出格式")
+    render_parser.add_argument("--dpi", type=positive_int, default=300, help="DPI")
+    render_parser.add_argument("--pages", help="页码范围，如 1-3,5,7-9，默认全部")
+    render_parser.add_argument("--workers", type=positive_int, help="并行进程数，默认等于CPU核心数")
+    render_parser.add_argument("--container", choices=["tiff", "zip", "tar"],
+                               help="每个PDF只输出一个文件: 多页TIFF或不压缩的ZIP/TAR包，默认每页一个文件")
+    render_parser.add_argument("--pyramid", type=parse_pyramid,
+                               help="生成多个尺寸的预览图，如 1024,512,128（长边像素），每页只渲染一次并输出清单JSON")
+    render_parser.add_argument("--color", default="rgb", choices=["rgb", "gray", "mono"],
+                               help="颜色模式: 彩色、8位灰度或1位黑白（PNG为1位深度，TIFF为CCITT G4压缩），默认rgb")
+    render_parser.add_argument("--anti-alias", type=int, choices=range(9), metavar="0-8",
+                               help="抗锯齿级别，0为关闭，默认使用PyMuPDF的默认值")
+    render_parser.add_argument("--incremental", action="store_true",
+                               help="增量导出: 按输出目录中的清单跳过源文件和参数都没有变化的页面")
+    add_cache_arguments(render_parser)
+    render_parser.set_defaults(func=cmd_render)
+
+    # 图片格式转换
+    convert_parser = subparsers.add_parser("convert", help="图片格式转换")
+    convert_parser.add_argument("files", nargs="+", help="图片文件")
+    convert_parser.add_argument("-o", "--output", required=True, help="输出目录")
+    convert_parser.add_argument("--format", default="jpg", choices=["jpg", "png", "tiff", "bmp", "gif", "webp"], help="目标格式")
+    convert_parser.add_argument("--input-format", default="全部", help="只处理指定源格式，如 jpg/png")
+    convert_parser.add_argument("--quality", type=quality_value, default=85, help="图像质量(1-100)")
+    convert_parser.add_argument("--width", type=positive_int, help="宽度")
+    convert_parser.add_argument("--height", type=positive_int, help="高度")
+    convert_parser.add_argument("--no-keep-ratio", action="store_true", help="不保持比例")
+    convert_parser.add_argument("--fast-resize", action="store_true",
+                                help="速度优先的缩放：JPEG降采样解码并先整数倍缩小，适合生成缩略图")
+    convert_parser.add_argument("--workers", type=positive_int, help="并行进程数，默认等于CPU核心数")
+    add_cache_arguments(convert_parser)
+    convert_parser.set_defaults(func=cmd_convert)
+
+    # PDF页面尺寸转换
+    resize_parser = subparsers.add_parser("resize", help="PDF页面尺寸转换")
+    resize_parser.add_argument("files", nargs="+", help="PDF文件")
+    resize_parser.add_argument("-o", "--output", help="输出目录，默认与源文件相同")
+    resize_parser.add_argument("--size", default="A4", help="预定义页面规格，如 A4/A3/Letter")
+    resize_parser.add_argument("--width-mm", type=positive_float, help="自定义宽度(mm)")
+    resize_parser.add_argument("--height-mm", type=positive_float, help="自定义高度(mm)")
+    resize_parser.set_defaults(func=cmd_resize)
+
+    # PDF属性查看
+    inspect_parser = subparsers.add_parser("inspect", help="查看PDF属性")
+    inspect_parser.add_argument("files", nargs="+", help="PDF文件")
+    inspect_parser.set_defaults(func=cmd_inspect)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行主函数，返回退出码"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""测试公共部分：把 pdf_tools 目录加入模块搜索路径，并提供生成测试文件的工具"""
+import io
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def png_bytes(width=64, height=48, color=(200, 30, 30)):
+    """生成一张纯色PNG图片的数据"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def write_pdf(path, pages=1, with_image=False, text=None):
+    """生成一个测试PDF，每页写一行文字，with_image 为真时每页再放一张图片"""
+    doc = fitz.open()
+    try:
+        for page_num in range(pages):
+            page = doc.new_page(width=595, height=842)
+            page.insert_text((72, 72), text or f"page {page_num + 1}")
+            if with_image:
+                page.insert_image(fitz.Rect(72, 100, 520, 436), stream=png_bytes(400, 300))
+        doc.save(path)
+    finally:
+        doc.close()
+    return path
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """在临时目录中生成测试PDF: make_pdf("a.pdf", pages=3, with_image=True)"""
+    def make(name, pages=1, with_image=False, text=None):
+        return write_pdf(str(tmp_path / name), pages, with_image, text)
+    return make
+
+
+@pytest.fixture
+def make_image(tmp_path):
+    """在临时目录中生成测试图片: make_image("a.jpg", 800, 600)"""
+    def make(name, width=64, height=48, color=(200, 30, 30), mode="RGB"):
+        path = str(tmp_path / name)
+        Image.new(mode, (width, height), color if mode != "L" else 128).save(path)
+        return path
+    return make
+
+
+class SerialExecutor:
+    """代替 ProcessPoolExecutor，按提交顺序在当前进程中执行任务，并记录每个任务的第一个参数"""
+
+    def __init__(self, submitted):
+        self.submitted = submitted
+
+    def __call__(self, max_workers=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, func, *args):
+        self.submitted.append(args[0])
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+@pytest.fixture
+def serial_executor(monkeypatch):
+    """把模块中的进程池换成 SerialExecutor: submitted = serial_executor(compress)"""
+    def patch(module):
+        submitted = []
+        monkeypatch.setattr(module, "ProcessPoolExecutor", SerialExecutor(submitted))
+        return submitted
+    return patch
@@ -0,0 +1,123 @@
+"""结果缓存的测试"""
+import os
+from dataclasses import dataclass
+
+from PIL import Image
+
+from core.cache import ResultCache, file_digest, normalize_params
+from core.options import RenderOptions
+from core.render import convert_pdf_to_images
+
+
+@dataclass
+class Params:
+    dpi: int = 150
+    quality: int = 75
+
+
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_key_stable_and_param_sensitive(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.make_key("abc", "compress", {"dpi": 150, "quality": 75})
+    # 参数顺序和参数对象的形式不影响缓存键
+    assert key == cache.make_key("abc", "compress", {"quality": 75, "dpi": 150})
+    assert key == cache.make_key("abc", "compress", Params())
+    assert key != cache.make_key("abc", "compress", {"dpi": 150, "quality": 76})
+    assert key != cache.make_key("abd", "compress", {"dpi": 150, "quality": 75})
+    assert key != cache.make_key("abc", "render", {"dpi": 150, "quality": 75})
+    assert normalize_params(Params()) == normalize_params({"quality": 75, "dpi": 150})
+
+
+def test_file_digest_follows_content(tmp_path):
+    a = write_file(tmp_path / "a.bin", b"same")
+    b = write_file(tmp_path / "b.bin", b"same")
+    c = write_file(tmp_path / "c.bin", b"other")
+    assert file_digest(a) == file_digest(b) != file_digest(c)
+
+
+def test_miss_creates_nothing(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    dest = tmp_path / "out.pdf"
+    assert not cache.fetch(cache.make_key("x", "op", {}), {"result.pdf": str(dest)})
+    assert not dest.exists()
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_restore_by_copy(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.make_key("x", "op", {})
+    cache.store(key, {"result.pdf": write_file(tmp_path / "result.pdf", b"data")})
+
+    dest = tmp_path / "restored.pdf"
+    write_file(dest, b"stale")
+    assert cache.fetch(key, {"result.pdf": str(dest)})
+    assert dest.read_bytes() == b"data"
+    assert os.stat(dest).st_ino != os.stat(os.path.join(cache.entry_dir(key), "result.pdf")).st_ino
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_rewriting_restored_file_keeps_entry(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.make_key("x", "op", {})
+    cache.store(key, {"result.pdf": write_file(tmp_path / "result.pdf", b"data")})
+    dest = str(tmp_path / "restored.pdf")
+    assert cache.fetch(key, {"result.pdf": dest})
+
+    # 原地截断覆盖恢复出来的文件，不能影响缓存条目
+    write_file(dest, b"overwritten")
+    assert cache.fetch(key, {"result.pdf": str(tmp_path / "again.pdf")})
+    assert (tmp_path / "again.pdf").read_bytes() == b"data"
+
+
+def test_render_cache_survives_uncached_rewrite(make_pdf, tmp_path):
+    pdf_path = make_pdf("doc.pdf")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    cache = ResultCache(str(tmp_path / "cache"))
+    low = RenderOptions(output_format="bmp", dpi=50)
+    high = RenderOptions(output_format="bmp", dpi=150)
+    output = output_dir / "doc_1.bmp"
+
+    convert_pdf_to_images(pdf_path, str(output_dir), low, cache=cache)
+    with Image.open(output) as img:
+        low_size = img.size
+    convert_pdf_to_images(pdf_path, str(output_dir), low, cache=cache)
+    assert cache.hits == 1
+    # 不使用缓存时按另一个DPI写到同一个输出文件
+    convert_pdf_to_images(pdf_path, str(output_dir), high)
+    with Image.open(output) as img:
+        assert img.size[0] > low_size[0] * 2
+
+    convert_pdf_to_images(pdf_path, str(output_dir), low, cache=cache)
+    assert cache.hits == 2
+    with Image.open(output) as img:
+        assert img.size == low_size
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_size=250)
+    keys = [cache.make_key(str(i), "op", {}) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.store(key, {"r": write_file(tmp_path / f"r{i}", b"x" * 100)}, evict=False)
+        # 让修改时间明确区分先后
+        os.utime(cache.entry_dir(key), (1000 + i, 1000 + i))
+
+    # 使用最早的条目，它变成最近使用
+    assert cache.fetch(keys[0], {"r": str(tmp_path / "restored")})
+    cache.evict()
+
+    assert os.path.isdir(cache.entry_dir(keys[0]))
+    assert not os.path.isdir(cache.entry_dir(keys[1]))
+    assert os.path.isdir(cache.entry_dir(keys[2]))
+
+
+def test_oversized_result_not_stored(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_size=10)
+    key = cache.make_key("x", "op", {})
+    cache.store(key, {"r": write_file(tmp_path / "r", b"x" * 100)})
+    assert not os.path.exists(cache.entry_dir(key))
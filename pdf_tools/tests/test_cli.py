@@ -0,0 +1,62 @@
+"""命令行入口的测试"""
+import pytest
+
+import pdftools
+
+
+@pytest.mark.parametrize("argv", [
+    ["render", "a.pdf", "-o", "out", "--dpi", "0"],
+    ["render", "a.pdf", "-o", "out", "--dpi", "-72"],
+    ["render", "a.pdf", "-o", "out", "--workers", "0"],
+    ["compress", "a.pdf", "-o", "out", "--quality", "101"],
+    ["compress", "a.pdf", "-o", "out", "--dpi", "abc"],
+    ["convert", "a.png", "-o", "out", "--width", "-1"],
+    ["convert", "a.png", "-o", "out", "--quality", "0"],
+    ["merge", "a.pdf", "b.pdf", "-o", "m.pdf", "--width", "0"],
+    ["merge", "a.pdf", "b.pdf", "-o", "m.pdf", "--margin", "-5"],
+    ["merge", "a.pdf", "b.pdf", "-o", "m.pdf", "--window", "0"],
+    ["resize", "a.pdf", "--width-mm", "-210", "--height-mm", "297"],
+])
+def test_out_of_range_numbers_are_usage_errors(argv, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        pdftools.main(argv)
+
+    assert excinfo.value.code == 2
+    error = capsys.readouterr().err
+    assert "数值" in error
+    assert "Traceback" not in error
+
+
+def test_number_ranges_accept_boundaries():
+    args = pdftools.build_parser().parse_args(
+        ["merge", "a.pdf", "b.pdf", "-o", "m.pdf", "--margin", "0", "--width", "0.5", "--workers", "1"])
+    assert args.margin == 0
+    assert args.width == 0.5
+    assert args.workers == 1
+
+    args = pdftools.build_parser().parse_args(["compress", "a.pdf", "--quality", "100", "--dpi", "1"])
+    assert args.quality == 100
+    assert args.dpi == 1
+
+
+def test_convert_skipped_files_are_not_failures(make_image, tmp_path, capsys):
+    png = make_image("a.png")
+    jpg = make_image("b.jpg")
+    output_dir = tmp_path / "out"
+
+    code = pdftools.main(["convert", png, jpg, "-o", str(output_dir), "--input-format", "png",
+                          "--format", "bmp", "--workers", "1", "--no-cache"])
+
+    assert code == 0
+    assert (output_dir / "a.bmp").exists()
+    assert "成功转换 1/1" in capsys.readouterr().out
+
+
+def test_convert_failure_sets_exit_code(make_image, tmp_path):
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+
+    code = pdftools.main(["convert", make_image("a.png"), str(broken), "-o", str(tmp_path / "out"),
+                          "--format", "bmp", "--workers", "1", "--no-cache"])
+
+    assert code == 1
@@ -0,0 +1,363 @@
+"""PDF压缩的测试"""
+import io
+import os
+import shutil
+
+import fitz
+import pytest
+from PIL import Image, ImageStat
+
+from core import compress
+from core.compress import MODE_RASTERIZE, MODE_RECOMPRESS_IMAGES, apply_compression_level, compress_pdf_file
+from core.cache import ResultCache
+from core.options import CompressOptions
+from core.pixmap import pixmap_to_image
+
+
+@pytest.fixture
+def parse_counter(monkeypatch):
+    """统计每个输入文件被 fitz.open 和 PyPDF2 解析的次数"""
+    counts = {}
+    real_open = fitz.open
+
+    def counting_open(*args, **kwargs):
+        if args and isinstance(args[0], str):
+            counts[args[0]] = counts.get(args[0], 0) + 1
+        return real_open(*args, **kwargs)
+
+    def forbidden_reader(*args, **kwargs):
+        raise AssertionError("压缩时不应再用 PdfReader 解析输入文件")
+
+    monkeypatch.setattr(fitz, "open", counting_open)
+    monkeypatch.setattr("PyPDF2.PdfReader", forbidden_reader)
+    return counts
+
+
+@pytest.mark.parametrize("mode, target_size", [
+    (MODE_RASTERIZE, None),
+    (MODE_RECOMPRESS_IMAGES, None),
+    (MODE_RASTERIZE, 200 * 1024),
+])
+def test_each_input_parsed_once(make_pdf, tmp_path, parse_counter, mode, target_size):
+    # 大部分页面原样复制，少数页面含图像
+    inputs = [make_pdf(f"in{i}.pdf", pages=60) for i in range(3)]
+    inputs.append(make_pdf("images.pdf", pages=6, with_image=True))
+    options = apply_compression_level(CompressOptions(mode=mode, target_size=target_size))
+
+    for index, input_path in enumerate(inputs):
+        output_path = str(tmp_path / f"out{index}.pdf")
+        compress_pdf_file(input_path, output_path, options)
+        with fitz.Document(output_path) as doc:
+            assert len(doc) == (6 if input_path.endswith("images.pdf") else 60)
+
+    assert parse_counter == {path: 1 for path in inputs}
+
+
+def test_passthrough_pages_keep_text(make_pdf, tmp_path):
+    input_path = make_pdf("text.pdf", pages=5, text="hello")
+    output_path = str(tmp_path / "out.pdf")
+    compress_pdf_file(input_path, output_path, apply_compression_level(CompressOptions()))
+    with fitz.Document(output_path) as doc:
+        assert all("hello" in page.get_text() for page in doc)
+
+
+def test_rasterized_pages_built_in_memory(make_pdf, tmp_path, monkeypatch):
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError("栅格化压缩不应创建临时文件")
+
+    monkeypatch.setattr("tempfile.TemporaryDirectory", no_temp_files)
+    monkeypatch.setattr("tempfile.mkstemp", no_temp_files)
+
+    input_path = make_pdf("mixed.pdf", pages=2, with_image=True)
+    output_path = str(tmp_path / "out.pdf")
+    options = CompressOptions(image_dpi=72, image_quality=60, remove_metadata=False)
+    compress_pdf_file(input_path, output_path, options)
+
+    with fitz.Document(output_path) as doc:
+        assert len(doc) == 2
+        for page in doc:
+            # 每页只剩一张铺满页面的JPEG，页面尺寸不变
+            images = page.get_images(full=True)
+            assert len(images) == 1
+            assert doc.extract_image(images[0][0])["ext"] == "jpeg"
+            assert (round(page.rect.width), round(page.rect.height)) == (595, 842)
+
+
+def test_rasterized_page_size_from_pixels(make_pdf, tmp_path):
+    input_path = make_pdf("mixed.pdf", pages=1, with_image=True)
+    output_path = str(tmp_path / "out.pdf")
+    compress_pdf_file(input_path, output_path, CompressOptions(image_dpi=144, keep_page_size=False))
+
+    with fitz.Document(output_path) as doc:
+        # 144DPI渲染后页面按72DPI换算，尺寸为原来的两倍
+        assert (round(doc[0].rect.width), round(doc[0].rect.height)) == (1190, 1684)
+
+
+def test_target_size_rasterizes_document_once(make_pdf, tmp_path, monkeypatch):
+    rasterize_calls = []
+    renders = []
+    real_rasterize = compress.rasterize_document
+    real_render = compress.render_pixmap
+
+    def counting_rasterize(*args, **kwargs):
+        rasterize_calls.append(args[2])
+        return real_rasterize(*args, **kwargs)
+
+    def counting_render(page, dpi, *args, **kwargs):
+        renders.append((page.number, dpi))
+        return real_render(page, dpi, *args, **kwargs)
+
+    monkeypatch.setattr(compress, "rasterize_document", counting_rasterize)
+    monkeypatch.setattr(compress, "render_pixmap", counting_render)
+
+    input_path = make_pdf("scan.pdf", pages=12, with_image=True)
+    output_path = str(tmp_path / "out.pdf")
+    target_size = 150 * 1024
+    options = CompressOptions(image_dpi=150, image_quality=85, target_size=target_size)
+    effective = compress_pdf_file(input_path, output_path, options)
+
+    assert len(rasterize_calls) == 1
+    assert os.path.getsize(output_path) <= target_size
+    assert effective.image_dpi <= 150 and effective.image_quality <= 85
+    # 采样页面的每个 (页面, DPI) 只渲染一次
+    assert len(renders) == len(set(renders))
+
+
+def noisy_image(mode="RGB", size=(1200, 900), color=(200, 30, 30)):
+    """带噪声的纯色图像，Flate压缩后仍然很大，重新编码为JPEG一定更小"""
+    noise = Image.effect_noise(size, 40)
+    channels = [noise.point(lambda v, c=c: max(0, min(255, c + v - 128))) for c in color]
+    return Image.merge(mode, channels)
+
+
+def image_stream(img, format="PNG"):
+    buffer = io.BytesIO()
+    img.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def write_image_pdf(path, streams, text="hello"):
+    """每个图像一页，图像显示为 300×225 点（1200像素宽时为288DPI），页面上另有文字和矢量图形"""
+    doc = fitz.open()
+    for stream in streams:
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), text)
+        page.draw_rect(fitz.Rect(50, 500, 250, 600), color=(0, 0, 1), width=2)
+        page.insert_image(fitz.Rect(72, 100, 372, 325), stream=stream)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def recompress_options(**overrides):
+    options = apply_compression_level(CompressOptions(mode=MODE_RECOMPRESS_IMAGES))
+    options.image_dpi = 72
+    for name, value in overrides.items():
+        setattr(options, name, value)
+    return options
+
+
+def output_images(path):
+    """输出文件中各页图像的 (xref, 宽, 高, 颜色空间, 滤镜)"""
+    with fitz.Document(path) as doc:
+        images = []
+        for page in doc:
+            for image in page.get_images(full=True):
+                xref = image[0]
+                images.append((xref, image[2], image[3], doc.xref_get_key(xref, "ColorSpace")[1],
+                               doc.xref_get_key(xref, "Filter")[1]))
+        return images
+
+
+def test_recompress_downsamples_to_target_dpi(tmp_path):
+    input_path = write_image_pdf(str(tmp_path / "in.pdf"), [image_stream(noisy_image())])
+    output_path = str(tmp_path / "out.pdf")
+    assert compress.recompress_pdf_images(input_path, output_path, recompress_options()) == 1
+
+    (_, width, height, colorspace, image_filter), = output_images(output_path)
+    # 288DPI缩小到72DPI
+    assert (width, height) == (300, 225)
+    assert (colorspace, image_filter) == ("/DeviceRGB", "/DCTDecode")
+    assert os.path.getsize(output_path) < os.path.getsize(input_path) / 4
+    with fitz.Document(output_path) as doc:
+        page = doc[0]
+        assert "hello" in page.get_text()
+        assert page.get_drawings()
+        # 图像仍显示在原来的位置
+        assert page.get_image_rects(page.get_images()[0][0])[0] == fitz.Rect(72, 100, 372, 325)
+
+
+def test_recompress_keeps_images_below_target_dpi(tmp_path):
+    input_path = write_image_pdf(str(tmp_path / "in.pdf"), [image_stream(noisy_image())])
+    output_path = str(tmp_path / "out.pdf")
+    assert compress.recompress_pdf_images(input_path, output_path, recompress_options(image_dpi=300)) == 0
+    (_, width, _, _, image_filter), = output_images(output_path)
+    assert width == 1200 and image_filter == "/FlateDecode"
+
+
+def test_recompress_converts_cmyk_to_rgb(tmp_path):
+    cmyk = image_stream(noisy_image("CMYK", color=(20, 200, 200, 10)), format="JPEG")
+    input_path = write_image_pdf(str(tmp_path / "in.pdf"), [cmyk])
+    with fitz.Document(input_path) as doc:
+        assert doc.extract_image(doc[0].get_images()[0][0])["colorspace"] == 4
+
+    output_path = str(tmp_path / "out.pdf")
+    assert compress.recompress_pdf_images(input_path, output_path, recompress_options()) == 1
+    (_, width, _, colorspace, _), = output_images(output_path)
+    assert (width, colorspace) == (300, "/DeviceRGB")
+
+
+def duplicate_image_pdf(tmp_path, stream, pages=2):
+    """每页各有一个图像对象，原始数据流完全相同"""
+    combined = fitz.open()
+    for index in range(pages):
+        single = write_image_pdf(str(tmp_path / f"single{index}.pdf"), [stream])
+        with fitz.open(single) as doc:
+            combined.insert_pdf(doc)
+    path = str(tmp_path / "in.pdf")
+    combined.save(path)
+    combined.close()
+    with fitz.Document(path) as doc:
+        xrefs = [page.get_images()[0][0] for page in doc]
+        assert len(set(xrefs)) == pages
+        assert len({doc.xref_stream_raw(xref) for xref in xrefs}) == 1
+    return path, xrefs
+
+
+def test_recompress_encodes_duplicate_images_once(tmp_path, monkeypatch):
+    input_path, _ = duplicate_image_pdf(tmp_path, image_stream(noisy_image()), pages=3)
+    calls = []
+    real_encode = compress.encode_downsampled_image
+
+    def counting_encode(*args, **kwargs):
+        calls.append(args[1])
+        return real_encode(*args, **kwargs)
+
+    monkeypatch.setattr(compress, "encode_downsampled_image", counting_encode)
+    output_path = str(tmp_path / "out.pdf")
+    assert compress.recompress_pdf_images(input_path, output_path, recompress_options()) == 3
+    assert len(calls) == 1
+    # 保存时合并内容相同的图像对象
+    assert len({image[0] for image in output_images(output_path)}) == 1
+
+
+def test_recompress_separates_images_with_different_decode(tmp_path):
+    input_path, xrefs = duplicate_image_pdf(tmp_path, image_stream(noisy_image()))
+    # 第二个图像的原始数据相同，但解码时反相
+    with fitz.Document(input_path) as doc:
+        doc.xref_set_key(xrefs[1], "Decode", "[1 0 1 0 1 0]")
+        doc.save(str(tmp_path / "inverted.pdf"))
+
+    output_path = str(tmp_path / "out.pdf")
+    assert compress.recompress_pdf_images(str(tmp_path / "inverted.pdf"), output_path, recompress_options()) == 2
+    with fitz.Document(output_path) as doc:
+        means = []
+        for page in doc:
+            pix = fitz.Pixmap(doc, page.get_images()[0][0])
+            means.append(ImageStat.Stat(pixmap_to_image(pix)).mean[0])
+    assert means[0] > 150 and means[1] < 100
+
+
+def batch_inputs(make_pdf):
+    """三个大小不同的输入文件，按列表顺序从小到大"""
+    return [make_pdf("small.pdf", pages=1),
+            make_pdf("medium.pdf", pages=4, with_image=True),
+            make_pdf("large.pdf", pages=10, with_image=True)]
+
+
+def test_batch_submits_largest_first(make_pdf, tmp_path, serial_executor):
+    inputs = batch_inputs(make_pdf)
+    submitted = serial_executor(compress)
+    options = apply_compression_level(CompressOptions())
+
+    compress.compress_batch(inputs, options, str(tmp_path), workers=2)
+    assert submitted == inputs[::-1]
+
+    # 已知的大小优先于重新读取
+    submitted.clear()
+    hints = {inputs[0]: 10 ** 9}
+    compress.compress_batch(inputs, options, str(tmp_path), workers=2, size_hints=hints)
+    assert submitted == [inputs[0], inputs[2], inputs[1]]
+
+
+def test_batch_summary_totals(make_pdf, tmp_path):
+    inputs = batch_inputs(make_pdf)
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    results = []
+
+    summary = compress.compress_batch(inputs + [str(broken)], apply_compression_level(CompressOptions()),
+                                      str(output_dir), workers=2,
+                                      result_callback=lambda result, done, total: results.append(result))
+
+    assert (summary.total_files, summary.success_count) == (4, 3)
+    assert summary.total_size_before == sum(os.path.getsize(path) for path in inputs)
+    assert summary.total_size_after == sum(os.path.getsize(result.output_path)
+                                           for result in results if result.error is None)
+    assert [result.pdf_path for result in results if result.error] == [str(broken)]
+    assert sorted(os.listdir(output_dir)) == ["large_compressed.pdf", "medium_compressed.pdf",
+                                              "small_compressed.pdf"]
+
+
+def test_batch_replaces_originals(make_pdf, tmp_path):
+    inputs = batch_inputs(make_pdf)
+    sizes_before = [os.path.getsize(path) for path in inputs]
+    summary = compress.compress_batch(inputs, apply_compression_level(CompressOptions(level="最高")), workers=2)
+
+    assert summary.success_count == 3
+    assert summary.total_size_before == sum(sizes_before)
+    assert summary.total_size_after == sum(os.path.getsize(path) for path in inputs)
+    assert os.path.getsize(inputs[2]) < sizes_before[2]
+    for path, pages in zip(inputs, (1, 4, 10)):
+        with fitz.Document(path) as doc:
+            assert len(doc) == pages
+    # 不留下临时文件和备份文件
+    assert sorted(os.listdir(tmp_path)) == ["large.pdf", "medium.pdf", "small.pdf"]
+
+
+def test_failed_replace_keeps_original(make_pdf, tmp_path, monkeypatch):
+    input_path = make_pdf("doc.pdf", pages=3, with_image=True)
+    with open(input_path, "rb") as f:
+        original = f.read()
+
+    real_rename = os.rename
+
+    def failing_rename(source, dest):
+        # 压缩结果改名为原文件时失败，恢复备份时正常
+        if source.endswith(".temp.pdf"):
+            raise OSError("文件被占用")
+        return real_rename(source, dest)
+
+    monkeypatch.setattr(os, "rename", failing_rename)
+    result = compress.compress_job(input_path, compress.compressed_output_path(input_path),
+                                   apply_compression_level(CompressOptions()), replace=True)
+
+    assert "文件被占用" in result.error
+    with open(input_path, "rb") as f:
+        assert f.read() == original
+    assert os.listdir(tmp_path) == ["doc.pdf"]
+
+
+def test_replace_from_cache_keeps_cache_entry(make_pdf, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    options = apply_compression_level(CompressOptions())
+    source = make_pdf("source.pdf", pages=3, with_image=True)
+    copies = []
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        copies.append(str(tmp_path / name))
+        shutil.copyfile(source, copies[-1])
+
+    compress.compress_batch([copies[0]], options, workers=1, cache=cache)
+    with open(copies[0], "rb") as f:
+        compressed = f.read()
+    assert compress.compress_batch([copies[1]], options, workers=1, cache=cache).cache_hits == 1
+
+    # 命中缓存替换的原文件之后被原地改写，不能影响缓存条目
+    with open(copies[1], "r+b") as f:
+        f.truncate(0)
+        f.write(b"edited")
+    assert compress.compress_batch([copies[2]], options, workers=1, cache=cache).cache_hits == 1
+    with open(copies[2], "rb") as f:
+        assert f.read() == compressed
@@ -0,0 +1,114 @@
+"""单文件输出（多页TIFF、ZIP/TAR）的测试"""
+import os
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image, ImageSequence
+
+from core.containers import PageContainer, TiffPageContainer, open_page_container
+from core.options import RenderOptions
+from core.render import convert_pdf_to_images
+
+# 页码对应的灰度值，用来从多页TIFF中认出每一页
+SHADES = {0: 10, 1: 60, 2: 110, 3: 160, 4: 210}
+
+
+def page_file(tmp_path, page_num, mode="L"):
+    path = str(tmp_path / f"page_{page_num}.tiff")
+    Image.new(mode, (32, 24), SHADES[page_num] if mode == "L" else 1).save(path)
+    return path
+
+
+def frame_shades(path):
+    with Image.open(path) as img:
+        return [frame.getpixel((0, 0)) for frame in ImageSequence.Iterator(img)]
+
+
+def test_tiff_pages_written_in_page_order(tmp_path):
+    output = str(tmp_path / "out.tiff")
+    container = TiffPageContainer(output, [0, 1, 2, 3, 4], dpi=150)
+    files = {page_num: page_file(tmp_path, page_num) for page_num in (0, 1, 3, 4)}
+
+    # 渲染进程乱序完成，页码2渲染失败
+    container.add(3, files[3], None)
+    container.add(1, files[1], None)
+    assert container.written == 0
+    container.skip(2)
+    container.add(0, files[0], None)
+    assert container.written == 3
+    container.add(4, files[4], None)
+    container.close()
+
+    assert container.written == 4
+    assert container.failures == []
+    assert frame_shades(output) == [SHADES[0], SHADES[1], SHADES[3], SHADES[4]]
+    assert not any(os.path.exists(path) for path in files.values())
+    with Image.open(output) as img:
+        assert img.info["dpi"] == pytest.approx((150, 150))
+
+
+def test_tiff_unfinished_pages_reported_on_close(tmp_path):
+    output = str(tmp_path / "out.tiff")
+    container = TiffPageContainer(output, [0, 1, 2])
+    files = {page_num: page_file(tmp_path, page_num) for page_num in (0, 2)}
+    container.add(0, files[0], None)
+    # 页码1一直没有完成，页码2无法按顺序写入
+    container.add(2, files[2], None)
+    container.close()
+
+    assert container.written == 1
+    assert container.failures == [(2, "之前的页面未完成，无法按顺序写入")]
+    assert not os.path.exists(files[2])
+    assert frame_shades(output) == [SHADES[0]]
+
+
+def test_tiff_mono_pages_use_group4(tmp_path):
+    output = str(tmp_path / "out.tiff")
+    container = TiffPageContainer(output, [0])
+    container.add(0, page_file(tmp_path, 0, mode="1"), None)
+    container.close()
+    with Image.open(output) as img:
+        assert img.mode == "1"
+        assert img.info["compression"] == "group4"
+
+
+def test_unknown_container_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_page_container("rar", str(tmp_path / "out.rar"), [0])
+
+
+@pytest.mark.parametrize("container", ["zip", "tar"])
+def test_render_to_archive(make_pdf, tmp_path, container):
+    pdf_path = make_pdf("doc.pdf", pages=3)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    options = RenderOptions(output_format="png", dpi=36, container=container)
+
+    assert convert_pdf_to_images(pdf_path, str(output_dir), options) == 3
+    # 只生成一个输出文件
+    assert os.listdir(output_dir) == [f"doc.{container}"]
+    archive_path = str(output_dir / f"doc.{container}")
+    if container == "zip":
+        with zipfile.ZipFile(archive_path) as archive:
+            names = archive.namelist()
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    else:
+        with tarfile.open(archive_path) as archive:
+            names = archive.getnames()
+    assert sorted(names) == ["doc_1.png", "doc_2.png", "doc_3.png"]
+
+
+def test_render_to_multipage_tiff(make_pdf, tmp_path):
+    pdf_path = make_pdf("doc.pdf", pages=3)
+    options = RenderOptions(output_format="png", dpi=36, container="tiff", page_range="3,1")
+
+    assert convert_pdf_to_images(pdf_path, str(tmp_path), options) == 2
+    with Image.open(tmp_path / "doc.tiff") as img:
+        assert img.n_frames == 2
+        assert img.size == (298, 421)
+
+
+def test_page_container_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        PageContainer(str(tmp_path / "out"))
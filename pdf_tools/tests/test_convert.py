@@ -0,0 +1,178 @@
+"""图片格式转换的测试"""
+import os
+
+import pytest
+from PIL import Image, ImageChops, ImageStat, JpegImagePlugin
+
+from core import convert
+from core.cache import ResultCache
+from core.convert import convert_batch, convert_image, fast_downscale
+from core.options import ConvertOptions
+
+
+def collect_results(results):
+    def on_result(result, processed, total):
+        results.append((result, processed, total))
+    return on_result
+
+
+def test_batch_converts_in_worker_processes(make_image, tmp_path):
+    (tmp_path / "sub").mkdir()
+    inputs = [make_image(f"img{i}.png", 64 + i, 48) for i in range(6)]
+    # 不同目录中的同名文件得到不同的输出文件
+    inputs.append(make_image(os.path.join("sub", "img0.png"), 32, 32))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    results = []
+
+    summary = convert_batch(inputs, str(output_dir), ConvertOptions(output_format="webp"), workers=3,
+                            result_callback=collect_results(results))
+
+    assert (summary.total_files, summary.success_count, summary.skipped_count) == (7, 7, 0)
+    assert [processed for _, processed, _ in results] == list(range(1, 8))
+    outputs = {result.file_path: result.output_path for result, _, _ in results}
+    assert len(set(outputs.values())) == 7
+    assert sorted(os.listdir(output_dir)) == sorted([f"img{i}.webp" for i in range(6)] + ["img0_1.webp"])
+    for file_path, output_path in outputs.items():
+        with Image.open(file_path) as source, Image.open(output_path) as output:
+            assert output.format == "WEBP" and output.size == source.size
+
+
+def test_batch_skips_filtered_and_reports_errors(make_image, tmp_path):
+    inputs = [make_image("a.jpg"), make_image("b.png"), make_image("c.jpeg")]
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    results = []
+
+    summary = convert_batch(inputs + [str(broken)], str(output_dir),
+                            ConvertOptions(output_format="png", input_format="jpg"), workers=2,
+                            result_callback=collect_results(results))
+
+    assert (summary.total_files, summary.success_count, summary.skipped_count) == (4, 2, 1)
+    by_name = {os.path.basename(result.file_path): result for result, _, _ in results}
+    assert by_name["b.png"].skipped and by_name["b.png"].output_path is None
+    assert by_name["broken.jpg"].error.startswith("转换失败 broken.jpg")
+    assert sorted(os.listdir(output_dir)) == ["a.png", "c.png"]
+
+
+def test_batch_submits_largest_first(make_image, tmp_path, serial_executor):
+    inputs = [make_image("small.bmp", 10, 10), make_image("large.bmp", 300, 300), make_image("medium.bmp", 100, 100)]
+    submitted = serial_executor(convert)
+
+    convert_batch(inputs, str(tmp_path), ConvertOptions(output_format="png"), workers=2)
+    assert submitted == [inputs[1], inputs[2], inputs[0]]
+
+    submitted.clear()
+    convert_batch(inputs, str(tmp_path), ConvertOptions(output_format="png"), workers=2,
+                  size_hints={inputs[0]: 10 ** 9})
+    assert submitted == [inputs[0], inputs[1], inputs[2]]
+
+
+def test_batch_cache_hits_across_processes(make_image, tmp_path):
+    inputs = [make_image(f"img{i}.png", 40, 40, color=(i * 40, 0, 0)) for i in range(4)]
+    cache = ResultCache(str(tmp_path / "cache"))
+    options = ConvertOptions(output_format="jpg")
+    for run in ("first", "second"):
+        output_dir = tmp_path / run
+        output_dir.mkdir()
+        summary = convert_batch(inputs, str(output_dir), options, workers=2, cache=cache)
+        assert summary.success_count == 4
+    assert (summary.cache_hits, summary.cache_misses) == (4, 0)
+    assert sorted(os.listdir(tmp_path / "second")) == [f"img{i}.jpg" for i in range(4)]
+
+
+def test_rgba_to_jpeg_uses_white_background(make_image, tmp_path):
+    source = make_image("overlay.png", 20, 20, color=(0, 0, 255, 0), mode="RGBA")
+    summary = convert_batch([source], str(tmp_path), ConvertOptions(output_format="jpg"), workers=1)
+    assert summary.success_count == 1
+    with Image.open(tmp_path / "overlay.jpg") as img:
+        assert img.mode == "RGB"
+        assert all(value > 245 for value in img.getpixel((10, 10)))
+
+
+def photo_like(path, size=(2400, 1800)):
+    """有渐变和细节的JPEG，用来比较两种缩放方式的画质"""
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 30)
+    img = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    img.save(path, format="JPEG", quality=92)
+    return str(path)
+
+
+@pytest.fixture
+def resize_spy(monkeypatch):
+    """记录 JPEG draft 请求的尺寸和 reduce 的倍数"""
+    calls = {"draft": [], "reduce": []}
+    real_draft = JpegImagePlugin.JpegImageFile.draft
+    real_reduce = Image.Image.reduce
+
+    def spy_draft(img, mode, size):
+        calls["draft"].append(size)
+        return real_draft(img, mode, size)
+
+    def spy_reduce(img, factor, *args, **kwargs):
+        calls["reduce"].append(factor)
+        return real_reduce(img, factor, *args, **kwargs)
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", spy_draft)
+    monkeypatch.setattr(Image.Image, "reduce", spy_reduce)
+    return calls
+
+
+def test_fast_downscale_reduces_before_resampling(resize_spy):
+    img = Image.new("RGB", (4000, 3000), (10, 20, 30))
+    assert fast_downscale(img, (100, 75)).size == (100, 75)
+    # 整数倍缩小后保留至少 REDUCE_GAP 倍的目标尺寸
+    assert resize_spy["reduce"] == [20]
+
+    resize_spy["reduce"].clear()
+    assert fast_downscale(img, (1500, 1125)).size == (1500, 1125)
+    assert resize_spy["reduce"] == []
+
+
+def test_fast_resize_decodes_jpeg_at_reduced_scale(tmp_path, resize_spy):
+    source = photo_like(tmp_path / "photo.jpg")
+    options = ConvertOptions(output_format="png", width=300, fast_resize=True)
+    output_path = convert_image(source, str(tmp_path), options)
+
+    with Image.open(output_path) as img:
+        assert img.size == (300, 225)
+    assert resize_spy["draft"] == [(600, 450)]
+
+
+def test_fast_resize_quality_close_to_lanczos(tmp_path):
+    source = photo_like(tmp_path / "photo.jpg")
+    outputs = []
+    for fast in (False, True):
+        output_dir = tmp_path / ("fast" if fast else "normal")
+        output_dir.mkdir()
+        options = ConvertOptions(output_format="png", width=400, height=400, fast_resize=fast)
+        outputs.append(convert_image(source, str(output_dir), options))
+
+    with Image.open(outputs[0]) as normal, Image.open(outputs[1]) as fast:
+        assert normal.size == fast.size == (400, 300)
+        difference = ImageStat.Stat(ImageChops.difference(normal, fast)).mean
+    assert max(difference) < 4
+
+
+def test_fast_resize_png_uses_reduce_only(make_image, tmp_path, resize_spy):
+    source = make_image("large.png", 1600, 800)
+    options = ConvertOptions(output_format="png", height=100, fast_resize=True)
+    (tmp_path / "out").mkdir()
+    with Image.open(convert_image(source, str(tmp_path / "out"), options)) as img:
+        assert img.size == (200, 100)
+    assert resize_spy["draft"] == []
+    assert resize_spy["reduce"] == [4]
+
+
+def test_fast_and_normal_resize_cached_separately(tmp_path):
+    source = photo_like(tmp_path / "photo.jpg", size=(800, 600))
+    cache = ResultCache(str(tmp_path / "cache"))
+    for index, fast in enumerate((False, True, False)):
+        output_dir = tmp_path / f"out{index}"
+        output_dir.mkdir()
+        convert_image(source, str(output_dir), ConvertOptions(output_format="png", width=100, fast_resize=fast),
+                      cache)
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,55 @@
+"""共用文件列表的测试"""
+import pytest
+
+from core.filelist import FileSet
+from core.scanner import ScanEntry
+
+
+def test_add_skips_duplicates_and_keeps_order():
+    files = FileSet(["a.pdf", "b.pdf"])
+    assert files.extend(["c.pdf", "a.pdf", "./b.pdf", "d.pdf"]) == ["c.pdf", "d.pdf"]
+    assert list(files) == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    assert "c.pdf" in files and "x.pdf" not in files
+
+
+def test_remove_indices_and_positions():
+    files = FileSet([f"{i}.pdf" for i in range(10)])
+    assert files.remove_indices([7, 1, 3, 1]) == ["1.pdf", "3.pdf", "7.pdf"]
+    assert len(files) == 7
+    assert "3.pdf" not in files
+    # 删除后的按位置访问、查找位置和交换都基于压缩后的位置
+    assert files[1] == "2.pdf"
+    assert files.index("8.pdf") == 5
+    files.swap(0, 6)
+    assert list(files) == ["9.pdf", "2.pdf", "4.pdf", "5.pdf", "6.pdf", "8.pdf", "0.pdf"]
+    assert files.index("0.pdf") == 6
+
+
+def test_remove_by_path_is_constant_time():
+    files = FileSet([f"{i}.pdf" for i in range(1000)])
+    for i in range(0, 400):
+        files.remove(f"{i}.pdf")
+    # 空位没有超过一半，删除时不重排列表
+    assert files._removed == 400
+    assert len(files) == 600
+    assert files[0] == "400.pdf"
+    assert files._removed == 0
+    with pytest.raises(ValueError):
+        files.remove("0.pdf")
+
+
+def test_removed_file_can_be_added_again():
+    files = FileSet(["a.pdf", "b.pdf"])
+    files.remove("a.pdf")
+    assert files.add("a.pdf")
+    assert list(files) == ["b.pdf", "a.pdf"]
+
+
+def test_hints_follow_files():
+    files = FileSet(["a.pdf", "b.pdf"])
+    files.set_hints([ScanEntry("a.pdf", size=10), ScanEntry("b.pdf", size=20)])
+    files.remove("a.pdf")
+    assert files.size_hints() == {"b.pdf": 20}
+    assert files.hint("a.pdf") is None
+    files.clear()
+    assert len(files) == 0 and files.size_hints() == {}
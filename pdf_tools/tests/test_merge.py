@@ -0,0 +1,392 @@
+"""PDF和图片合并的测试"""
+import os
+import resource
+import subprocess
+import sys
+import threading
+
+import fitz
+import pytest
+from PIL import Image
+
+from core import merge
+from core.merge import DocumentRegistry, merge_files
+from core.options import MergeOptions
+
+PDF_TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fitz_open_counter(monkeypatch):
+    """记录 fitz.open 打开的文件路径"""
+    opened = []
+    real_open = fitz.open
+
+    def counting_open(*args, **kwargs):
+        if args and isinstance(args[0], str):
+            opened.append(args[0])
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(fitz, "open", counting_open)
+    return opened
+
+
+def test_registry_opens_lazily_and_bounds_open_handles(make_pdf, make_image, fitz_open_counter):
+    paths = [make_pdf(f"d{i}.pdf", pages=i % 3 + 1) for i in range(12)]
+    paths.insert(5, make_image("photo.png"))
+    registry = DocumentRegistry(paths, max_open=3)
+    try:
+        # 登记时不打开任何文件，尚未打开的PDF按一页计算
+        assert fitz_open_counter == []
+        assert registry.total_pages == len(paths)
+        for path in paths:
+            if path.endswith(".pdf"):
+                assert len(registry.document(path)) > 0
+                assert registry.open_count <= 3
+                registry.release(path)
+        assert registry.open_count == 0
+        assert registry.total_pages == sum(i % 3 + 1 for i in range(12)) + 1
+        assert sorted(fitz_open_counter) == sorted(path for path in paths if path.endswith(".pdf"))
+    finally:
+        registry.close()
+
+
+def test_registry_counts_repeated_files(make_pdf):
+    path = make_pdf("d.pdf", pages=3)
+    registry = DocumentRegistry([path, path], max_open=1)
+    try:
+        assert registry.document(path) is registry.document(path)
+        assert registry.total_pages == 6
+        registry.release(path)
+        assert registry.open_count == 1
+        registry.release(path)
+        assert registry.open_count == 0
+    finally:
+        registry.close()
+
+
+def test_registry_reports_invalid_pdf(make_pdf, tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf at all")
+    warnings = []
+    registry = DocumentRegistry([make_pdf("ok.pdf"), str(broken)], warnings.append)
+    with pytest.raises(Exception, match="不是有效的PDF文件"):
+        registry.document(str(broken))
+    assert warnings
+    registry.close()
+
+
+def test_registry_passes_through_os_errors(tmp_path):
+    missing = str(tmp_path / "missing.pdf")
+    with pytest.raises(Exception) as info:
+        DocumentRegistry([missing]).document(missing)
+    # 文件无法读取时报告实际原因，而不是"不是有效的PDF文件"
+    assert "不是有效的PDF文件" not in str(info.value)
+    assert "No such file" in str(info.value)
+
+
+@pytest.mark.parametrize("options", [
+    MergeOptions(layout_mode="自动调整"),
+    MergeOptions(layout_mode="手动调整"),
+    MergeOptions(layout_mode="原样", force_a4=True),
+    MergeOptions(layout_mode="原样", force_a4=True, streaming=True),
+])
+def test_merge_opens_each_input_once(make_pdf, tmp_path, fitz_open_counter, options):
+    paths = [make_pdf(f"d{i}.pdf", pages=2) for i in range(40)]
+    output = str(tmp_path / "out.pdf")
+    merge_files(paths, output, options)
+    # 输入文件数超过 MAX_OPEN_DOCUMENTS 时每个文件也只打开一次
+    assert sorted(path for path in fitz_open_counter if path in paths) == sorted(paths)
+    with fitz.open(output) as doc:
+        assert len(doc) == 80
+
+
+@pytest.mark.parametrize("options", [
+    MergeOptions(layout_mode="自动调整"),
+    MergeOptions(layout_mode="原样", force_a4=True),
+])
+def test_merge_aborts_on_invalid_pdf(make_pdf, tmp_path, options):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf at all")
+    output = tmp_path / "out.pdf"
+    with pytest.raises(Exception, match="不是有效的PDF文件"):
+        merge_files([make_pdf("ok.pdf"), str(broken)], str(output), options)
+    assert not output.exists()
+
+
+@pytest.mark.parametrize("options", [
+    MergeOptions(layout_mode="自动调整"),
+    MergeOptions(layout_mode="自动调整", streaming=True),
+    MergeOptions(layout_mode="原样", force_a4=True, streaming=True),
+])
+def test_merge_many_files(make_pdf, tmp_path, options):
+    paths = [make_pdf(f"d{i}.pdf", pages=2) for i in range(40)]
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files(paths, output_path, options)
+    with fitz.Document(output_path) as doc:
+        assert len(doc) == 80
+
+
+def test_streaming_merge_under_low_file_limit(make_pdf, tmp_path):
+    """文件句柄上限远小于输入文件数时，流式合并仍能完成"""
+    paths = [make_pdf(f"t{i}.pdf") for i in range(150)]
+    output_path = str(tmp_path / "merged.pdf")
+
+    def limit_files():
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+
+    result = subprocess.run(
+        [sys.executable, "pdftools.py", "merge", "--mode", "auto", "--streaming", "-o", output_path] + paths,
+        cwd=PDF_TOOLS_DIR, preexec_fn=limit_files, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    with fitz.Document(output_path) as doc:
+        assert len(doc) == 150
+
+
+@pytest.mark.parametrize("options", [
+    MergeOptions(streaming=True),
+    MergeOptions(force_a4=True, streaming=True),
+    MergeOptions(layout_mode="自动调整", streaming=True),
+])
+def test_streaming_merge_copies_shared_resources_once(make_pdf, tmp_path, options):
+    # 源文件的页面超过一批，所有页面共用同一张图片
+    source = make_pdf("big.pdf", pages=merge.STREAM_FLUSH_PAGES * 2 + 10, with_image=True)
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files([source, make_pdf("small.pdf", pages=3)], output_path, options)
+    with fitz.Document(output_path) as doc:
+        assert len(doc) == merge.STREAM_FLUSH_PAGES * 2 + 13
+        image_xrefs = {image[0] for page in doc for image in page.get_images(full=True)}
+    assert len(image_xrefs) == 1
+
+
+def test_streaming_original_merge_matches_non_streaming(make_image, tmp_path):
+    photo = make_image("photo.jpg", 600, 400)
+    overlay = make_image("overlay.png", 300, 200, color=(0, 0, 255, 128), mode="RGBA")
+    pages = {}
+    for streaming in (False, True):
+        output_path = str(tmp_path / f"merged_{streaming}.pdf")
+        merge_files([photo, overlay], output_path, MergeOptions(streaming=streaming))
+        with fitz.Document(output_path) as doc:
+            pages[streaming] = [(round(page.rect.width, 2), round(page.rect.height, 2)) for page in doc]
+            # 透明图片合成到白色背景上，不带软蒙版
+            assert all(image[1] == 0 for image in doc[1].get_images(full=True))
+        # 基线JPEG原样嵌入
+        with open(photo, "rb") as f:
+            assert embedded_images(output_path)[0][3] == f.read()
+    assert pages[True] == pages[False]
+
+
+def embedded_images(output_path):
+    """输出文件每页第一张图片的 (扩展名, 宽, 高, 原始数据)"""
+    images = []
+    with fitz.Document(output_path) as doc:
+        for page in doc:
+            xref = page.get_images(full=True)[0][0]
+            info = doc.extract_image(xref)
+            images.append((info["ext"], info["width"], info["height"], info["image"]))
+    return images
+
+
+def test_a4_merge_embeds_small_jpeg_unchanged(make_image, tmp_path, monkeypatch):
+    real_save = fitz.Document.save
+
+    def checked_save(doc, path, *args, **kwargs):
+        assert ".temp_img" not in str(path), "合并图片时不应写临时PDF文件"
+        return real_save(doc, path, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Document, "save", checked_save)
+
+    photo = make_image("photo.jpg", 600, 400)
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files([photo], output_path, MergeOptions(force_a4=True))
+
+    ext, width, height, data = embedded_images(output_path)[0]
+    assert (ext, width, height) == ("jpeg", 600, 400)
+    with open(photo, "rb") as f:
+        assert data == f.read()
+
+
+def test_a4_merge_downscales_only_oversized_images(make_image, tmp_path):
+    # A4页面上超过 MAX_IMAGE_DPI 的图片才缩小
+    large = make_image("large.jpg", 6000, 4000)
+    small_png = make_image("small.png", 300, 200)
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files([large, small_png], output_path, MergeOptions(force_a4=True, page_orientation="混合"))
+
+    (large_ext, large_width, _, _), (_, small_width, small_height, _) = embedded_images(output_path)
+    assert large_ext == "jpeg"
+    assert large_width < 6000
+    # 横向A4去掉边距后约 801×535 点，300DPI下不超过约3340像素宽
+    assert large_width <= round((841.89 - 40) / 72 * merge.MAX_IMAGE_DPI) + 1
+    assert (small_width, small_height) == (300, 200)
+
+
+@pytest.fixture
+def fitz_thread_recorder(monkeypatch):
+    """记录调用 fitz.open 的线程"""
+    threads = set()
+    real_open = fitz.open
+
+    def recording_open(*args, **kwargs):
+        threads.add(threading.current_thread())
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(fitz, "open", recording_open)
+    return threads
+
+
+@pytest.mark.parametrize("options", [
+    MergeOptions(workers=4),
+    MergeOptions(force_a4=True, workers=4),
+])
+def test_image_preparation_threads_do_not_use_fitz(make_image, make_pdf, tmp_path, fitz_thread_recorder,
+                                                   options):
+    paths = [make_image(f"p{i}.jpg", 300, 200) for i in range(6)]
+    paths += [make_image(f"p{i}.png", 300, 200, mode="RGBA") for i in range(6)]
+    paths.append(make_pdf("doc.pdf", pages=2))
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files(paths, output_path, options)
+
+    with fitz.Document(output_path) as doc:
+        assert len(doc) == 14
+    assert fitz_thread_recorder == {threading.main_thread()}
+
+
+def test_original_merge_closes_image_files(make_image, tmp_path, monkeypatch):
+    opened = []
+    real_open = Image.open
+
+    def tracking_open(*args, **kwargs):
+        img = real_open(*args, **kwargs)
+        opened.append(img)
+        return img
+
+    monkeypatch.setattr(Image, "open", tracking_open)
+
+    paths = [make_image(f"p{i}.png", 40, 30, mode="RGBA") for i in range(10)]
+    paths += [make_image(f"p{i}.jpg", 40, 30) for i in range(10)]
+    merge_files(paths, str(tmp_path / "merged.pdf"), MergeOptions(workers=4))
+    assert len(opened) == 20
+    # 文件句柄都已释放
+    assert all(getattr(img, "fp", None) is None for img in opened)
+
+
+def save_jpeg(path, mode="RGB", **save_options):
+    color = {"RGB": (200, 30, 30), "L": 90, "CMYK": (0, 200, 200, 20)}[mode]
+    Image.new(mode, (320, 240), color).save(path, format="JPEG", **save_options)
+    return str(path)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L"])
+def test_original_merge_embeds_baseline_jpeg_stream(tmp_path, mode):
+    photo = save_jpeg(tmp_path / "photo.jpg", mode, dpi=(300, 300))
+    assert merge.prepare_original_image(photo)[0] == "jpeg"
+
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files([photo], output_path, MergeOptions())
+    with fitz.Document(output_path) as doc:
+        xref = doc[0].get_images(full=True)[0][0]
+        assert doc.xref_get_key(xref, "Filter")[1] == "/DCTDecode"
+        with open(photo, "rb") as f:
+            assert doc.xref_stream_raw(xref) == f.read()
+        # 页面尺寸按300DPI换算
+        assert doc[0].rect.width == pytest.approx(320 * 72 / 300)
+
+
+@pytest.mark.parametrize("mode, save_options", [
+    ("RGB", {"progressive": True}),
+    ("CMYK", {}),
+])
+def test_original_merge_reencodes_other_jpegs(tmp_path, mode, save_options):
+    photo = save_jpeg(tmp_path / "photo.jpg", mode, **save_options)
+    assert merge.prepare_original_image(photo)[0] == "pdf"
+
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files([photo], output_path, MergeOptions())
+    with fitz.Document(output_path) as doc:
+        xref = doc[0].get_images(full=True)[0][0]
+        with open(photo, "rb") as f:
+            assert doc.xref_stream_raw(xref) != f.read()
+        # PIL转换时统一为RGB
+        assert doc.extract_image(xref)["colorspace"] == 3
+
+
+def framed_pdf(path, width, height):
+    """每页画一个与页面同样大小的边框，并写一行文字"""
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.draw_rect(page.rect, color=(0, 0, 0), width=0)
+    page.insert_text((20, 40), "vector text")
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def frame_rect(page):
+    """输出页面上边框的位置"""
+    rects = [drawing["rect"] for drawing in page.get_drawings()]
+    assert len(rects) == 1
+    return rects[0]
+
+
+def assert_rect(actual, expected):
+    assert tuple(actual) == pytest.approx(tuple(expected), abs=0.05)
+
+
+@pytest.mark.parametrize("options", [
+    MergeOptions(layout_mode="自动调整"),
+    MergeOptions(layout_mode="自动调整", streaming=True),
+])
+def test_auto_placement_keeps_pages_vector(tmp_path, make_image, options):
+    sources = [framed_pdf(tmp_path / "portrait.pdf", 300, 500), framed_pdf(tmp_path / "landscape.pdf", 700, 400)]
+    photo = make_image("photo.png", 600, 300)
+    output_path = str(tmp_path / "merged.pdf")
+    merge_files(sources + [photo], output_path, options)
+
+    with fitz.Document(output_path) as doc:
+        for page, (width, height) in zip(doc, [(300, 500), (700, 400)]):
+            # 页面保持原尺寸，内容不被栅格化
+            assert (page.rect.width, page.rect.height) == (width, height)
+            assert page.get_images() == []
+            assert "vector text" in page.get_text()
+            assert_rect(frame_rect(page), (0, 0, width, height))
+        # 图片按300DPI换算页面尺寸
+        image_page = doc[2]
+        assert (image_page.rect.width, image_page.rect.height) == pytest.approx((144, 72))
+        assert_rect(image_page.get_image_rects(image_page.get_images()[0][0])[0], (0, 0, 144, 72))
+
+
+def test_manual_placement_fits_content_in_margins(tmp_path, make_image):
+    sources = [framed_pdf(tmp_path / "landscape.pdf", 842, 595), framed_pdf(tmp_path / "small.pdf", 200, 100)]
+    photo = make_image("photo.png", 300, 600)
+    output_path = str(tmp_path / "merged.pdf")
+    options = MergeOptions(layout_mode="手动调整", page_size="A4", page_orientation="纵向", margin_mm=10)
+    merge_files(sources + [photo], output_path, options)
+
+    page_width, page_height = merge.MANUAL_PAGE_SIZES["A4"]
+    margin = 10 * 72 / 25.4
+    content = fitz.Rect(margin, margin, page_width - margin, page_height - margin)
+
+    def fitted(width, height):
+        scale = min(content.width / width, content.height / height)
+        x0 = content.x0 + (content.width - width * scale) / 2
+        y0 = content.y0 + (content.height - height * scale) / 2
+        return (x0, y0, x0 + width * scale, y0 + height * scale)
+
+    with fitz.Document(output_path) as doc:
+        assert len(doc) == 3
+        for page in doc:
+            assert_rect(page.rect, (0, 0, page_width, page_height))
+        for page, size in zip(doc, [(842, 595), (200, 100)]):
+            assert page.get_images() == []
+            assert "vector text" in page.get_text()
+            # 内容在页边距内等比缩放并居中，小页面也放大到可用区域
+            assert_rect(frame_rect(page), fitted(*size))
+        image_page = doc[2]
+        assert_rect(image_page.get_image_rects(image_page.get_images()[0][0])[0], fitted(300, 600))
+
+
+def test_manual_placement_rejects_oversized_margins(tmp_path, make_pdf):
+    with pytest.raises(ValueError):
+        merge_files([make_pdf("a.pdf")], str(tmp_path / "merged.pdf"),
+                    MergeOptions(layout_mode="手动调整", margin_mm=200))
@@ -0,0 +1,80 @@
+"""有序并行流水线的测试"""
+import random
+import threading
+import time
+
+from core.pipeline import ordered_map
+
+
+def test_results_in_input_order():
+    def slow_square(n):
+        # 打乱完成顺序
+        time.sleep(random.random() * 0.01)
+        return n * n
+
+    results = list(ordered_map(slow_square, range(50), workers=8, window=8))
+    assert [item for item, _, _ in results] == list(range(50))
+    assert [result for _, result, _ in results] == [n * n for n in range(50)]
+    assert all(error is None for _, _, error in results)
+
+
+def test_window_bounds_in_flight_items():
+    lock = threading.Lock()
+    state = {"started": 0, "consumed": 0, "max_ahead": 0}
+
+    def record(n):
+        with lock:
+            state["started"] += 1
+            state["max_ahead"] = max(state["max_ahead"], state["started"] - state["consumed"])
+        return n
+
+    for _ in ordered_map(record, range(100), workers=4, window=3):
+        with lock:
+            state["consumed"] += 1
+        # 消费者很慢，已开始但还没被取走的任务也不超过 window 个
+        time.sleep(0.001)
+
+    assert state["started"] == 100
+    assert state["max_ahead"] <= 3
+
+
+def test_input_consumed_lazily():
+    pulled = []
+
+    def items():
+        for n in range(1000):
+            pulled.append(n)
+            yield n
+
+    results = ordered_map(lambda n: n, items(), workers=2, window=4)
+    next(results)
+    # 只取出了窗口大小左右的输入
+    assert len(pulled) <= 5
+    results.close()
+
+
+def test_exceptions_returned_in_place():
+    def fail_on_odd(n):
+        if n % 2:
+            raise ValueError(f"bad {n}")
+        return n
+
+    results = list(ordered_map(fail_on_odd, range(6), workers=3))
+    assert [result for _, result, _ in results] == [0, None, 2, None, 4, None]
+    errors = [error for _, _, error in results]
+    assert errors[0] is None
+    assert isinstance(errors[1], ValueError) and str(errors[1]) == "bad 1"
+
+
+def test_early_exit_cancels_queued_work():
+    started = []
+
+    def record(n):
+        started.append(n)
+        time.sleep(0.01)
+        return n
+
+    results = ordered_map(record, range(100), workers=1, window=4)
+    next(results)
+    results.close()
+    assert len(started) <= 5
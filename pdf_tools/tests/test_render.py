@@ -0,0 +1,290 @@
+"""PDF转图片的多进程渲染、预览图和增量导出测试"""
+import json
+import os
+import time
+
+import pytest
+from PIL import Image
+
+import core.manifest
+import core.render as render
+from core.manifest import MANIFEST_NAME, ExportManifest
+from core.options import RenderOptions
+from core.render import convert_pdf_to_images, parse_pyramid_sizes, render_pages, split_page_chunks
+
+
+@pytest.fixture
+def render_counter(monkeypatch):
+    """记录实际渲染的页码"""
+    rendered = []
+    real_render = render.render_page_to_file
+
+    def counting_render(page, dpi, output_path, color_mode="rgb"):
+        rendered.append(page.number)
+        return real_render(page, dpi, output_path, color_mode)
+
+    monkeypatch.setattr(render, "render_page_to_file", counting_render)
+    return rendered
+
+
+def test_parse_pyramid_sizes():
+    assert parse_pyramid_sizes("512，128, 1024") == [512, 128, 1024]
+    assert parse_pyramid_sizes(" ") is None
+    with pytest.raises(ValueError):
+        parse_pyramid_sizes("256,0")
+
+
+def test_pyramid_sizes_and_manifest(make_pdf, tmp_path, monkeypatch):
+    pdf_path = make_pdf("doc.pdf", pages=2, with_image=True)
+    get_pixmap_calls = []
+    real_get_pixmap = render.fitz.Page.get_pixmap
+
+    def counting_get_pixmap(page, *args, **kwargs):
+        get_pixmap_calls.append(page.number)
+        return real_get_pixmap(page, *args, **kwargs)
+
+    monkeypatch.setattr(render.fitz.Page, "get_pixmap", counting_get_pixmap)
+    options = RenderOptions(output_format="png", pyramid_sizes=[128, 400, 64, 400])
+
+    assert convert_pdf_to_images(pdf_path, str(tmp_path), options) == 2
+    # 每页只渲染一次
+    assert sorted(get_pixmap_calls) == [0, 1]
+
+    with open(tmp_path / "doc_pyramid.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["source"] == "doc.pdf"
+    assert manifest["sizes"] == [400, 128, 64]
+    assert [page["page"] for page in manifest["pages"]] == [1, 2]
+    first = manifest["pages"][0]
+    assert (first["width_pt"], first["height_pt"]) == (595, 842)
+    assert [image["size"] for image in first["images"]] == [400, 128, 64]
+    for image in first["images"]:
+        with Image.open(tmp_path / image["file"]) as img:
+            assert img.size == (image["width"], image["height"])
+            assert max(img.size) == image["size"]
+
+
+def test_incremental_export_skips_unchanged_pages(make_pdf, tmp_path, render_counter):
+    pdf_path = make_pdf("doc.pdf", pages=3)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    options = RenderOptions(output_format="png", dpi=36, incremental=True)
+
+    assert convert_pdf_to_images(pdf_path, str(output_dir), options) == 3
+    assert sorted(render_counter) == [0, 1, 2]
+    assert os.path.exists(output_dir / MANIFEST_NAME)
+
+    # 没有变化时不渲染任何页面
+    render_counter.clear()
+    assert convert_pdf_to_images(pdf_path, str(output_dir), options) == 3
+    assert render_counter == []
+
+    # 输出文件被删除的页面重新渲染
+    os.remove(output_dir / "doc_2.png")
+    assert convert_pdf_to_images(pdf_path, str(output_dir), options) == 3
+    assert render_counter == [1]
+
+    # 参数变化后全部重新渲染
+    render_counter.clear()
+    options.dpi = 48
+    convert_pdf_to_images(pdf_path, str(output_dir), options)
+    assert sorted(render_counter) == [0, 1, 2]
+
+    # 源文件内容变化后全部重新渲染
+    render_counter.clear()
+    make_pdf("doc.pdf", pages=3, text="changed")
+    convert_pdf_to_images(pdf_path, str(output_dir), options)
+    assert sorted(render_counter) == [0, 1, 2]
+
+
+def test_manifest_decisions(make_pdf, tmp_path):
+    pdf_path = make_pdf("doc.pdf")
+    (tmp_path / "doc_1.png").write_bytes(b"x" * 100)
+    params = {"dpi": 150, "output_format": "png"}
+
+    manifest = ExportManifest(str(tmp_path))
+    digest = manifest.source_digest(pdf_path)
+    assert not manifest.is_current("doc_1.png", digest, 0, params)
+    manifest.record("doc_1.png", digest, 0, params)
+
+    assert manifest.is_current("doc_1.png", digest, 0, dict(params))
+    assert not manifest.is_current("doc_1.png", "0" * 64, 0, params)
+    assert not manifest.is_current("doc_1.png", digest, 1, params)
+    assert not manifest.is_current("doc_1.png", digest, 0, dict(params, dpi=300))
+    # 输出文件被改动或删除
+    (tmp_path / "doc_1.png").write_bytes(b"x" * 99)
+    assert not manifest.is_current("doc_1.png", digest, 0, params)
+    os.remove(tmp_path / "doc_1.png")
+    assert not manifest.is_current("doc_1.png", digest, 0, params)
+
+
+def test_manifest_digest_reused_until_source_changes(make_pdf, tmp_path, monkeypatch):
+    pdf_path = make_pdf("doc.pdf")
+    manifest = ExportManifest(str(tmp_path))
+    digest = manifest.source_digest(pdf_path)
+    manifest.save()
+
+    calls = []
+    real_digest = core.manifest.file_digest
+    monkeypatch.setattr(core.manifest, "file_digest", lambda path: calls.append(path) or real_digest(path))
+    reloaded = ExportManifest(str(tmp_path))
+    assert reloaded.source_digest(pdf_path) == digest
+    assert calls == []
+
+    make_pdf("doc.pdf", text="changed")
+    assert reloaded.source_digest(pdf_path) != digest
+    assert calls == [pdf_path]
+
+
+def test_manifest_save_is_atomic_and_lazy(make_pdf, tmp_path, monkeypatch):
+    pdf_path = make_pdf("doc.pdf")
+    manifest = ExportManifest(str(tmp_path))
+    manifest.source_digest(pdf_path)
+    manifest.save()
+    assert not manifest.dirty
+    assert [name for name in os.listdir(tmp_path) if ".tmp-" in name] == []
+
+    # 没有变化时不重写清单
+    def fail_replace(*args):
+        raise AssertionError("清单不应被重写")
+
+    monkeypatch.setattr(os, "replace", fail_replace)
+    ExportManifest(str(tmp_path)).save()
+
+
+def test_corrupt_manifest_starts_empty(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text("{not json", encoding="utf-8")
+    manifest = ExportManifest(str(tmp_path))
+    assert manifest.sources == {} and manifest.outputs == {}
+
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps({"version": -1, "outputs": {"a": {}}}), encoding="utf-8")
+    assert ExportManifest(str(tmp_path)).outputs == {}
+
+
+
+class TextJob:
+    """返回页面文字的页面任务，可以传给工作进程"""
+
+    def __init__(self, fail_page=None, crash_page=None, delay=0):
+        self.fail_page = fail_page
+        self.crash_page = crash_page
+        self.delay = delay
+
+    def __call__(self, page, page_num):
+        if page_num == self.fail_page:
+            raise ValueError(f"无法渲染第 {page_num + 1} 页")
+        if page_num == self.crash_page:
+            os._exit(3)
+        time.sleep(self.delay)
+        return (os.getpid(), page.get_text().strip())
+
+
+def collect(results):
+    def on_page(done, total, page_num, payload, error):
+        results.append((done, total, page_num, payload, error))
+    return on_page
+
+
+def test_split_page_chunks_covers_pages_in_order():
+    pages = list(range(100))
+    chunks = split_page_chunks(pages, 4)
+    assert [page for chunk in chunks for page in chunk] == pages
+    assert max(len(chunk) for chunk in chunks) <= render.MAX_CHUNK_SIZE
+
+
+def test_pool_returns_every_page_result(make_pdf):
+    pdf_path = make_pdf("doc.pdf", pages=40)
+    pages = list(range(39, -1, -2))
+    results = []
+    assert render_pages(pdf_path, pages, TextJob(), workers=4, progress_callback=collect(results)) == 20
+
+    # 完成计数按回调顺序递增，每页的结果与页码对应
+    assert [done for done, *_ in results] == list(range(1, 21))
+    assert all(total == 20 and error is None for _, total, _, _, error in results)
+    assert sorted(page_num for _, _, page_num, _, _ in results) == sorted(pages)
+    assert all(text == f"page {page_num + 1}" for _, _, page_num, (_, text), _ in results)
+    # 确实使用了多个工作进程
+    assert os.getpid() not in {pid for *_, (pid, _), _ in results}
+
+
+def test_pool_reports_page_errors_and_continues(make_pdf):
+    pdf_path = make_pdf("doc.pdf", pages=20)
+    results = []
+    converted = render_pages(pdf_path, range(20), TextJob(fail_page=7), workers=3,
+                             progress_callback=collect(results))
+    assert converted == 19
+    errors = [(page_num, error) for _, _, page_num, _, error in results if error is not None]
+    assert errors == [(7, "无法渲染第 8 页")]
+    assert len(results) == 20
+
+
+def test_pool_raises_when_worker_cannot_open_document(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    with pytest.raises(RuntimeError):
+        render_pages(str(broken), range(20), TextJob(), workers=3)
+
+
+def test_pool_raises_when_worker_dies(make_pdf):
+    pdf_path = make_pdf("doc.pdf", pages=20)
+    with pytest.raises(RuntimeError, match="意外退出"):
+        render_pages(pdf_path, range(20), TextJob(crash_page=3), workers=2)
+
+
+def test_cancel_from_callback_stops_workers(make_pdf, monkeypatch):
+    pdf_path = make_pdf("doc.pdf", pages=40)
+    processes = []
+    real_process = render.multiprocessing.Process
+
+    def recording_process(*args, **kwargs):
+        process = real_process(*args, **kwargs)
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(render.multiprocessing, "Process", recording_process)
+
+    def cancel(*args):
+        raise KeyboardInterrupt
+
+    start = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        render_pages(pdf_path, range(40), TextJob(delay=0.2), workers=2, progress_callback=cancel)
+    # 不等待剩余约4秒的页面，工作进程已全部结束
+    assert time.monotonic() - start < 2
+    assert len(processes) == 2
+    assert not any(process.is_alive() for process in processes)
+
+
+def test_few_pages_render_in_process(make_pdf):
+    pdf_path = make_pdf("doc.pdf", pages=3)
+    results = []
+    assert render_pages(pdf_path, [2, 0], TextJob(), workers=4, progress_callback=collect(results)) == 2
+    assert [(page_num, payload) for _, _, page_num, payload, _ in results] == \
+        [(2, (os.getpid(), "page 3")), (0, (os.getpid(), "page 1"))]
+
+
+@pytest.mark.parametrize("output_format, color_mode, mode", [
+    ("png", "gray", "L"),
+    ("png", "mono", "1"),
+    ("jpg", "gray", "L"),
+    # JPEG不支持1位图像，保存为灰度
+    ("jpg", "mono", "L"),
+    ("tiff", "mono", "1"),
+])
+def test_color_modes_per_format(make_pdf, tmp_path, output_format, color_mode, mode):
+    pdf_path = make_pdf("doc.pdf", with_image=True)
+    warnings = []
+    options = RenderOptions(output_format=output_format, dpi=72, color_mode=color_mode, anti_alias=0)
+    assert convert_pdf_to_images(pdf_path, str(tmp_path), options, warning_callback=warnings.append) == 1
+
+    with Image.open(tmp_path / f"doc_1.{output_format}") as img:
+        assert img.mode == mode
+        assert img.size == (595, 842)
+        if color_mode == "mono":
+            # 阈值化后只有黑白两种颜色（JPEG压缩会带来少量中间值）
+            histogram = img.convert("L").histogram()
+            assert sum(histogram[64:192]) < 595 * 842 * 0.01
+            assert histogram[0] > 0 and histogram[255] > 0
+        if output_format == "tiff":
+            assert img.info["compression"] == "group4"
+    assert bool(warnings) == (output_format == "jpg" and color_mode == "mono")
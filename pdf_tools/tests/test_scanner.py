@@ -0,0 +1,50 @@
+"""文件夹扫描的测试"""
+import os
+import threading
+
+import fitz
+import pytest
+
+from core.scanner import scan_folder, sniff_format
+
+
+@pytest.fixture
+def fitz_thread_recorder(monkeypatch):
+    threads = set()
+    real_open = fitz.open
+
+    def recording_open(*args, **kwargs):
+        threads.add(threading.current_thread())
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(fitz, "open", recording_open)
+    return threads
+
+
+def test_scan_reports_pages_and_rejects_bad_files(tmp_path, make_pdf, fitz_thread_recorder):
+    (tmp_path / "sub").mkdir()
+    make_pdf("a.pdf", pages=3)
+    make_pdf(os.path.join("sub", "b.pdf"), pages=2)
+    (tmp_path / "fake.pdf").write_bytes(b"\xff\xd8\xff\xe0 jpeg data")
+    (tmp_path / "broken.pdf").write_bytes(b"%PDF-1.7\ngarbage")
+    (tmp_path / "notes.txt").write_text("skip me")
+
+    entries = [entry for batch in scan_folder(str(tmp_path), (".pdf",), workers=4, batch_size=2)
+               for entry in batch]
+    by_name = {os.path.basename(entry.path): entry for entry in entries}
+
+    assert set(by_name) == {"a.pdf", "b.pdf", "fake.pdf", "broken.pdf"}
+    assert by_name["a.pdf"].page_count == 3 and by_name["a.pdf"].error is None
+    assert by_name["b.pdf"].page_count == 2
+    assert by_name["a.pdf"].size == os.path.getsize(tmp_path / "a.pdf")
+    assert "扩展名不符" in by_name["fake.pdf"].error
+    assert by_name["broken.pdf"].error is not None
+    # 页数只在取出结果的线程中读取
+    assert fitz_thread_recorder == {threading.current_thread()}
+
+
+def test_sniff_format():
+    assert sniff_format(b"%PDF-1.4") == "pdf"
+    assert sniff_format(b"\x89PNG\r\n\x1a\n....") == "png"
+    assert sniff_format(b"RIFF\0\0\0\0WEBPVP8 ") == "webp"
+    assert sniff_format(b"hello") is None
@@ -0,0 +1,141 @@
+"""分块渲染和分块TIFF写入的测试"""
+import fitz
+import pytest
+from PIL import Image, ImageChops
+
+import core.tiling as tiling
+from core.tiling import TiledTiffWriter, pack_mono_rows, render_large_page, render_png_strips, render_tiled_tiff
+
+
+def write_gradient(writer, width, height):
+    """按块写入一张每个像素值为 (x + y) % 256 的灰度图"""
+    for y0 in range(0, height, writer.tile_size):
+        for x0 in range(0, width, writer.tile_size):
+            rows = [bytes((x + y) % 256 for x in range(x0, min(x0 + writer.tile_size, width)))
+                    for y in range(y0, min(y0 + writer.tile_size, height))]
+            writer.write_tile(rows)
+
+
+def test_classic_tiff_round_trip(tmp_path):
+    path = str(tmp_path / "out.tif")
+    writer = TiledTiffWriter(path, 40, 24, 1, tile_size=16, dpi=300)
+    assert not writer.bigtiff
+    write_gradient(writer, 40, 24)
+    writer.close()
+
+    with open(path, "rb") as f:
+        assert f.read(4) == b"II*\0"
+    with Image.open(path) as img:
+        assert img.size == (40, 24) and img.mode == "L"
+        assert img.getpixel((39, 23)) == (39 + 23) % 256
+        assert img.info["dpi"] == pytest.approx((300, 300))
+
+
+def test_bigtiff_chosen_near_4gb(tmp_path):
+    # 只写文件头，不写块数据
+    writer = TiledTiffWriter(str(tmp_path / "big.tif"), 65536, 65536, 1)
+    try:
+        assert writer.bigtiff
+    finally:
+        writer.file.close()
+    with open(tmp_path / "big.tif", "rb") as f:
+        assert f.read(4) == b"II+\0"
+
+    writer = TiledTiffWriter(str(tmp_path / "small.tif"), 60000, 60000, 1)
+    try:
+        assert not writer.bigtiff
+    finally:
+        writer.file.close()
+
+
+def test_mono_tiles_round_trip_with_group4(tmp_path):
+    path = str(tmp_path / "out.tif")
+    writer = TiledTiffWriter(path, 40, 24, 1, tile_size=16, bits=1)
+    for y0 in (0, 16):
+        for x0 in (0, 16, 32):
+            # 左上角的块全黑，其余全白
+            fill = 0 if (x0, y0) == (0, 0) else 255
+            rows = [bytes([fill]) * 2 for _ in range(min(16, 24 - y0))]
+            writer.write_tile(rows)
+    writer.close()
+
+    with Image.open(path) as img:
+        assert img.mode == "1" and img.info["compression"] == "group4"
+        assert img.getpixel((15, 15)) == 0
+        assert img.getpixel((16, 0)) == 255 and img.getpixel((0, 16)) == 255
+
+
+def test_bigtiff_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiling, "CLASSIC_TIFF_LIMIT", 0)
+    path = str(tmp_path / "out.tif")
+    writer = TiledTiffWriter(path, 40, 24, 1, tile_size=16)
+    assert writer.bigtiff
+    write_gradient(writer, 40, 24)
+    writer.close()
+
+    with Image.open(path) as img:
+        assert img.size == (40, 24)
+        assert img.getpixel((17, 5)) == 22
+
+
+def test_incomplete_tiles_rejected(tmp_path):
+    writer = TiledTiffWriter(str(tmp_path / "out.tif"), 40, 24, 1, tile_size=16)
+    writer.write_tile([b"\0" * 16] * 16)
+    with pytest.raises(ValueError):
+        writer.close()
+    assert writer.file.closed
+
+
+def test_pack_mono_rows():
+    rows = pack_mono_rows([bytes([0] * 4 + [255] * 5), bytes([255] * 9)], 9)
+    assert rows == [b"\x0f\x80", b"\xff\x80"]
+
+
+def assert_matches_page(img, page, mode):
+    """与整页渲染的结果比较，只允许抗锯齿边缘有少量差异"""
+    assert img.mode == mode
+    assert img.size == (595, 842)
+    expected = Image.frombytes("RGB", (595, 842), page.get_pixmap(alpha=False).samples)
+    expected = expected.convert("L")
+    actual = img.convert("L")
+    if mode == "1":
+        expected = expected.point(lambda v: 255 if v >= 128 else 0)
+    diff = sum(ImageChops.difference(actual, expected).histogram()[65:])
+    assert diff < 595 * 842 * 0.01
+
+
+@pytest.mark.parametrize("color_mode, mode, compression", [
+    ("rgb", "RGB", "tiff_adobe_deflate"),
+    ("gray", "L", "tiff_adobe_deflate"),
+    # 与整页保存的黑白TIFF一样使用CCITT G4
+    ("mono", "1", "group4"),
+])
+def test_render_tiled_tiff_round_trip(make_pdf, tmp_path, color_mode, mode, compression):
+    doc = fitz.open(make_pdf("in.pdf", with_image=True))
+    page = doc[0]
+    path = str(tmp_path / "out.tif")
+    render_tiled_tiff(page, 72, path, tile_size=256, color_mode=color_mode)
+
+    with Image.open(path) as img:
+        assert img.info["compression"] == compression
+        assert_matches_page(img, page, mode)
+    doc.close()
+
+
+@pytest.mark.parametrize("color_mode, mode", [("rgb", "RGB"), ("gray", "L"), ("mono", "1")])
+def test_render_png_strips_round_trip(make_pdf, tmp_path, color_mode, mode):
+    doc = fitz.open(make_pdf("in.pdf", with_image=True))
+    page = doc[0]
+    path = str(tmp_path / "out.png")
+    render_png_strips(page, 72, path, strip_height=100, color_mode=color_mode)
+
+    with Image.open(path) as img:
+        assert_matches_page(img, page, mode)
+        assert img.info["dpi"] == pytest.approx((72, 72), abs=0.1)
+    doc.close()
+
+
+def test_large_jpeg_page_rejected(make_pdf, tmp_path):
+    with fitz.open(make_pdf("in.pdf")) as doc:
+        with pytest.raises(ValueError, match="无法分块写出"):
+            render_large_page(doc[0], 72, str(tmp_path / "out.jpg"), "jpg")